@@ -0,0 +1,115 @@
+"""
+排行榜写入基准 - 每次测评完成的排行榜更新耗时（10k / 100k / 1M Agent）
+对比旧的全量重排（读出全部记录并逐行重写rank）与当前单行更新 + 窗口汇总 + 有序集合写入
+排行榜存储使用进程内跳表（未配置REDIS_URL时）
+
+用法: python benchmark_rankings.py [sizes...]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from types import SimpleNamespace
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models.database import Ranking, RankingRollup, generate_uuid
+from services.assessment_service import AssessmentService, RankingService
+from services.leaderboard import leaderboard
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+COMPLETIONS = 200
+# 全量重排在该规模以上耗时过长，只测一次作为参照
+LEGACY_MAX_ROUNDS_SIZE = 100_000
+
+
+def seed_rankings(session_factory, size: int):
+    db = session_factory()
+    rows = [
+        {
+            "id": generate_uuid(),
+            "agent_id": f"agent_{i}",
+            "agent_name": f"agent_{i}",
+            "agent_type": "general",
+            "total_score": round(random.uniform(0, 1000), 2),
+            "level": "Gold",
+            "task_count": 1
+        }
+        for i in range(size)
+    ]
+    for start in range(0, size, 50_000):
+        db.execute(insert(Ranking), rows[start:start + 50_000])
+    db.commit()
+    db.close()
+
+
+def random_completion(size: int) -> SimpleNamespace:
+    # 一半为已有Agent再次测评，一半为新Agent
+    agent = f"agent_{random.randrange(size)}" if random.random() < 0.5 else f"new_{generate_uuid()}"
+    return SimpleNamespace(agent_id=agent, agent_name=agent, total_score=random.uniform(0, 1000), level="Gold",
+                           token_id=None, completed_at=datetime.utcnow())
+
+
+def legacy_rerank(db):
+    """旧实现: 按分数读出全部记录并逐行重写rank"""
+    ids = [row[0] for row in db.execute(text("SELECT id FROM rankings ORDER BY total_score DESC"))]
+    db.execute(text("UPDATE rankings SET rank = :rank WHERE id = :id"),
+               [{"rank": i, "id": row_id} for i, row_id in enumerate(ids, 1)])
+    db.commit()
+
+
+def bench(size: int):
+    path = os.path.join(tempfile.mkdtemp(), "rankings.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine, tables=[Ranking.__table__, RankingRollup.__table__])
+    session_factory = sessionmaker(bind=engine)
+    seed_rankings(session_factory, size)
+
+    db = session_factory()
+    started = time.perf_counter()
+    leaderboard.rebuild(db)
+    rebuild_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(COMPLETIONS):
+        AssessmentService._update_ranking(db, random_completion(size))
+    update_ms = (time.perf_counter() - started) * 1000 / COMPLETIONS
+
+    started = time.perf_counter()
+    RankingService.get_rankings(db, skip=0, limit=100)
+    top_ms = (time.perf_counter() - started) * 1000
+
+    names = [f"agent_{random.randrange(size)}" for _ in range(1000)]
+    started = time.perf_counter()
+    for name in names:
+        RankingService.get_agent_ranking(db, name)
+    lookup_ms = (time.perf_counter() - started) * 1000 / len(names)
+
+    db.execute(text("ALTER TABLE rankings ADD COLUMN rank INTEGER"))
+    rounds = 3 if size <= LEGACY_MAX_ROUNDS_SIZE else 1
+    started = time.perf_counter()
+    for _ in range(rounds):
+        legacy_rerank(db)
+    legacy_ms = (time.perf_counter() - started) * 1000 / rounds
+
+    db.close()
+    engine.dispose()
+    os.remove(path)
+    return update_ms, legacy_ms, top_ms, lookup_ms, rebuild_s
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print("📊 Leaderboard write path (SQLite, per completion)")
+    print("=" * 84)
+    print(f"{'agents':>10} {'incremental':>14} {'full re-rank':>14} {'top-100':>10} {'agent rank':>12} {'rebuild':>10}")
+    for size in sizes:
+        update_ms, legacy_ms, top_ms, lookup_ms, rebuild_s = bench(size)
+        print(f"{size:>10,} {update_ms:>12.2f}ms {legacy_ms:>12.0f}ms {top_ms:>8.2f}ms "
+              f"{lookup_ms:>10.3f}ms {rebuild_s:>9.1f}s")
@@ -5,6 +5,13 @@ from contextlib import asynccontextmanager
 import uvicorn
 
 from database import init_db
+from services.job_queue import assessment_queue
+from services.temp_token_auth import temp_token_cache
+from services.user_auth import claims_cache
+from services.webhooks import webhook_dispatcher
+from services.pdf_service import pdf_renderer
+from services.expiry_sweeper import expiry_sweeper
+from services.score_sketch import score_distribution
 from routers import tokens, assessments, reports, rankings, payments, payments_simple, bots, users, bots_quick_bind
 
 @asynccontextmanager
@@ -13,8 +20,22 @@ async def lifespan(app: FastAPI):
     # 启动时初始化数据库
     init_db()
     print("✅ Database initialized")
+    # 启动Webhook投递和测评Worker
+    webhook_dispatcher.start()
+    assessment_queue.start()
+    print(f"✅ Assessment workers started ({assessment_queue.workers})")
+    pdf_renderer.start()
+    print(f"✅ PDF render pool started ({pdf_renderer.workers})")
+    expiry_sweeper.start()
+    print(f"✅ Expiry sweeper started (every {expiry_sweeper.interval:g}s)")
     yield
     # 关闭时的清理操作
+    expiry_sweeper.stop()
+    assessment_queue.stop()
+    # Worker已停止，写入本进程尚未持久化的分数分布增量
+    score_distribution.persist()
+    pdf_renderer.stop()
+    webhook_dispatcher.stop()
     print("👋 Application shutting down")
 
 # 创建FastAPI应用
@@ -79,7 +100,10 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "oaeas-api",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "temp_token_cache": temp_token_cache.stats(),
+        "jwt_claims_cache": claims_cache.stats(),
+        "expiry_sweeper": expiry_sweeper.stats()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+"""
+报告存储迁移 - 将reports表的dimensions / test_cases / recommendations / json_report四个JSON列
+合并压缩为content一列（见models.database.pack_report_content）
+
+- 分批读取旧列并写入content，可重复执行（只处理content为空的行）
+- 预序列化响应（free_payload / full_payload）改为gzip存储，旧数据清空后在首次读取时重新生成
+  （只在首次迁移时清空一次，完成标记记在system_configs中，之后重复执行不会清掉已压缩的响应）
+- 加 --drop 时在迁移完成后删除旧列
+
+用法: python migrate_report_storage.py [--drop] [--batch 1000]
+"""
+
+import sys
+import json
+import argparse
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from database import engine
+from models.database import REPORT_CONTENT_FIELDS, SystemConfig, pack_report_content
+
+BINARY_TYPE = {"postgresql": "BYTEA"}
+# 旧的未压缩预序列化响应已清空的标记
+PAYLOADS_CLEARED_KEY = "report_storage_payloads_gzip"
+
+
+def _json(value):
+    # PostgreSQL的JSON列返回已解析的对象，SQLite返回字符串
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def migrate(batch: int = 1000, drop: bool = False):
+    columns = {c["name"] for c in inspect(engine).get_columns("reports")}
+    legacy = [field for field in REPORT_CONTENT_FIELDS if field in columns]
+    binary = BINARY_TYPE.get(engine.dialect.name, "BLOB")
+
+    with engine.begin() as conn:
+        for column in ("content", "free_payload", "full_payload"):
+            if column not in columns:
+                conn.execute(text(f"ALTER TABLE reports ADD COLUMN {column} {binary}"))
+
+    with Session(bind=engine) as db:
+        if not db.query(SystemConfig).filter(SystemConfig.config_key == PAYLOADS_CLEARED_KEY).first():
+            # 旧的预序列化响应未压缩，清空后按需重新生成（与标记在同一事务中提交）
+            db.execute(text("UPDATE reports SET free_payload = NULL, full_payload = NULL"))
+            db.add(SystemConfig(config_key=PAYLOADS_CLEARED_KEY, config_value={"cleared": True}))
+            db.commit()
+            print("  cleared legacy uncompressed payloads")
+
+    migrated = 0
+    if legacy:
+        select_sql = text(
+            f"SELECT id, {', '.join(legacy)} FROM reports WHERE content IS NULL ORDER BY id LIMIT :batch"
+        )
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(select_sql, {"batch": batch}).fetchall()
+                if not rows:
+                    break
+                conn.execute(
+                    text("UPDATE reports SET content = :content WHERE id = :id"),
+                    [
+                        {"id": row[0], "content": pack_report_content(dict(zip(legacy, map(_json, row[1:]))))}
+                        for row in rows
+                    ]
+                )
+            migrated += len(rows)
+            print(f"  migrated {migrated} reports")
+
+    if drop and legacy:
+        with engine.begin() as conn:
+            for column in legacy:
+                conn.execute(text(f"ALTER TABLE reports DROP COLUMN {column}"))
+        print(f"  dropped columns: {', '.join(legacy)}")
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate reports to compressed content storage")
+    parser.add_argument("--drop", action="store_true", help="drop legacy JSON columns afterwards")
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("📦 Migrating report storage")
+    total = migrate(args.batch, args.drop)
+    print(f"✅ Done ({total} reports)")
+    sys.exit(0)
@@ -0,0 +1,162 @@
+"""
+数据库结构迁移 - 将已有数据库（database/schema.sql初始化或旧版本create_all创建）升级到当前模型
+create_all只创建缺失的表，不会给已有表加列/索引，升级部署时先执行本脚本
+
+- 缺失的表（ranking_rollups等）连同索引一起创建
+- 已有表补齐缺失的列（assessment_tasks.queued_at / attempts、rankings各维度最高分、
+  reports.content / free_payload / full_payload等），新列均可为空
+- 补建模型中声明的索引（游标分页索引、部分索引），已存在的跳过
+- 删除rankings.rank（排名改为读取时计算）
+- 回填rankings各维度最高分、当前日/周/月窗口的ranking_rollups
+- 可重复执行；报告正文转换见migrate_report_storage.py
+
+用法: python migrate_schema.py [--skip-backfill]
+"""
+
+import sys
+import argparse
+from datetime import datetime
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.orm import Session
+
+from database import engine
+from models.database import AssessmentTask, Base, Ranking, RankingRollup
+from services.leaderboard import DIMENSION_COLUMNS, PERIODS, window_start
+
+# 已从模型中移除、需要删除的列
+DROPPED_COLUMNS = {"rankings": ("rank",)}
+
+
+def add_missing_columns(conn) -> list:
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def drop_removed_columns(conn) -> list:
+    inspector = inspect(conn)
+    dropped = []
+    for table_name, names in DROPPED_COLUMNS.items():
+        if not inspector.has_table(table_name):
+            continue
+        columns = {c["name"] for c in inspector.get_columns(table_name)}
+        for name in names:
+            if name in columns:
+                conn.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {name}"))
+                dropped.append(f"{table_name}.{name}")
+    return dropped
+
+
+def create_missing_indexes(conn) -> list:
+    inspector = inspect(conn)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+                created.append(index.name)
+    return created
+
+
+def backfill_ranking_dimensions(db: Session) -> int:
+    """rankings各维度最高分为空的行，按该Agent已完成任务回填"""
+    updated = 0
+    for column in DIMENSION_COLUMNS:
+        best = db.query(func.max(getattr(AssessmentTask, column))).filter(
+            AssessmentTask.agent_name == Ranking.agent_name,
+            AssessmentTask.status == "completed"
+        ).scalar_subquery()
+        updated += db.query(Ranking).filter(getattr(Ranking, column).is_(None)).update(
+            {column: best}, synchronize_session=False
+        )
+    db.commit()
+    return updated
+
+
+def backfill_rollups(db: Session, now: datetime = None) -> int:
+    """为当前日/周/月窗口生成汇总行（窗口已有数据时跳过）"""
+    now = now or datetime.utcnow()
+    created = 0
+    for period in PERIODS:
+        start = window_start(period, now)
+        if db.query(RankingRollup.id).filter(
+            RankingRollup.period == period, RankingRollup.window_start == start
+        ).first():
+            continue
+        rows = db.query(
+            AssessmentTask.agent_name,
+            func.max(AssessmentTask.agent_id),
+            func.max(AssessmentTask.total_score),
+            func.count(AssessmentTask.id)
+        ).filter(
+            AssessmentTask.status == "completed",
+            AssessmentTask.completed_at >= start
+        ).group_by(AssessmentTask.agent_name).all()
+        agent_types = dict(db.query(Ranking.agent_name, Ranking.agent_type).filter(
+            Ranking.agent_name.in_([row[0] for row in rows])
+        ).all()) if rows else {}
+        for agent_name, agent_id, best_score, task_count in rows:
+            level = db.query(AssessmentTask.level).filter(
+                AssessmentTask.agent_name == agent_name,
+                AssessmentTask.status == "completed",
+                AssessmentTask.completed_at >= start
+            ).order_by(AssessmentTask.total_score.desc()).limit(1).scalar()
+            db.add(RankingRollup(
+                period=period,
+                window_start=start,
+                agent_id=agent_id,
+                agent_name=agent_name,
+                agent_type=agent_types.get(agent_name),
+                best_score=best_score,
+                level=level,
+                task_count=task_count
+            ))
+            created += 1
+        db.commit()
+    return created
+
+
+def migrate(backfill: bool = True) -> dict:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        added = add_missing_columns(conn)
+        dropped = drop_removed_columns(conn)
+    with engine.begin() as conn:
+        indexes = create_missing_indexes(conn)
+
+    result = {"added_columns": added, "dropped_columns": dropped, "created_indexes": indexes}
+    if backfill:
+        db = Session(bind=engine)
+        try:
+            result["ranking_dimensions"] = backfill_ranking_dimensions(db)
+            result["rollups"] = backfill_rollups(db)
+        finally:
+            db.close()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade an existing database to the current models")
+    parser.add_argument("--skip-backfill", action="store_true", help="only change the schema")
+    args = parser.parse_args()
+
+    print("🛠  Migrating database schema")
+    for key, value in migrate(not args.skip_backfill).items():
+        print(f"  {key}: {value}")
+    print("✅ Done")
+    sys.exit(0)
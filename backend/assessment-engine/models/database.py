@@ -1,8 +1,11 @@
-from sqlalchemy import create_engine, Column, String, Float, DateTime, Text, JSON, Integer, Boolean, ForeignKey
+from sqlalchemy import create_engine, Column, String, Float, DateTime, Text, JSON, Integer, Boolean, ForeignKey, Index, UniqueConstraint, LargeBinary, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, deferred
 from datetime import datetime
+from typing import Optional
+import json
 import uuid
+import zlib
 
 Base = declarative_base()
 
@@ -21,6 +24,15 @@ class User(Base):
     invite_code_expires_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # 过期清理：只索引仍持有邀请码的用户
+        Index(
+            "ix_users_invite_code_expires_at", "invite_code_expires_at",
+            postgresql_where=text("invite_code IS NOT NULL"),
+            sqlite_where=text("invite_code IS NOT NULL")
+        ),
+    )
 
 # ============== Token体系 (Agent-First) ==============
 
@@ -36,6 +48,20 @@ class TempToken(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime)
     bound_to_user_id = Column(String, ForeignKey("users.id"), nullable=True)
+    
+    __table_args__ = (
+        # 只索引活跃Token（过期的由清理任务转为expired）: 按Agent查活跃Token / 过期清理
+        Index(
+            "ix_temp_tokens_active_agent_id", "agent_id",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+        Index(
+            "ix_temp_tokens_active_expires_at", "expires_at",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+    )
 
 class BoundToken(Base):
     """正式绑定Token - 关联人类账户用"""
@@ -78,6 +104,17 @@ class Token(Base):
     created_by = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # 用户Token列表的游标分页
+        Index("ix_tokens_created_by_created_at_id", "created_by", "created_at", "id"),
+        # 过期清理
+        Index(
+            "ix_tokens_active_expires_at", "expires_at",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+    )
 
 # ============== 测评相关表 ==============
 
@@ -100,6 +137,8 @@ class AssessmentTask(Base):
     initiated_by = Column(String(50), default="bot")  # bot/human
     status = Column(String, default="pending")
     callback_url = Column(String(500))
+    queued_at = Column(DateTime, nullable=True, index=True)  # 入队时间，Worker按此顺序认领
+    attempts = Column(Integer, default=0)  # 被Worker认领的次数（超时回收时计入重试上限）
     
     tool_score = Column(Float, default=0)
     reasoning_score = Column(Float, default=0)
@@ -116,6 +155,19 @@ class AssessmentTask(Base):
     
     # 关系
     report = relationship("Report", back_populates="task", uselist=False)
+    
+    __table_args__ = (
+        # 测评列表的游标分页（全量 / 按Agent）
+        Index("ix_assessment_tasks_created_at_id", "created_at", "id"),
+        Index("ix_assessment_tasks_agent_id_created_at_id", "agent_id", "created_at", "id"),
+        # Agent历史成绩（只含已完成任务，PostgreSQL下为覆盖索引）
+        Index(
+            "ix_assessment_tasks_agent_id_completed_at", "agent_id", "completed_at",
+            postgresql_include=["total_score", "task_code"],
+            postgresql_where=text("status = 'completed'"),
+            sqlite_where=text("status = 'completed'")
+        ),
+    )
 
 class TestCase(Base):
     """测试用例表"""
@@ -143,8 +195,54 @@ class TestResult(Base):
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# 报告正文中的大字段（压缩后存放在reports.content一列中）
+REPORT_CONTENT_FIELDS = ("dimensions", "test_cases", "recommendations", "json_report")
+# json_report中与独立字段重复的部分，只存一份
+REPORT_SHARED_FIELDS = ("dimensions", "recommendations")
+
+
+def pack_report_content(content: dict) -> bytes:
+    """序列化并压缩报告正文，json_report中与独立字段相同的部分以引用代替"""
+    content = {k: v for k, v in content.items() if v is not None}
+    json_report = content.get("json_report")
+    if isinstance(json_report, dict):
+        shared = [k for k in REPORT_SHARED_FIELDS if k in json_report and json_report[k] == content.get(k)]
+        if shared:
+            # 保留键的位置，值在解包时还原
+            content["json_report"] = {k: None if k in shared else v for k, v in json_report.items()}
+            content["_shared"] = shared
+    raw = json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str)
+    return zlib.compress(raw.encode("utf-8"), 6)
+
+
+def unpack_report_content(blob: Optional[bytes]) -> dict:
+    if not blob:
+        return {}
+    content = json.loads(zlib.decompress(blob))
+    shared = content.pop("_shared", None)
+    if shared:
+        content["json_report"].update({k: content.get(k) for k in shared})
+    return content
+
+
+def _report_content_field(field: str):
+    def getter(self):
+        return self.get_content().get(field)
+
+    def setter(self, value):
+        content = dict(self.get_content())
+        content[field] = value
+        self.set_content(content)
+
+    return property(getter, setter, doc=f"报告正文字段{field}（读写reports.content）")
+
+
 class Report(Base):
-    """测评报告表"""
+    """
+    测评报告表
+    列表/状态类查询只读取小的投影列（summary、ranking_percentile等）；
+    正文（维度、用例、建议、完整报告）压缩后存一列，与预序列化响应一样延迟加载，访问时才读取
+    """
     __tablename__ = "reports"
     
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -154,12 +252,13 @@ class Report(Base):
     report_type = Column(String(50), default="full")  # free/full
     
     summary = Column(JSON)
-    dimensions = Column(JSON)
-    test_cases = Column(JSON)
-    recommendations = Column(JSON)
     ranking_percentile = Column(Float)
     
-    json_report = Column(JSON)
+    # 压缩的报告正文（见REPORT_CONTENT_FIELDS），通过同名属性读写
+    content = deferred(Column(LargeBinary))
+    # 免费版/完整版接口的最终响应字节，gzip压缩存储（生成或解锁时序列化，见services/report_payloads.py）
+    free_payload = deferred(Column(LargeBinary))
+    full_payload = deferred(Column(LargeBinary))
     webhook_url = Column(String(500))
     webhook_delivered = Column(Boolean, default=False)
     webhook_delivered_at = Column(DateTime)
@@ -170,6 +269,25 @@ class Report(Base):
     
     # 关系
     task = relationship("AssessmentTask", back_populates="report")
+    
+    dimensions = _report_content_field("dimensions")
+    test_cases = _report_content_field("test_cases")
+    recommendations = _report_content_field("recommendations")
+    json_report = _report_content_field("json_report")
+    
+    def get_content(self) -> dict:
+        """解压后的正文（按content字节缓存在实例上，同一份只解压一次）"""
+        blob = self.content
+        cached = self.__dict__.get("_content_cache")
+        if cached is None or cached[0] is not blob:
+            cached = (blob, unpack_report_content(blob))
+            self.__dict__["_content_cache"] = cached
+        return cached[1]
+    
+    def set_content(self, content: dict):
+        blob = pack_report_content(content)
+        self.content = blob
+        self.__dict__["_content_cache"] = (blob, content)
 
 class PaymentOrder(Base):
     """支付订单表"""
@@ -193,6 +311,15 @@ class PaymentOrder(Base):
     
     paid_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # 过期清理：只索引待支付订单
+        Index(
+            "ix_payment_orders_pending_created_at", "created_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'")
+        ),
+    )
 
 class Ranking(Base):
     """排行榜表"""
@@ -202,13 +329,38 @@ class Ranking(Base):
     agent_id = Column(String(255), index=True)
     agent_name = Column(String, index=True)
     agent_type = Column(String)
-    total_score = Column(Float)
+    # 排名不再落库，由排行榜有序集合计算（见services/leaderboard.py）
+    total_score = Column(Float, index=True)
+    # 各维度的历史最高分（与total_score相互独立，维度榜数据源）
+    tool_score = Column(Float)
+    reasoning_score = Column(Float)
+    interaction_score = Column(Float)
+    stability_score = Column(Float)
     level = Column(String)
-    rank = Column(Integer)
     task_count = Column(Integer, default=1)
     is_bound = Column(Boolean, default=False)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
+class RankingRollup(Base):
+    """时间窗口排行榜汇总表（日/周/月），每个窗口每个Agent一行，记录窗口内最高分"""
+    __tablename__ = "ranking_rollups"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    period = Column(String(10))  # daily/weekly/monthly
+    window_start = Column(DateTime)
+    agent_id = Column(String(255))
+    agent_name = Column(String)
+    agent_type = Column(String)
+    best_score = Column(Float)
+    level = Column(String)
+    task_count = Column(Integer, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("period", "window_start", "agent_name", name="uq_ranking_rollups_window_agent"),
+        Index("ix_ranking_rollups_window_score", "period", "window_start", "best_score"),
+    )
+
 class SystemConfig(Base):
     """系统配置表"""
     __tablename__ = "system_configs"
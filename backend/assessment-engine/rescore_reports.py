@@ -0,0 +1,28 @@
+"""
+报告重算 - 评分规则（system_configs.scoring_rules）调整后，按新规则重算已有报告的维度详情和改进建议
+每批报告一次向量化计算（见services.scoring_rules），适合夜间定时执行或回填
+
+用法: python rescore_reports.py [--batch 1000]
+"""
+
+import sys
+import argparse
+
+from database import SessionLocal
+from services.scoring_rules import scoring_rules, rescore_reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score reports with the current scoring rules")
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rules = scoring_rules.reload(db)
+        print(f"📐 Re-scoring reports with rules {rules.version}")
+        total = rescore_reports(db, rules, args.batch)
+    finally:
+        db.close()
+    print(f"✅ Done ({total} reports)")
+    sys.exit(0)
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from database import get_db
-from schemas import APIResponse, AssessmentResponse, DimensionScore
+from schemas import APIResponse, AssessmentResponse, AssessmentStatus, DimensionScore
 from services.assessment_service import AssessmentService
+from services.job_queue import assessment_queue, QueueFullError
+from services.progress import progress_tracker, estimate_progress, stream_task_events
+from services.pagination import keyset_page, count_cache, set_page_headers, InvalidCursor
+from services.score_history import score_history, trend_of
 from models.database import AssessmentTask
 
 router = APIRouter(prefix="/assessments", tags=["Assessments"])
@@ -60,10 +67,9 @@ def get_assessment(task_code: str, db: Session = Depends(get_db)):
 @router.post("/{task_id}/start", response_model=APIResponse)
 def start_assessment(
     task_id: str,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
-    """启动测评任务（异步执行）"""
+    """启动测评任务（入队后由Worker异步执行，队列已满时返回503）"""
     task = AssessmentService.get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="测评任务不存在")
@@ -71,12 +77,22 @@ def start_assessment(
     if task.status != "pending":
         raise HTTPException(status_code=400, detail=f"任务状态为 {task.status}，无法启动")
     
-    # 后台执行测评
-    background_tasks.add_task(AssessmentService.run_assessment, db, task_id)
+    if task.queued_at:
+        raise HTTPException(status_code=400, detail="任务已在队列中")
+    
+    # 入队，Worker使用独立的数据库会话执行测评
+    try:
+        assessment_queue.submit(db, task)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     
     return APIResponse(
         message="测评任务已启动",
-        data={"task_id": task_id, "status": "running"}
+        data={"task_id": task_id, "status": task.status, "queued": True}
     )
 
 @router.get("/{task_id}/status", response_model=APIResponse)
@@ -86,33 +102,74 @@ def get_assessment_status(task_id: str, db: Session = Depends(get_db)):
     if not task:
         raise HTTPException(status_code=404, detail="测评任务不存在")
     
-    # 计算进度（简化版）
-    progress = 0
-    if task.status == "pending":
-        progress = 0
-    elif task.status == "running":
-        progress = 50  # 模拟进度
-    elif task.status == "completed":
-        progress = 100
+    # 计算进度：优先使用Worker上报的实时进度
+    snapshot = progress_tracker.snapshot(task.id) if task.status == "running" else None
+    if snapshot:
+        progress = snapshot["progress_percent"]
+        remaining = snapshot["estimated_remaining_seconds"]
+    else:
+        progress, remaining = estimate_progress(task.status, task.started_at)
+    
+    status = AssessmentStatus(
+        task_id=task_id,
+        status=task.status,
+        progress_percent=progress,
+        current_test=snapshot["current_test"] if snapshot else None,
+        estimated_remaining_seconds=remaining
+    )
     
     return APIResponse(data={
-        "task_id": task_id,
+        **status.model_dump(),
         "task_code": task.task_code,
-        "status": task.status,
-        "progress_percent": progress,
         "total_score": round(task.total_score, 2) if task.total_score else None,
-        "level": task.level
+        "level": task.level,
+        "events_url": f"/assessments/{task_id}/events"
     })
 
+@router.get("/{task_id}/events")
+def stream_assessment_events(task_id: str, db: Session = Depends(get_db)):
+    """订阅测评进度（Server-Sent Events）"""
+    task = AssessmentService.get_task(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="测评任务不存在")
+    
+    return StreamingResponse(
+        stream_task_events(task.id, task.task_code, task.status),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/agents/{agent_id}/history", response_model=APIResponse)
+def get_agent_history(
+    agent_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    points: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Agent历史成绩曲线（测评次数超过points时按时间分桶降采样，每点含平均/最低/最高分）"""
+    history = score_history.series(db, agent_id, since, until, points)
+    recent = score_history.recent(db, agent_id)
+    scores = [p.score for p in recent]
+    history["latest_score"] = round(scores[-1], 2) if scores else None
+    history["delta"] = round(scores[-1] - scores[-2], 2) if len(scores) > 1 else None
+    history["trend"] = trend_of(scores)
+    return APIResponse(data=history)
+
 @router.get("", response_model=APIResponse)
 def list_assessments(
+    response: Response,
     agent_id: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """列出测评任务"""
+    """
+    列出测评任务（游标分页，下一页游标和总数见X-Next-Cursor / X-Total-Count响应头）
+    skip仅在未传cursor时生效
+    """
     query = db.query(AssessmentTask)
     
     if agent_id:
@@ -120,7 +177,17 @@ def list_assessments(
     if status:
         query = query.filter(AssessmentTask.status == status)
     
-    tasks = query.order_by(AssessmentTask.created_at.desc()).offset(skip).limit(limit).all()
+    try:
+        tasks, next_cursor = keyset_page(
+            query, [AssessmentTask.created_at, AssessmentTask.id], cursor, limit, skip=skip
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = count_cache.get(
+        f"assessments:{agent_id or ''}:{status or ''}",
+        lambda: query.with_entities(func.count(AssessmentTask.id)).scalar()
+    )
+    set_page_headers(response, next_cursor, total)
     
     return APIResponse(data=[
         {
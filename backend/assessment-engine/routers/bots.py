@@ -4,9 +4,10 @@ Bot端API - Agent-First架构核心
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Header, BackgroundTasks, Body
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, List, Callable, Dict, Any
 from datetime import datetime, timedelta
 import random
 import string
@@ -18,6 +19,14 @@ from models.database import (
 )
 from schemas import APIResponse
 from services.assessment_service import AssessmentService
+from services.job_queue import assessment_queue
+from services.progress import progress_tracker, estimate_progress, stream_task_events
+from services.idempotency import idempotency, IdempotencyConflict
+from services.report_payloads import report_payloads, payload_response
+from services.pdf_service import pdf_renderer, report_pdf_data, RenderQueueFull
+from services.temp_token_auth import (
+    TempTokenInfo, temp_token_cache, temp_token_auth, active_temp_token, valid_temp_token, unbound_temp_token
+)
 
 router = APIRouter(prefix="/api/v1/bots", tags=["Bot API"])
 
@@ -31,6 +40,14 @@ class AssessmentRequest(BaseModel):
     agent_id: str
     callback_url: Optional[str] = None
 
+class BatchAssessmentItem(BaseModel):
+    agent_id: str
+    temp_token: str
+    callback_url: Optional[str] = None
+
+class BatchAssessmentRequest(BaseModel):
+    items: List[BatchAssessmentItem] = Field(..., min_length=1, max_length=1000)
+
 class BindRequest(BaseModel):
     invite_code: str
 
@@ -59,6 +76,30 @@ def get_temp_token_from_header(temp_token: Optional[str] = Header(None)):
         raise HTTPException(status_code=401, detail="缺少X-Temp-Token头")
     return temp_token
 
+def run_idempotent(
+    scope: str,
+    idempotency_key: Optional[str],
+    payload: Any,
+    handler: Callable[[], Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    按Idempotency-Key执行请求
+    重试请求直接返回首次响应；处理失败（含HTTP错误）时不缓存，允许重试
+    """
+    try:
+        cached = idempotency.begin(scope, idempotency_key, payload)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if cached is not None:
+        return cached
+    
+    try:
+        response = handler()
+    except Exception:
+        idempotency.release(scope, idempotency_key)
+        raise
+    return idempotency.complete(scope, idempotency_key, payload, response)
+
 # ============== 1. 获取临时Token (冷启动) ==============
 
 @router.post("/temp-token", response_model=APIResponse)
@@ -73,7 +114,8 @@ def create_temp_token(
     # 检查是否已有活跃的临时Token
     existing = db.query(TempToken).filter(
         TempToken.agent_id == request.agent_id,
-        TempToken.status == "active"
+        TempToken.status == "active",
+        TempToken.expires_at > datetime.utcnow()
     ).first()
     
     if existing:
@@ -113,136 +155,178 @@ def create_temp_token(
         }
     }
 
+@router.post("/temp-token/revoke", response_model=APIResponse)
+def revoke_temp_token(
+    temp_token: TempTokenInfo = Depends(active_temp_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Bot吊销自己的临时Token（泄露或不再使用时）
+    吊销后立即失效，已创建的测评和报告不受影响
+    """
+    # 以数据库中的状态为准（缓存快照可能已过时）
+    revoked = db.query(TempToken).filter(
+        TempToken.id == temp_token.id,
+        TempToken.status.in_(["active", "bound"])
+    ).update({"status": "revoked"}, synchronize_session=False)
+    db.commit()
+    temp_token_cache.invalidate(temp_token.temp_token_code)
+    if not revoked:
+        raise HTTPException(status_code=401, detail="Token无效")
+    
+    return APIResponse(message="临时Token已吊销", data={
+        "temp_token_code": temp_token.temp_token_code,
+        "status": "revoked"
+    })
+
 # ============== 2. 发起测评 ==============
 
 @router.post("/assessments")
 def create_assessment(
     request: AssessmentRequest,
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(valid_temp_token),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """
     Bot自主发起测评
-    立即执行模拟测评并返回结果
+    任务进入队列后立即返回task_code，测评由后台Worker执行
+    携带Idempotency-Key重试时返回首次创建的任务，不会重复创建
     """
-    # 验证临时Token
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code,
-        TempToken.status.in_(["active", "bound"]),
-        TempToken.expires_at > datetime.utcnow()
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="临时Token无效或已过期")
-    
+    return run_idempotent(
+        f"bots.assessments:{temp_token.temp_token_code}",
+        idempotency_key,
+        request.model_dump(),
+        lambda: _create_assessment(request, temp_token, db)
+    )
+
+def _create_assessment(request: AssessmentRequest, temp_token: TempTokenInfo, db: Session) -> Dict[str, Any]:
     if temp_token.agent_id != request.agent_id:
         raise HTTPException(status_code=403, detail="Token与Agent ID不匹配")
     
     # 创建测评任务
-    from services.assessment_service import AssessmentService
     task_code = AssessmentService.generate_task_code()
-    
-    from models.database import AssessmentTask
     task = AssessmentTask(
         task_code=task_code,
         agent_id=request.agent_id,
         agent_name=temp_token.agent_name or request.agent_id,
         temp_token_id=temp_token.id,
         initiated_by="bot",
-        status="running",
+        status="pending",
         callback_url=request.callback_url
     )
-    
     db.add(task)
-    db.commit()
-    db.refresh(task)
-    
-    # 立即执行标准化测评 V2
-    from services.assessment_engine_v2 import run_standardized_assessment_v2
-    result = run_standardized_assessment_v2(request.agent_id, temp_token.agent_name)
-    
-    # 更新任务结果
-    task.status = "completed"
-    task.tool_score = result["dimensions"]["tool_usage"]["score"]
-    task.reasoning_score = result["dimensions"]["reasoning"]["score"]
-    task.interaction_score = result["dimensions"]["interaction"]["score"]
-    task.stability_score = result["dimensions"]["stability"]["score"]
-    task.total_score = result["raw_score"]
-    task.level = result["level"]
-    task.duration_seconds = 5
-    db.commit()
-    
-    # 生成报告（转换为旧格式兼容）
-    from services.mock_engine import generate_free_report, generate_full_report
-    from models.database import Report
-    
-    # 转换为旧格式
-    legacy_result = {
-        "total_score": result["raw_score"],
-        "level": result["level"],
-        "ranking_percentile": result["ranking_percentile"],
-        "tool_score": result["dimensions"]["tool_usage"]["score"],
-        "reasoning_score": result["dimensions"]["reasoning"]["score"],
-        "interaction_score": result["dimensions"]["interaction"]["score"],
-        "stability_score": result["dimensions"]["stability"]["score"]
-    }
-    
-    free_report_data = generate_free_report(task_code, request.agent_id, legacy_result)
-    full_report_data = generate_full_report(task_code, request.agent_id, legacy_result)
-    
-    report = Report(
-        report_code=f"OCR-{datetime.now().strftime('%Y%m%d')}{random.randint(1000,9999)}",
-        task_id=task.id,
-        summary=free_report_data["score"],
-        dimensions=full_report_data["dimensions"],
-        recommendations=full_report_data["recommendations"],
-        ranking_percentile=free_report_data["score"]["percentile"],
-        json_report=full_report_data,
-        is_deep_report=1  # 免费模式下默认解锁
-    )
-    db.add(report)
-    db.commit()
     
-    # 更新排行榜
-    from services.assessment_service import AssessmentService
-    AssessmentService._update_ranking(db, task)
+    # 入队（与任务创建在同一次提交中完成）
+    assessment_queue.enqueue(db, task)
     
     return {
         "code": 200,
-        "message": "测评完成",
+        "message": "测评已提交",
         "data": {
             "task_code": task_code,
-            "status": "completed",
-            "total_score": result["raw_score"],
-            "weighted_score": result["weighted_score"],
-            "level": result["level"],
-            "duration_seconds": 5,
+            "status": "pending",
+            "status_url": f"/api/v1/bots/assessments/{task_code}",
             "free_report_url": f"/api/v1/bots/reports/{task_code}/free",
             "full_report_url": f"/api/v1/bots/reports/{task_code}/full",
-            "message": "测评已完成，可立即获取报告"
+            "message": "测评已进入队列，请通过status_url查询进度"
+        }
+    }
+
+# ============== 2.1 批量发起测评 ==============
+
+@router.post("/assessments/batch")
+def create_assessments_batch(
+    request: BatchAssessmentRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    批量发起测评（Agent集群）
+    一次查询校验全部临时Token，一次批量插入并入队，返回每个Agent的task_code
+    """
+    codes = {item.temp_token for item in request.items}
+    tokens = {
+        t.temp_token_code: t
+        for t in db.query(TempToken).filter(
+            TempToken.temp_token_code.in_(codes),
+            TempToken.status.in_(["active", "bound"]),
+            TempToken.expires_at > datetime.utcnow()
+        ).all()
+    }
+    
+    accepted, rejected = [], []
+    for item in request.items:
+        temp_token = tokens.get(item.temp_token)
+        if not temp_token:
+            rejected.append({"agent_id": item.agent_id, "reason": "临时Token无效或已过期"})
+        elif temp_token.agent_id != item.agent_id:
+            rejected.append({"agent_id": item.agent_id, "reason": "Token与Agent ID不匹配"})
+        else:
+            accepted.append((item, temp_token))
+    
+    # 生成批次内唯一、且与已有任务不冲突的task_code
+    task_codes = _generate_unique_task_codes(db, len(accepted))
+    
+    rows = [
+        {
+            "task_code": task_code,
+            "agent_id": item.agent_id,
+            "agent_name": temp_token.agent_name or item.agent_id,
+            "temp_token_id": temp_token.id,
+            "initiated_by": "bot",
+            "callback_url": item.callback_url
+        }
+        for (item, temp_token), task_code in zip(accepted, task_codes)
+    ]
+    assessment_queue.enqueue_many(db, rows)
+    
+    return {
+        "code": 200,
+        "message": "批量测评已提交",
+        "data": {
+            "accepted": len(rows),
+            "rejected": len(rejected),
+            "tasks": [
+                {
+                    "agent_id": row["agent_id"],
+                    "task_code": row["task_code"],
+                    "status": "pending",
+                    "status_url": f"/api/v1/bots/assessments/{row['task_code']}"
+                }
+                for row in rows
+            ],
+            "errors": rejected
         }
     }
 
+def _generate_unique_task_codes(db: Session, count: int) -> List[str]:
+    """批量生成task_code，冲突时重新生成（每轮一次查询）"""
+    codes: set = set()
+    while len(codes) < count:
+        candidates = set()
+        while len(candidates) < count - len(codes):
+            code = AssessmentService.generate_task_code()
+            if code not in codes:
+                candidates.add(code)
+        taken = {
+            row[0] for row in db.query(AssessmentTask.task_code).filter(
+                AssessmentTask.task_code.in_(candidates)
+            ).all()
+        }
+        codes |= candidates - taken
+    return list(codes)
+
 # ============== 3. 查询测评状态 ==============
 
 @router.get("/assessments/{task_code}", response_model=APIResponse)
 def get_assessment_status(
     task_code: str,
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(active_temp_token),
     db: Session = Depends(get_db)
 ):
     """
     Bot查询测评状态和进度
     """
-    # 验证Token
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code,
-        TempToken.status.in_(["active", "bound"])
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="Token无效")
-    
     # 查询任务
     task = db.query(AssessmentTask).filter(
         AssessmentTask.task_code == task_code,
@@ -252,14 +336,13 @@ def get_assessment_status(
     if not task:
         raise HTTPException(status_code=404, detail="测评任务不存在")
     
-    # 计算进度
-    progress = 0
-    if task.status == "pending":
-        progress = 0
-    elif task.status == "running":
-        progress = 50
-    elif task.status == "completed":
-        progress = 100
+    # 计算进度：优先使用Worker上报的实时进度
+    snapshot = progress_tracker.snapshot(task.id) if task.status == "running" else None
+    if snapshot:
+        progress = snapshot["progress_percent"]
+        remaining = snapshot["estimated_remaining_seconds"]
+    else:
+        progress, remaining = estimate_progress(task.status, task.started_at)
     
     return {
         "code": 200,
@@ -268,6 +351,9 @@ def get_assessment_status(
             "task_code": task_code,
             "status": task.status,
             "progress": progress,
+            "current_test": snapshot["current_test"] if snapshot else None,
+            "estimated_remaining_seconds": remaining,
+            "events_url": f"/api/v1/bots/assessments/{task_code}/events",
             "total_score": task.total_score if task.status == "completed" else None,
             "level": task.level if task.status == "completed" else None,
             "free_report_available": task.status == "completed",
@@ -275,65 +361,65 @@ def get_assessment_status(
         }
     }
 
-# ============== 4. 获取免费版报告 ==============
-
-@router.get("/reports/{task_code}/free")
-def get_free_report(
+@router.get("/assessments/{task_code}/events")
+def stream_assessment_events(
     task_code: str,
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(active_temp_token),
     db: Session = Depends(get_db)
 ):
     """
-    Bot获取免费版结构化报告（JSON格式）
-    仅包含：总分、等级、排名百分位、摘要
+    Bot订阅测评进度（Server-Sent Events）
+    推送progress/dimension事件（引擎逐个上报用例时另有case事件），结束时推送completed或failed事件后关闭连接
     """
-    # 验证Token
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="Token无效")
-    
-    # 查询任务和报告
+    # 查询任务
     task = db.query(AssessmentTask).filter(
         AssessmentTask.task_code == task_code,
-        AssessmentTask.agent_id == temp_token.agent_id,
-        AssessmentTask.status == "completed"
+        AssessmentTask.agent_id == temp_token.agent_id
     ).first()
     
     if not task:
-        raise HTTPException(status_code=404, detail="测评未完成或不存在")
+        raise HTTPException(status_code=404, detail="测评任务不存在")
     
-    # 通过task_id查询报告
-    report = db.query(Report).filter(Report.task_id == task.id).first()
-    if not report:
-        raise HTTPException(status_code=404, detail="报告不存在")
-    
-    # 从json_report中获取免费版数据
-    json_report = report.json_report or {}
-    score_data = json_report.get("score", {})
-    
-    free_report = {
-        "version": "1.0",
-        "task_code": task_code,
-        "agent_id": task.agent_id,
-        "generated_at": report.created_at.isoformat() if report.created_at else None,
-        "score": {
-            "total": score_data.get("total", task.total_score),
-            "max": 1000,
-            "level": score_data.get("level", task.level),
-            "percentile": score_data.get("percentile", report.ranking_percentile)
-        },
-        "summary": f"Agent {task.agent_id} 测评完成，总分{task.total_score}分",
-        "upgrade_prompt": "免费模式下所有报告已解锁，可直接获取完整报告"
-    }
+    return StreamingResponse(
+        stream_task_events(task.id, task_code, task.status),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============== 4. 获取免费版报告 ==============
+
+@router.get("/reports/{task_code}/free")
+def get_free_report(
+    task_code: str,
+    temp_token: TempTokenInfo = Depends(temp_token_auth),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: Session = Depends(get_db)
+):
+    """
+    Bot获取免费版结构化报告（JSON格式）
+    仅包含：总分、等级、排名百分位、摘要
+    响应为生成时预序列化的字节，带ETag，If-None-Match命中返回304
+    """
+    payload = report_payloads.get(task_code, "free", temp_token.agent_id)
+    if payload is None:
+        # 查询任务和报告
+        task = db.query(AssessmentTask).filter(
+            AssessmentTask.task_code == task_code,
+            AssessmentTask.agent_id == temp_token.agent_id,
+            AssessmentTask.status == "completed"
+        ).first()
+        
+        if not task:
+            raise HTTPException(status_code=404, detail="测评未完成或不存在")
+        
+        # 通过task_id查询报告
+        report = db.query(Report).filter(Report.task_id == task.id).first()
+        if not report:
+            raise HTTPException(status_code=404, detail="报告不存在")
+        
+        payload = report_payloads.load(db, task, report, "free")
     
-    return {
-        "code": 200,
-        "message": "success",
-        "data": free_report
-    }
+    return payload_response(payload, if_none_match)
 
 # ============== 5. 生成深度报告支付链接 ==============
 
@@ -342,20 +428,12 @@ def create_payment_link(
     task_code: str,
     channel: str,  # wechat/alipay/stripe/paypal
     currency: str = "CNY",
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(temp_token_auth),
     db: Session = Depends(get_db)
 ):
     """
     Bot生成深度报告解锁的支付链接
     """
-    # 验证Token
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="Token无效")
-    
     # 查询任务
     task = db.query(AssessmentTask).filter(
         AssessmentTask.task_code == task_code,
@@ -410,86 +488,50 @@ def create_payment_link(
 @router.get("/reports/{task_code}/full", response_model=APIResponse)
 def get_full_report(
     task_code: str,
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(temp_token_auth),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
     db: Session = Depends(get_db)
 ):
     """
     Bot获取完整深度报告（JSON格式）
     需要深度报告已解锁
+    响应为生成/解锁时预序列化的字节，带ETag，If-None-Match命中返回304
     """
-    # 验证Token
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="Token无效")
-    
-    # 查询任务和报告
-    task = db.query(AssessmentTask).filter(
-        AssessmentTask.task_code == task_code,
-        AssessmentTask.agent_id == temp_token.agent_id
-    ).first()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
-    # 通过task_id查询报告
-    report = db.query(Report).filter(Report.task_id == task.id).first()
-    if not report:
-        raise HTTPException(status_code=404, detail="报告不存在")
-    
-    # 免费模式下默认解锁
-    # if report.is_deep_report != 1:
-    #     raise HTTPException(status_code=403, detail="深度报告未解锁，请先支付")
-    
-    # 返回完整结构化报告
-    full_report = report.json_report or {
-        "version": "1.0",
-        "task_code": task_code,
-        "agent_id": task.agent_id,
-        "generated_at": report.created_at.isoformat() if report.created_at else None,
-        "score": {
-            "total": task.total_score,
-            "max": 1000,
-            "level": task.level,
-            "percentile": report.ranking_percentile
-        },
-        "dimensions": report.dimensions,
-        "recommendations": report.recommendations,
-        "ranking": {
-            "global_rank": 42,
-            "total_agents": 1000,
-            "top_percentile": 4.2
-        }
-    }
+    payload = report_payloads.get(task_code, "full", temp_token.agent_id)
+    if payload is None:
+        # 查询任务和报告
+        task = db.query(AssessmentTask).filter(
+            AssessmentTask.task_code == task_code,
+            AssessmentTask.agent_id == temp_token.agent_id
+        ).first()
+        
+        if not task:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        
+        # 通过task_id查询报告
+        report = db.query(Report).filter(Report.task_id == task.id).first()
+        if not report:
+            raise HTTPException(status_code=404, detail="报告不存在")
+        
+        # 免费模式下默认解锁
+        # if report.is_deep_report != 1:
+        #     raise HTTPException(status_code=403, detail="深度报告未解锁，请先支付")
+        
+        payload = report_payloads.load(db, task, report, "full")
     
-    return {
-        "code": 200,
-        "message": "success",
-        "data": full_report
-    }
+    return payload_response(payload, if_none_match)
 
 # ============== 7. 主动绑定人类账户 ==============
 
 @router.post("/bind")
 def bind_to_human(
     request: BindRequest,
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(unbound_temp_token),
     db: Session = Depends(get_db)
 ):
     """
     Bot主动发起与人类账户的绑定
     """
-    # 验证Token
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code,
-        TempToken.status == "active"
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="临时Token无效或已过期")
-    
     # 查找邀请码对应的人类用户
     user = db.query(User).filter(
         User.invite_code == request.invite_code,
@@ -512,6 +554,19 @@ def bind_to_human(
             "data": {"status": "already_bound"}
         }
     
+    # 更新临时Token状态（仅当仍为active：并发绑定/吊销时只有一个请求成功）
+    claimed = db.query(TempToken).filter(
+        TempToken.id == temp_token.id,
+        TempToken.status == "active"
+    ).update({
+        "status": "bound",
+        "bound_to_user_id": user.id
+    }, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        temp_token_cache.invalidate(temp_token.temp_token_code)
+        raise HTTPException(status_code=409, detail="临时Token已被绑定或吊销")
+    
     # 创建绑定关系
     binding = AgentBinding(
         agent_id=temp_token.agent_id,
@@ -530,13 +585,10 @@ def bind_to_human(
         status="active"
     )
     
-    # 更新临时Token状态
-    temp_token.status = "bound"
-    temp_token.bound_to_user_id = user.id
-    
     db.add(binding)
     db.add(bound_token)
     db.commit()
+    temp_token_cache.invalidate(temp_token.temp_token_code)
     
     return {
         "code": 200,
@@ -574,20 +626,13 @@ def bind_to_human(
 @router.get("/reports/{task_code}/pdf")
 def download_pdf_report(
     task_code: str,
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(temp_token_auth),
     db: Session = Depends(get_db)
 ):
     """
     Bot下载PDF格式报告
+    已渲染时直接返回文件；渲染中返回202（带Retry-After），Bot稍后重试即可
     """
-    # 验证Token
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="Token无效")
-    
     # 查询任务和报告
     task = db.query(AssessmentTask).filter(
         AssessmentTask.task_code == task_code,
@@ -598,49 +643,49 @@ def download_pdf_report(
     if not task or not task.report:
         raise HTTPException(status_code=404, detail="测评未完成或不存在")
     
-    # 准备报告数据
-    json_report = task.report.json_report or {}
-    report_data = {
-        "agent_id": task.agent_id,
-        "task_code": task_code,
-        "total_score": task.total_score,
-        "level": task.level,
-        "dimensions": json_report.get("dimensions", {})
-    }
+    # 渲染在进程池中进行，报告生成后已预渲染，通常直接命中磁盘缓存
+    try:
+        future = pdf_renderer.submit(report_pdf_data(task, task.report))
+    except RenderQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     
-    # 生成PDF（使用WeasyPrint新版）
-    from services.pdf_service_v2 import generate_pdf_report
+    if not future.done():
+        retry_after = pdf_renderer.estimate_wait_seconds()
+        return JSONResponse(
+            status_code=202,
+            content={
+                "code": 202,
+                "message": "PDF生成中，请稍后重试",
+                "data": {"status": "rendering", "retry_after": retry_after}
+            },
+            headers={"Retry-After": str(retry_after)}
+        )
     
     try:
-        pdf_data = generate_pdf_report(report_data)
-        
-        # 返回PDF文件
-        from fastapi.responses import Response
-        return Response(
-            content=pdf_data,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=OAEAS_Report_{task_code}.pdf"}
-        )
+        path = future.result()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF生成失败: {str(e)}")
+    
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        filename=f"OAEAS_Report_{task_code}.pdf"
+    )
 
 # ============== 9. 查询绑定状态 ==============
 
 @router.get("/bind/status", response_model=APIResponse)
 def get_bind_status(
-    temp_token_code: str = Header(..., alias="X-Temp-Token"),
+    temp_token: TempTokenInfo = Depends(temp_token_auth),
     db: Session = Depends(get_db)
 ):
     """
     查询Bot的绑定状态
     """
-    temp_token = db.query(TempToken).filter(
-        TempToken.temp_token_code == temp_token_code
-    ).first()
-    
-    if not temp_token:
-        raise HTTPException(status_code=401, detail="Token无效")
-    
     binding = db.query(AgentBinding).filter(
         AgentBinding.agent_id == temp_token.agent_id,
         AgentBinding.status == "active"
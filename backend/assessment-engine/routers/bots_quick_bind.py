@@ -2,17 +2,20 @@
 Bot一键绑定API - 合并获取Token和绑定两个步骤
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from pydantic import BaseModel
 import random
 import string
 
 from database import get_db
 from models.database import TempToken, BoundToken, AgentBinding, User, Token
-from routers.bots import generate_temp_token_code, generate_bound_token_code
+from routers.bots import generate_temp_token_code, generate_bound_token_code, run_idempotent
+from services.temp_token_auth import temp_token_cache
 from services.assessment_service import AssessmentService
+from services.job_queue import assessment_queue
 from schemas import AssessmentCreate
 
 router = APIRouter(prefix="/api/v1/bots", tags=["Bot Quick Setup"])
@@ -36,12 +39,22 @@ class QuickBindRequest(BaseModel):
 @router.post("/quick-bind")
 def quick_bind(
     request: QuickBindRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """
     Bot一键绑定 - 同时完成获取Token和绑定
     简化流程：只需调用一次，传入agent_id即可（无需invite_code）
+    携带Idempotency-Key重试时返回首次响应，不会重复创建Token和测评
     """
+    return run_idempotent(
+        f"bots.quick_bind:{request.agent_id}",
+        idempotency_key,
+        request.model_dump(),
+        lambda: _quick_bind(request, db)
+    )
+
+def _quick_bind(request: QuickBindRequest, db: Session):
     # 如果没有提供邀请码，自动绑定到任意一个有邀请码的用户
     if not request.invite_code:
         # 查找任意一个有效的邀请码用户（用于兼容旧流程）
@@ -132,21 +145,35 @@ def quick_bind(
             agent_description="通过quick-bind自动创建（已绑定）"
         )
         assessment_task = AssessmentService.create_assessment(db, assessment_data)
-        AssessmentService.run_assessment(db, assessment_task.id)
+        assessment_queue.enqueue(db, assessment_task)
         
         return {
             "code": 200,
-            "message": "已绑定，测评已启动",
+            "message": "已绑定，测评已提交",
             "data": {
                 "temp_token": temp_token.temp_token_code,
                 "status": "already_bound",
                 "assessment_task_id": assessment_task.id,
+                "task_code": assessment_task.task_code,
                 "user_email": user.email,
                 "user_name": user.name
             }
         }
     
-    # 4. 创建绑定关系
+    # 4. 更新临时Token状态（仅当仍为active）
+    claimed = db.query(TempToken).filter(
+        TempToken.id == temp_token.id,
+        TempToken.status == "active"
+    ).update({
+        "status": "bound",
+        "bound_to_user_id": user.id
+    }, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        temp_token_cache.invalidate(temp_token.temp_token_code)
+        raise HTTPException(status_code=409, detail="临时Token已被绑定或吊销")
+    
+    # 5. 创建绑定关系
     binding = AgentBinding(
         agent_id=request.agent_id,
         user_id=user.id,
@@ -155,7 +182,7 @@ def quick_bind(
         status="active"
     )
     
-    # 5. 创建正式Token
+    # 6. 创建正式Token
     bound_token = BoundToken(
         token_code=generate_bound_token_code(),
         agent_id=request.agent_id,
@@ -164,13 +191,10 @@ def quick_bind(
         status="active"
     )
     
-    # 6. 更新临时Token状态
-    temp_token.status = "bound"
-    temp_token.bound_to_user_id = user.id
-    
     db.add(binding)
     db.add(bound_token)
     db.commit()
+    temp_token_cache.invalidate(temp_token.temp_token_code)
     
     # 7. 自动创建测评任务
     assessment_data = AssessmentCreate(
@@ -181,18 +205,19 @@ def quick_bind(
     )
     assessment_task = AssessmentService.create_assessment(db, assessment_data)
     
-    # 8. 启动测评（同步执行）
-    AssessmentService.run_assessment(db, assessment_task.id)
+    # 8. 测评入队，由后台Worker执行
+    assessment_queue.enqueue(db, assessment_task)
     
     return {
         "code": 200,
-        "message": "绑定成功，测评已启动",
+        "message": "绑定成功，测评已提交",
         "data": {
             "temp_token": temp_token.temp_token_code,
             "bound_token": bound_token.token_code,
             "user_email": user.email,
             "user_name": user.name,
             "assessment_task_id": assessment_task.id,
-            "message": "绑定成功！测评已自动开始，请等待结果..."
+            "task_code": assessment_task.task_code,
+            "message": "绑定成功！测评已进入队列，请等待结果..."
         }
     }
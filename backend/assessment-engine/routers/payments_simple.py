@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from database import get_db
 from schemas import APIResponse
 from models.database import PaymentOrder, Report
+from services.webhooks import webhook_dispatcher
+from services.report_payloads import report_payloads
 from datetime import datetime
 import uuid
 import base64
@@ -89,6 +91,11 @@ def confirm_payment_manually(
     
     db.commit()
     
+    # 通知Bot报告已解锁
+    if report:
+        report_payloads.refresh(db, report)
+        webhook_dispatcher.report_unlocked(report.id)
+    
     return APIResponse(
         message="支付确认成功，报告已解锁",
         data={
@@ -10,12 +10,27 @@ router = APIRouter(prefix="/rankings", tags=["Rankings"])
 @router.get("")
 def get_rankings(
     agent_type: Optional[str] = None,
+    period: str = "all",
+    dimension: str = "total_score",
+    level: Optional[str] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """获取排行榜"""
-    rankings = RankingService.get_rankings(db, agent_type, skip, limit)
+    """
+    获取排行榜
+    period: all（历史最高分）/ daily / weekly / monthly（当前时间窗口内的最高分）
+    dimension: total_score / tool_score / reasoning_score / interaction_score / stability_score（各维度历史最高分，仅period=all）
+    agent_type、level可任意组合筛选，rank为该榜的全局名次
+    传入上一页返回的next_cursor翻页；skip仅在未传cursor时生效
+    """
+    try:
+        rankings, next_cursor, total = RankingService.get_rankings_page(
+            db, agent_type, cursor, skip, limit, period=period, dimension=dimension, level=level
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "code": 200,
@@ -26,13 +41,17 @@ def get_rankings(
                     "rank": r.rank,
                     "agent_name": r.agent_name,
                     "agent_type": r.agent_type,
+                    "score": round(r.score, 2),
                     "total_score": round(r.total_score, 2),
                     "level": r.level,
                     "task_count": r.task_count
                 }
                 for r in rankings
             ],
-            "total": len(rankings)
+            "period": period,
+            "dimension": dimension,
+            "total": total,
+            "next_cursor": next_cursor
         }
     }
 
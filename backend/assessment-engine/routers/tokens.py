@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from database import get_db
@@ -7,6 +7,7 @@ from schemas import (
     AssessmentResponse, AssessmentStatus
 )
 from services.assessment_service import TokenService, AssessmentService
+from services.pagination import InvalidCursor, set_page_headers
 
 router = APIRouter(prefix="/tokens", tags=["Tokens"])
 
@@ -27,13 +28,22 @@ def create_token(
 
 @router.get("", response_model=APIResponse)
 def list_tokens(
+    response: Response,
     user_id: str = "user_001",
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """列出用户的所有Token"""
-    tokens = TokenService.list_tokens(db, user_id, skip, limit)
+    """
+    列出用户的所有Token（游标分页，下一页游标和总数见X-Next-Cursor / X-Total-Count响应头）
+    skip仅在未传cursor时生效
+    """
+    try:
+        tokens, next_cursor = TokenService.list_tokens(db, user_id, cursor, limit, skip=skip)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_page_headers(response, next_cursor, TokenService.count_tokens(db, user_id))
     return APIResponse(
         data=[TokenResponse.from_orm(t) for t in tokens]
     )
@@ -3,7 +3,9 @@
 极简设计，仅保留核心功能
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
@@ -14,6 +16,8 @@ import string
 from database import get_db
 from models.database import User, TempToken, BoundToken, AgentBinding, AssessmentTask
 from schemas import APIResponse
+from services.pagination import keyset_page, count_cache, set_page_headers, InvalidCursor
+from services.user_auth import UserContext, create_access_token, get_user_context
 
 router = APIRouter(prefix="/api/v1/users", tags=["User API"])
 
@@ -58,12 +62,7 @@ def register_user(
     db.refresh(user)
     
     # 生成JWT token - 注册
-    import jwt
-    token = jwt.encode(
-        {"user_id": str(user.id), "email": user.email, "exp": datetime.utcnow() + timedelta(days=7)},
-        "ocbjwtsecret2026",
-        algorithm="HS256"
-    )
+    token = create_access_token(user)
     
     return {
         "code": 200,
@@ -92,12 +91,7 @@ def login_user(
         raise HTTPException(status_code=401, detail="邮箱或密码错误")
     
     # 生成JWT token - 登录
-    import jwt
-    token = jwt.encode(
-        {"user_id": str(user.id), "email": user.email, "exp": datetime.utcnow() + timedelta(days=7)},
-        "ocbjwtsecret2026",
-        algorithm="HS256"
-    )
+    token = create_access_token(user)
     
     return {
         "code": 200,
@@ -111,42 +105,18 @@ def login_user(
         }
     }
 
-# ============== JWT验证依赖 ==============
-
-from fastapi import Header
-from typing import Optional
-
-def get_current_user_id(authorization: Optional[str] = Header(None)) -> str:
-    """从Authorization header提取user_id"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="缺少认证信息")
-    
-    try:
-        # 提取token
-        token = authorization.replace("Bearer ", "") if authorization.startswith("Bearer ") else authorization
-        # 解码JWT
-        import jwt
-        payload = jwt.decode(token, "ocbjwtsecret2026", algorithms=["HS256"])
-        return payload.get("user_id")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token已过期")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="无效的Token")
-
 # ============== 3. 生成绑定邀请码 ==============
 
 @router.post("/invite-code", response_model=APIResponse)
 def generate_invite(
-    user_id: str = Depends(get_current_user_id),
+    ctx: UserContext = Depends(get_user_context),
     db: Session = Depends(get_db)
 ):
     """
     生成Bot绑定邀请码
     有效期7天
     """
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="用户不存在")
+    user = ctx.require_user()
     
     # 生成新的邀请码
     invite_code = generate_invite_code()
@@ -171,14 +141,14 @@ def generate_invite(
 
 @router.get("/bots", response_model=APIResponse)
 def get_bound_bots(
-    user_id: str,  # TODO: 从JWT获取
+    ctx: UserContext = Depends(get_user_context),
     db: Session = Depends(get_db)
 ):
     """
     查看已绑定的所有Bots
     """
     bindings = db.query(AgentBinding).filter(
-        AgentBinding.user_id == user_id,
+        AgentBinding.user_id == ctx.user_id,
         AgentBinding.status == "active"
     ).all()
     
@@ -212,24 +182,39 @@ def get_bound_bots(
 
 @router.get("/assessments", response_model=APIResponse)
 def get_user_assessments(
-    user_id: str,  # TODO: 从JWT获取
+    response: Response,
+    ctx: UserContext = Depends(get_user_context),
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
     db: Session = Depends(get_db)
 ):
     """
     查看用户名下所有Bot的测评任务
+    按创建时间倒序游标分页，下一页游标和总数见X-Next-Cursor / X-Total-Count响应头
+    skip仅在未传cursor时生效
     """
     # 获取用户绑定的所有Agent
     bindings = db.query(AgentBinding).filter(
-        AgentBinding.user_id == user_id,
+        AgentBinding.user_id == ctx.user_id,
         AgentBinding.status == "active"
     ).all()
     
     agent_ids = [b.agent_id for b in bindings]
     
-    # 查询这些Agent的所有测评任务
-    tasks = db.query(AssessmentTask).filter(
-        AssessmentTask.agent_id.in_(agent_ids)
-    ).order_by(AssessmentTask.created_at.desc()).all()
+    # 查询这些Agent的测评任务
+    query = db.query(AssessmentTask).filter(AssessmentTask.agent_id.in_(agent_ids))
+    try:
+        tasks, next_cursor = keyset_page(
+            query, [AssessmentTask.created_at, AssessmentTask.id], cursor, limit, skip=skip
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = count_cache.get(
+        f"user_assessments:{ctx.user_id}",
+        lambda: query.with_entities(func.count(AssessmentTask.id)).scalar()
+    )
+    set_page_headers(response, next_cursor, total)
     
     return APIResponse(data=[
         {
@@ -243,12 +228,42 @@ def get_user_assessments(
         for t in tasks
     ])
 
+# ============== 5.1 导出名下所有测评任务 ==============
+
+@router.get("/assessments/export")
+def export_user_assessments(
+    ctx: UserContext = Depends(get_user_context),
+    format: str = "ndjson",
+    include: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    流式导出用户名下所有Bot的测评任务（NDJSON或CSV）
+    include: 逗号分隔的可选字段 dimensions / recommendations
+    逐批读取、逐批写出，内存占用与任务总数无关
+    """
+    from services.export import FORMATS, parse_include, export_user_assessments as export_rows
+    
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format须为{'/'.join(FORMATS)}")
+    try:
+        fields = parse_include(include)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"assessments_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{format}"
+    return StreamingResponse(
+        export_rows(db.get_bind(), ctx.user_id, format, fields),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 # ============== 6. 查看报告详情 ==============
 
 @router.get("/reports/{report_code}", response_model=APIResponse)
 def get_user_report(
     report_code: str,
-    user_id: str,  # TODO: 从JWT获取
+    ctx: UserContext = Depends(get_user_context),
     db: Session = Depends(get_db)
 ):
     """
@@ -267,7 +282,7 @@ def get_user_report(
     
     binding = db.query(AgentBinding).filter(
         AgentBinding.agent_id == task.agent_id,
-        AgentBinding.user_id == user_id,
+        AgentBinding.user_id == ctx.user_id,
         AgentBinding.status == "active"
     ).first()
     
@@ -291,7 +306,7 @@ def get_user_report(
 @router.post("/reports/{report_code}/unlock", response_model=APIResponse)
 def unlock_report(
     report_code: str,
-    user_id: str,  # TODO: 从JWT获取
+    ctx: UserContext = Depends(get_user_context),
     db: Session = Depends(get_db)
 ):
     """
@@ -303,6 +318,17 @@ def unlock_report(
     if not report:
         raise HTTPException(status_code=404, detail="报告不存在")
     
+    # 验证报告是否属于该用户的Bot
+    owned = db.query(AgentBinding.id).join(
+        AssessmentTask, AssessmentTask.agent_id == AgentBinding.agent_id
+    ).filter(
+        AssessmentTask.id == report.task_id,
+        AgentBinding.user_id == ctx.user_id,
+        AgentBinding.status == "active"
+    ).first()
+    if not owned:
+        raise HTTPException(status_code=403, detail="无权操作此报告")
+    
     if report.is_deep_report == 1:
         return APIResponse(message="深度报告已解锁")
     
@@ -314,7 +340,11 @@ def unlock_report(
     report.unlocked_at = datetime.utcnow()
     db.commit()
     
-    # TODO: 通知Bot（webhook）
+    # 重新序列化Bot端报告响应，并通知Bot（webhook）
+    from services.report_payloads import report_payloads
+    from services.webhooks import webhook_dispatcher
+    report_payloads.refresh(db, report)
+    webhook_dispatcher.report_unlocked(report.id)
     
     return APIResponse(data={
         "report_code": report_code,
@@ -322,5 +352,3 @@ def unlock_report(
         "amount_paid": 9.9,
         "currency": "CNY"
     })
-
-from typing import Optional
\ No newline at end of file
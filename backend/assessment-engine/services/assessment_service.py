@@ -1,14 +1,46 @@
+import os
+import time
 import random
 import string
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from models.database import Token, AssessmentTask, TestCase, TestResult, Report, Ranking
+from models.database import Token, AssessmentTask, TestCase, TestResult, Report, Ranking, RankingRollup
+from services.progress import progress_tracker, DIMENSIONS
+from services.webhooks import webhook_dispatcher
+from services.leaderboard import (
+    leaderboard, LeaderboardEntry, PERIODS, WINDOW_RETENTION_DAYS, TOTAL, DIMENSION_COLUMNS,
+    window_start, window_board, dimension_board
+)
+from services.score_sketch import score_distribution
+from services.report_payloads import report_payloads
+from services.pdf_service import pdf_renderer, report_pdf_data
+from services.scoring_rules import scoring_rules
+from services.score_history import score_history
+from services.pagination import keyset_page, count_cache, encode_cursor, decode_cursor, MAX_PAGE_SIZE
 from schemas import (
     TokenCreate, TokenResponse, AssessmentCreate, AssessmentResponse,
     DimensionScore, AssessmentStatus, AgentType, TaskStatus, Level
 )
 
+# 过期窗口汇总的清理间隔
+ROLLUP_PURGE_INTERVAL_SECONDS = int(os.getenv("ROLLUP_PURGE_INTERVAL_SECONDS", "3600"))
+
+def standardized_engine() -> Callable[..., Dict[str, Any]]:
+    """
+    Bot标准化测评引擎: 优先使用assessment_engine_v2，未部署时回退到模拟引擎
+    （v2模块内部缺少依赖时照常抛出，不做回退）
+    """
+    try:
+        from services.assessment_engine_v2 import run_standardized_assessment_v2
+        return run_standardized_assessment_v2
+    except ModuleNotFoundError as e:
+        if e.name != "services.assessment_engine_v2":
+            raise
+        from services.mock_engine import run_standardized_mock_assessment
+        return run_standardized_mock_assessment
+
 class TokenService:
     """Token管理服务"""
     
@@ -38,6 +70,7 @@ class TokenService:
         db.add(token)
         db.commit()
         db.refresh(token)
+        count_cache.invalidate(f"tokens:{user_id}")
         return token
     
     @classmethod
@@ -46,9 +79,19 @@ class TokenService:
         return db.query(Token).filter(Token.token_code == token_code).first()
     
     @classmethod
-    def list_tokens(cls, db: Session, user_id: str, skip: int = 0, limit: int = 100) -> List[Token]:
-        """列出用户的Tokens"""
-        return db.query(Token).filter(Token.created_by == user_id).offset(skip).limit(limit).all()
+    def list_tokens(cls, db: Session, user_id: str, cursor: Optional[str] = None,
+                    limit: int = 100, skip: int = 0) -> Tuple[List[Token], Optional[str]]:
+        """列出用户的Tokens（按创建时间倒序游标分页），返回(本页, 下一页游标)"""
+        query = db.query(Token).filter(Token.created_by == user_id)
+        return keyset_page(query, [Token.created_at, Token.id], cursor, limit, skip=skip)
+    
+    @classmethod
+    def count_tokens(cls, db: Session, user_id: str) -> int:
+        """用户Token总数（缓存）"""
+        return count_cache.get(
+            f"tokens:{user_id}",
+            lambda: db.query(func.count(Token.id)).filter(Token.created_by == user_id).scalar()
+        )
     
     @classmethod
     def validate_token(cls, db: Session, token_code: str) -> tuple[bool, Optional[str]]:
@@ -145,108 +188,222 @@ class AssessmentService:
         
         # 更新状态为运行中
         task.status = TaskStatus.RUNNING.value
-        task.started_at = datetime.now(timezone.utc)
+        task.started_at = datetime.utcnow()
         db.commit()
         
         try:
-            # TODO: 实际测评逻辑
-            # 1. 获取测试用例
-            # 2. 逐一测试
-            # 3. 记录结果
-            # 4. 计算分数
-            
-            # 模拟测评结果（实际实现中替换为真实逻辑）
-            task.tool_score = random.uniform(250, 400)
-            task.reasoning_score = random.uniform(180, 300)
-            task.interaction_score = random.uniform(120, 200)
-            task.stability_score = random.uniform(60, 100)
-            task.total_score = task.tool_score + task.reasoning_score + task.interaction_score + task.stability_score
-            task.level = cls.calculate_level(task.total_score)
-            task.status = TaskStatus.COMPLETED.value
-            task.completed_at = datetime.now(timezone.utc)
-            
-            # 计算持续时间
-            if task.started_at:
-                task.duration_seconds = int((task.completed_at - task.started_at).total_seconds())
-            
-            db.commit()
-            db.refresh(task)
-            
-            # 生成报告
-            cls._generate_report(db, task)
-            
+            cls.execute_task(db, task)
         except Exception as e:
+            db.rollback()
             task.status = TaskStatus.FAILED.value
             db.commit()
+            webhook_dispatcher.assessment_finished(task.id)
             raise e
         
         return task
     
+    @classmethod
+    def execute_task(cls, db: Session, task: AssessmentTask) -> AssessmentTask:
+        """
+        执行已进入running状态的任务（由队列Worker调用）
+        Bot发起的任务走标准化测评V2，其余任务走简化测评
+        """
+        task_id = task.id
+        progress_tracker.start(task_id)
+        try:
+            if task.temp_token_id:
+                cls._execute_bot_assessment(db, task)
+            else:
+                cls._execute_assessment(db, task)
+        except Exception as e:
+            # failed状态由调用方回滚并提交后再投递通知（见AssessmentJobQueue.run_once）
+            progress_tracker.finish(task_id, TaskStatus.FAILED.value, error=str(e))
+            raise
+        
+        progress_tracker.finish(
+            task_id,
+            TaskStatus.COMPLETED.value,
+            total_score=round(task.total_score, 2),
+            level=task.level
+        )
+        webhook_dispatcher.assessment_finished(task_id)
+        return task
+    
+    @classmethod
+    def _execute_assessment(cls, db: Session, task: AssessmentTask) -> AssessmentTask:
+        """简化测评"""
+        # TODO: 实际测评逻辑
+        # 1. 获取测试用例
+        # 2. 逐一测试
+        # 3. 记录结果
+        # 4. 计算分数
+        
+        # 模拟测评结果（实际实现中替换为真实逻辑）
+        task.tool_score = random.uniform(250, 400)
+        progress_tracker.dimension_done(task.id, "tool_usage", task.tool_score)
+        task.reasoning_score = random.uniform(180, 300)
+        progress_tracker.dimension_done(task.id, "reasoning", task.reasoning_score)
+        task.interaction_score = random.uniform(120, 200)
+        progress_tracker.dimension_done(task.id, "interaction", task.interaction_score)
+        task.stability_score = random.uniform(60, 100)
+        progress_tracker.dimension_done(task.id, "stability", task.stability_score)
+        task.total_score = task.tool_score + task.reasoning_score + task.interaction_score + task.stability_score
+        task.level = cls.calculate_level(task.total_score)
+        cls._mark_completed(task)
+        
+        db.commit()
+        db.refresh(task)
+        
+        # 生成报告
+        cls._generate_report(db, task)
+        return task
+    
+    @classmethod
+    def _execute_bot_assessment(cls, db: Session, task: AssessmentTask) -> AssessmentTask:
+        """Bot标准化测评 V2，报告转换为旧格式兼容"""
+        from services.mock_engine import generate_free_report, generate_full_report
+        
+        result = standardized_engine()(task.agent_id, task.agent_name)
+        
+        # 更新任务结果
+        task.tool_score = result["dimensions"]["tool_usage"]["score"]
+        task.reasoning_score = result["dimensions"]["reasoning"]["score"]
+        task.interaction_score = result["dimensions"]["interaction"]["score"]
+        task.stability_score = result["dimensions"]["stability"]["score"]
+        task.total_score = result["raw_score"]
+        task.level = result["level"]
+        task_scores = {
+            "tool_usage": task.tool_score,
+            "reasoning": task.reasoning_score,
+            "interaction": task.interaction_score,
+            "stability": task.stability_score
+        }
+        for dimension in DIMENSIONS:
+            progress_tracker.dimension_done(task.id, dimension, task_scores[dimension])
+        cls._mark_completed(task)
+        db.commit()
+        standing = cls._record_standing(db, task)
+        
+        # 转换为旧格式
+        legacy_result = {
+            "total_score": result["raw_score"],
+            "level": result["level"],
+            "ranking_percentile": standing["percentile"],
+            "global_rank": standing["global_rank"],
+            "total_agents": standing["total_agents"],
+            "tool_score": task.tool_score,
+            "reasoning_score": task.reasoning_score,
+            "interaction_score": task.interaction_score,
+            "stability_score": task.stability_score
+        }
+        
+        free_report_data = generate_free_report(task.task_code, task.agent_id, legacy_result)
+        full_report_data = generate_full_report(
+            task.task_code, task.agent_id, legacy_result, rules=scoring_rules.get(db)
+        )
+        full_report_data["history"] = standing["history"]
+        
+        report = Report(
+            report_code=f"OCR-{datetime.now().strftime('%Y%m%d')}{random.randint(1000,9999)}",
+            task_id=task.id,
+            summary=free_report_data["score"],
+            dimensions=full_report_data["dimensions"],
+            recommendations=full_report_data["recommendations"],
+            ranking_percentile=free_report_data["score"]["percentile"],
+            json_report=full_report_data,
+            webhook_url=task.callback_url,
+            is_deep_report=1  # 免费模式下默认解锁
+        )
+        db.add(report)
+        db.commit()
+        
+        # 更新排行榜
+        cls._update_ranking(db, task)
+        report_payloads.store(db, task, report)
+        db.commit()
+        pdf_renderer.prerender([report_pdf_data(task, report)])
+        return task
+    
+    @classmethod
+    def _mark_completed(cls, task: AssessmentTask):
+        """标记任务完成并计算持续时间"""
+        task.status = TaskStatus.COMPLETED.value
+        task.completed_at = datetime.utcnow()
+        if task.started_at:
+            started_at = task.started_at.replace(tzinfo=None)
+            task.duration_seconds = int((task.completed_at - started_at).total_seconds())
+    
+    @classmethod
+    def _agent_type(cls, db: Session, task: AssessmentTask) -> str:
+        """任务所属Agent类型（旧版Token上的agent_type，Bot任务为general）"""
+        if task.token_id:
+            row = db.query(Token.agent_type).filter(Token.id == task.token_id).first()
+            if row and row[0]:
+                return row[0]
+        return AgentType.GENERAL.value
+    
+    @classmethod
+    def _record_standing(cls, db: Session, task: AssessmentTask) -> Dict[str, Any]:
+        """将本次得分计入分数分布和Agent历史成绩，返回真实百分位、全局名次和与上次的对比"""
+        agent_type = cls._agent_type(db, task)
+        scores = {
+            "total": task.total_score,
+            "tool_usage": task.tool_score,
+            "reasoning": task.reasoning_score,
+            "interaction": task.interaction_score,
+            "stability": task.stability_score
+        }
+        score_distribution.record(db, agent_type, scores)
+        global_rank = RankingService.rank_of(db, task.total_score)
+        return {
+            "agent_type": agent_type,
+            "percentile": score_distribution.percentile(None, "total", task.total_score),
+            "type_percentile": score_distribution.percentile(agent_type, "total", task.total_score),
+            "dimension_percentiles": {
+                dimension: score_distribution.percentile(agent_type, dimension, scores[dimension])
+                for dimension in DIMENSIONS
+            },
+            "global_rank": global_rank,
+            # 本次为新上榜Agent时，尚未计入榜单人数
+            "total_agents": max(RankingService.total_agents(db), global_rank),
+            "history": score_history.record(db, task)
+        }
+    
     @classmethod
     def _generate_report(cls, db: Session, task: AssessmentTask) -> Report:
         """生成测评报告"""
         # 生成报告代码
         report_code = f"OCR-{datetime.now().strftime('%Y%m%d')}{random.randint(1000, 9999)}"
         
-        # 构建维度详情
-        dimensions = {
-            "tool_usage": {
-                "score": task.tool_score,
-                "max_score": 400,
-                "weight": 0.4,
-                "details": {
-                    "tool_selection": task.tool_score * 0.3,
-                    "parameter_filling": task.tool_score * 0.3,
-                    "tool_chaining": task.tool_score * 0.25,
-                    "error_correction": task.tool_score * 0.15
-                }
-            },
-            "reasoning": {
-                "score": task.reasoning_score,
-                "max_score": 300,
-                "weight": 0.3,
-                "details": {
-                    "logic": task.reasoning_score * 0.35,
-                    "math": task.reasoning_score * 0.35,
-                    "long_text": task.reasoning_score * 0.3
-                }
-            },
-            "interaction": {
-                "score": task.interaction_score,
-                "max_score": 200,
-                "weight": 0.2,
-                "details": {
-                    "intent_recognition": task.interaction_score * 0.5,
-                    "emotion_perception": task.interaction_score * 0.5
-                }
-            },
-            "stability": {
-                "score": task.stability_score,
-                "max_score": 100,
-                "weight": 0.1,
-                "details": {
-                    "consistency": task.stability_score * 0.5,
-                    "compliance": task.stability_score * 0.5
-                }
-            }
-        }
+        # 维度详情和建议由评分规则一次算出
+        scored = scoring_rules.get(db).apply([task], ruleset="report")[0]
+        dimensions = scored["dimensions"]
+        
+        standing = cls._record_standing(db, task)
+        for dimension, percentile in standing["dimension_percentiles"].items():
+            dimensions[dimension]["percentile"] = percentile
         
-        # 生成建议
-        recommendations = cls._generate_recommendations(task, dimensions)
+        recommendations = scored["recommendations"]
         
         report = Report(
             report_code=report_code,
             task_id=task.id,
+            ranking_percentile=standing["percentile"],
             summary={
                 "total_score": round(task.total_score, 2),
                 "level": task.level,
-                "ranking_percentile": random.uniform(60, 99),
+                "ranking_percentile": standing["percentile"],
+                "agent_type_percentile": standing["type_percentile"],
+                "global_rank": standing["global_rank"],
+                "total_agents": standing["total_agents"],
                 "strength_areas": ["OpenClaw工具调用", "交互意图理解"] if task.tool_score > 300 else ["基础认知推理"],
-                "improvement_areas": ["长文本理解"] if task.reasoning_score < 250 else ["稳定性优化"]
+                "improvement_areas": ["长文本理解"] if task.reasoning_score < 250 else ["稳定性优化"],
+                "history": standing["history"]
             },
             dimensions=dimensions,
             test_cases=[],  # TODO: 填充实际测试用例
             recommendations=recommendations,
+            webhook_url=task.callback_url,
             is_deep_report=1,  # 免费模式：所有报告都是深度报告
             unlocked_at=datetime.utcnow()  # 免费模式：立即解锁
         )
@@ -257,54 +414,26 @@ class AssessmentService:
         
         # 更新排行榜
         cls._update_ranking(db, task)
+        report_payloads.store(db, task, report)
+        db.commit()
+        pdf_renderer.prerender([report_pdf_data(task, report)])
         
         return report
     
-    @classmethod
-    def _generate_recommendations(cls, task: AssessmentTask, dimensions: Dict) -> List[Dict]:
-        """生成改进建议"""
-        recommendations = []
-        
-        if task.tool_score < 300:
-            recommendations.append({
-                "area": "工具调用",
-                "score": task.tool_score,
-                "target": 350,
-                "suggestions": [
-                    "加强对OpenClaw工具的理解",
-                    "优化工具参数填写准确性",
-                    "练习多工具串联使用"
-                ]
-            })
-        
-        if task.reasoning_score < 220:
-            recommendations.append({
-                "area": "认知推理",
-                "score": task.reasoning_score,
-                "target": 250,
-                "suggestions": [
-                    "提升逻辑推理能力",
-                    "加强数学计算准确性",
-                    "优化长文本理解"
-                ]
-            })
-        
-        if task.interaction_score < 150:
-            recommendations.append({
-                "area": "交互理解",
-                "score": task.interaction_score,
-                "target": 170,
-                "suggestions": [
-                    "增强用户意图识别",
-                    "提升情绪感知能力"
-                ]
-            })
-        
-        return recommendations
-    
     @classmethod
     def _update_ranking(cls, db: Session, task: AssessmentTask):
-        """更新排行榜"""
+        """
+        更新排行榜
+        只写入该Agent自己的一行，并同步到排行榜有序集合（O(log N)），不再逐行重写rank
+        同时累加日/周/月窗口汇总（ranking_rollups），每个窗口一行
+        """
+        completed_at = task.completed_at or datetime.utcnow()
+        windows = [(period, window_start(period, completed_at)) for period in PERIODS]
+        leaderboard.ensure_loaded(db)
+        for period, start in windows:
+            leaderboard.ensure_window_loaded(db, period, start)
+        agent_type = cls._agent_type(db, task)
+        
         # 查找是否已有记录
         ranking = db.query(Ranking).filter(Ranking.agent_name == task.agent_name).first()
         
@@ -313,26 +442,61 @@ class AssessmentService:
             if task.total_score > ranking.total_score:
                 ranking.total_score = task.total_score
                 ranking.level = task.level
+            for dimension in DIMENSION_COLUMNS:
+                score = getattr(task, dimension, None)
+                if score is not None and score > (getattr(ranking, dimension) or 0):
+                    setattr(ranking, dimension, score)
             ranking.task_count += 1
             ranking.updated_at = datetime.utcnow()
         else:
             # 创建新记录
             ranking = Ranking(
+                agent_id=task.agent_id,
                 agent_name=task.agent_name,
-                agent_type="general",  # TODO: 从token获取
+                agent_type=agent_type,
                 total_score=task.total_score,
                 level=task.level,
-                task_count=1
+                task_count=1,
+                **{dimension: getattr(task, dimension, None) for dimension in DIMENSION_COLUMNS}
             )
             db.add(ranking)
         
+        rollups = [cls._update_rollup(db, task, agent_type, period, start) for period, start in windows]
         db.commit()
+        leaderboard.record(ranking)
+        for rollup in rollups:
+            leaderboard.record_window(rollup)
+        RankingService.purge_expired_rollups(db)
+    
+    @classmethod
+    def _update_rollup(cls, db: Session, task: AssessmentTask, agent_type: str,
+                       period: str, start: datetime) -> RankingRollup:
+        """累加一个时间窗口内的汇总行（窗口内最高分 + 测评次数）"""
+        rollup = db.query(RankingRollup).filter(
+            RankingRollup.period == period,
+            RankingRollup.window_start == start,
+            RankingRollup.agent_name == task.agent_name
+        ).first()
         
-        # 重新计算排名
-        all_rankings = db.query(Ranking).order_by(Ranking.total_score.desc()).all()
-        for i, r in enumerate(all_rankings, 1):
-            r.rank = i
-        db.commit()
+        if rollup:
+            if task.total_score > rollup.best_score:
+                rollup.best_score = task.total_score
+                rollup.level = task.level
+            rollup.task_count += 1
+            rollup.updated_at = datetime.utcnow()
+        else:
+            rollup = RankingRollup(
+                period=period,
+                window_start=start,
+                agent_id=task.agent_id,
+                agent_name=task.agent_name,
+                agent_type=agent_type,
+                best_score=task.total_score,
+                level=task.level,
+                task_count=1
+            )
+            db.add(rollup)
+        return rollup
 
 
 class ReportService:
@@ -358,23 +522,95 @@ class ReportService:
         report.is_deep_report = 1
         report.unlocked_at = datetime.utcnow()
         db.commit()
+        report_payloads.refresh(db, report)
         db.refresh(report)
+        
+        webhook_dispatcher.report_unlocked(report.id)
         return report
 
 
 class RankingService:
-    """排行榜服务"""
+    """
+    排行榜服务
+    名次和分页来自有序集合存储（services.leaderboard），排名 = 分数更高的Agent数 + 1（同分同名次）
+    """
+    
+    _last_rollup_purge = 0.0
+    
+    @classmethod
+    def rank_of(cls, db: Session, total_score: float) -> int:
+        """某个分数的全局名次"""
+        leaderboard.ensure_loaded(db)
+        return leaderboard.rank_of(total_score)
+    
+    @classmethod
+    def total_agents(cls, db: Session) -> int:
+        """上榜Agent总数"""
+        leaderboard.ensure_loaded(db)
+        return leaderboard.size()
     
     @classmethod
     def get_rankings(cls, db: Session, agent_type: Optional[str] = None, 
-                     skip: int = 0, limit: int = 100) -> List[Ranking]:
+                     skip: int = 0, limit: int = 100) -> List[LeaderboardEntry]:
         """获取排行榜"""
-        query = db.query(Ranking)
-        if agent_type:
-            query = query.filter(Ranking.agent_type == agent_type)
-        return query.order_by(Ranking.rank).offset(skip).limit(limit).all()
+        leaderboard.ensure_loaded(db)
+        return leaderboard.page(agent_type, skip, limit)
+    
+    @classmethod
+    def get_rankings_page(cls, db: Session, agent_type: Optional[str] = None, cursor: Optional[str] = None,
+                          skip: int = 0, limit: int = 100, period: Optional[str] = None,
+                          dimension: str = TOTAL,
+                          level: Optional[str] = None) -> Tuple[List[LeaderboardEntry], Optional[str], int]:
+        """
+        游标分页获取排行榜，返回(本页, 下一页游标, 总数)
+        period为daily/weekly/monthly时返回当前时间窗口的榜单，否则为总榜
+        dimension为total_score以外的维度时按该维度的历史最高分排序（仅总榜）
+        """
+        board = cls._board(db, period, dimension)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        after = tuple(decode_cursor(cursor, 2, types=((int, float), str))) if cursor else None
+        entries = leaderboard.page(agent_type, skip, limit + 1, after=after, board=board, level=level)
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor([entries[-1].score, entries[-1].agent_name])
+        return entries, next_cursor, leaderboard.size(agent_type, board=board, level=level)
+    
+    @classmethod
+    def _board(cls, db: Session, period: Optional[str] = None, dimension: str = TOTAL) -> str:
+        """确保榜单已加载并返回其键前缀"""
+        if not period or period == "all":
+            leaderboard.ensure_loaded(db)
+            return dimension_board(dimension)
+        if dimension != TOTAL:
+            raise ValueError("按维度排行仅支持period=all")
+        if period not in PERIODS:
+            raise ValueError(f"period须为all/{'/'.join(PERIODS)}")
+        start = window_start(period)
+        leaderboard.ensure_window_loaded(db, period, start)
+        return window_board(period, start)
+    
+    @classmethod
+    def purge_expired_rollups(cls, db: Session, force: bool = False) -> int:
+        """删除超过保留期的窗口汇总行（每进程至多每小时执行一次）"""
+        now = time.monotonic()
+        if not force and now - cls._last_rollup_purge < ROLLUP_PURGE_INTERVAL_SECONDS:
+            return 0
+        cls._last_rollup_purge = now
+        
+        deleted = 0
+        for period in PERIODS:
+            # 窗口结束 + 保留期 早于当前时间的窗口已过期
+            cutoff = window_start(period, datetime.utcnow() - timedelta(days=WINDOW_RETENTION_DAYS[period]))
+            deleted += db.query(RankingRollup).filter(
+                RankingRollup.period == period,
+                RankingRollup.window_start < cutoff
+            ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
     
     @classmethod
-    def get_agent_ranking(cls, db: Session, agent_name: str) -> Optional[Ranking]:
+    def get_agent_ranking(cls, db: Session, agent_name: str) -> Optional[LeaderboardEntry]:
         """获取Agent排名"""
-        return db.query(Ranking).filter(Ranking.agent_name == agent_name).first()
+        leaderboard.ensure_loaded(db)
+        return leaderboard.get(agent_name)
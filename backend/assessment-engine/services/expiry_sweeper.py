@@ -0,0 +1,211 @@
+"""
+过期清理 - 后台线程定期将过期的临时Token、旧版Token、邀请码和待支付订单转为过期状态
+每批按部分索引（只含活跃行）取一小批id再更新，单次清理的批数有上限，不会长时间锁表
+活跃行的索引范围因此保持紧凑；接口中的expires_at判断仍保留，清理间隔内的过期行照样被拒绝
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from models.database import PaymentOrder, TempToken, Token, User
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.getenv("EXPIRY_SWEEP_INTERVAL_SECONDS", "60"))
+EXPIRY_SWEEP_BATCH_SIZE = int(os.getenv("EXPIRY_SWEEP_BATCH_SIZE", "500"))
+# 单次清理每类最多处理的批数，剩余的留给下一次
+EXPIRY_SWEEP_MAX_BATCHES = int(os.getenv("EXPIRY_SWEEP_MAX_BATCHES", "20"))
+# 待支付订单的有效期（与支付链接的expires_at一致）
+PAYMENT_ORDER_EXPIRE_MINUTES = int(os.getenv("PAYMENT_ORDER_EXPIRE_MINUTES", "30"))
+
+
+@dataclass(frozen=True)
+class SweepTarget:
+    """一类需要过期处理的行"""
+    name: str
+    model: Any
+    active: Callable[[], List[Any]]                     # 仍处于活跃状态的条件
+    expired: Callable[[datetime], List[Any]]            # 已过期的条件
+    order_by: Any
+    values: Dict[str, Any]                              # 过期后写入的值
+
+
+TARGETS = [
+    SweepTarget(
+        name="temp_tokens",
+        model=TempToken,
+        active=lambda: [TempToken.status == "active"],
+        expired=lambda now: [TempToken.expires_at <= now],
+        order_by=TempToken.expires_at,
+        values={"status": "expired"}
+    ),
+    SweepTarget(
+        name="tokens",
+        model=Token,
+        active=lambda: [Token.status == "active"],
+        expired=lambda now: [Token.expires_at <= now],
+        order_by=Token.expires_at,
+        values={"status": "expired"}
+    ),
+    SweepTarget(
+        name="invite_codes",
+        model=User,
+        active=lambda: [User.invite_code.isnot(None)],
+        expired=lambda now: [User.invite_code_expires_at <= now],
+        order_by=User.invite_code_expires_at,
+        # 释放邀请码（唯一索引）
+        values={"invite_code": None, "invite_code_expires_at": None}
+    ),
+    SweepTarget(
+        name="payment_orders",
+        model=PaymentOrder,
+        active=lambda: [PaymentOrder.status == "pending"],
+        expired=lambda now: [PaymentOrder.created_at <= now - timedelta(minutes=PAYMENT_ORDER_EXPIRE_MINUTES)],
+        order_by=PaymentOrder.created_at,
+        values={"status": "expired"}
+    ),
+]
+
+
+class ExpirySweeper:
+    """
+    过期清理任务
+
+    - sweep() 执行一次清理，返回各类处理的行数（也可在脚本/测试中直接调用）
+    - start() / stop() 管理后台线程
+    - stats() 为累计和最近一次清理的行数、耗时
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        interval: float = EXPIRY_SWEEP_INTERVAL_SECONDS,
+        batch_size: int = EXPIRY_SWEEP_BATCH_SIZE,
+        max_batches: int = EXPIRY_SWEEP_MAX_BATCHES,
+        targets: Optional[List[SweepTarget]] = None
+    ):
+        self._session_factory = session_factory
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.max_batches = max(1, max_batches)
+        self.targets = targets or TARGETS
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sweeps = 0
+        self._totals: Dict[str, int] = {t.name: 0 for t in self.targets}
+        self._last: Dict[str, Any] = {}
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    # ============== 清理 ==============
+
+    def sweep(self, db: Optional[Session] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.utcnow()
+        own_session = db is None
+        db = db or self.session_factory()
+        started = time.perf_counter()
+        processed: Dict[str, int] = {}
+        try:
+            for target in self.targets:
+                processed[target.name] = self._sweep_target(db, target, now)
+        finally:
+            if own_session:
+                db.close()
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._sweeps += 1
+            for name, count in processed.items():
+                self._totals[name] = self._totals.get(name, 0) + count
+            self._last = {
+                "at": now.isoformat(),
+                "duration_ms": round(elapsed * 1000, 1),
+                "processed": processed
+            }
+        if any(processed.values()):
+            logger.info("Expiry sweep processed %s in %.1fms", processed, elapsed * 1000)
+        return processed
+
+    def _sweep_target(self, db: Session, target: SweepTarget, now: datetime) -> int:
+        model = target.model
+        total = 0
+        for _ in range(self.max_batches):
+            conditions = target.active() + target.expired(now)
+            rows = db.query(*self._columns(target)).filter(*conditions).order_by(
+                target.order_by
+            ).limit(self.batch_size).all()
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+            # 重复带上条件：取id后被并发修改（绑定/支付）的行不再更新
+            updated = db.query(model).filter(model.id.in_(ids), *conditions).update(
+                target.values, synchronize_session=False
+            )
+            db.commit()
+            self._after_batch(target, rows)
+            total += updated
+            if len(rows) < self.batch_size:
+                break
+        return total
+
+    @staticmethod
+    def _columns(target: SweepTarget) -> List[Any]:
+        if target.model is TempToken:
+            return [TempToken.id, TempToken.temp_token_code]
+        return [target.model.id]
+
+    @staticmethod
+    def _after_batch(target: SweepTarget, rows: List[Any]):
+        if target.model is TempToken:
+            from services.temp_token_auth import temp_token_cache
+            temp_token_cache.invalidate(*[row[1] for row in rows])
+
+    # ============== 生命周期 ==============
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Expiry sweep failed")
+            self._stopping.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="expiry-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ============== 指标 ==============
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sweeps": self._sweeps,
+                "processed_total": dict(self._totals),
+                "last_sweep": dict(self._last) if self._last else None
+            }
+
+
+# 全局过期清理任务
+expiry_sweeper = ExpirySweeper()
@@ -0,0 +1,135 @@
+"""
+测评数据流式导出 - 逐批从服务端游标读取并立即写出NDJSON/CSV行
+内存占用只与批大小有关，与用户名下的任务数无关
+"""
+
+import io
+import os
+import csv
+import json
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from models.database import AgentBinding, AssessmentTask, Report, unpack_report_content
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+BASE_FIELDS = [
+    "task_code", "agent_id", "agent_name", "status",
+    "total_score", "level", "tool_score", "reasoning_score", "interaction_score", "stability_score",
+    "report_code", "created_at", "completed_at"
+]
+# 按需导出的报告字段（体积较大）
+OPTIONAL_FIELDS = ("dimensions", "recommendations")
+
+
+def parse_include(include: Optional[str]) -> List[str]:
+    """include为逗号分隔的可选字段"""
+    fields = [f.strip() for f in (include or "").split(",") if f.strip()]
+    unknown = [f for f in fields if f not in OPTIONAL_FIELDS]
+    if unknown:
+        raise ValueError(f"include仅支持{'/'.join(OPTIONAL_FIELDS)}")
+    return [f for f in OPTIONAL_FIELDS if f in fields]
+
+
+def _row(record, include: List[str]) -> Dict[str, Any]:
+    completed = record.status == "completed"
+    row = {
+        "task_code": record.task_code,
+        "agent_id": record.agent_id,
+        "agent_name": record.agent_name,
+        "status": record.status,
+        "total_score": record.total_score if completed else None,
+        "level": record.level if completed else None,
+        "tool_score": record.tool_score if completed else None,
+        "reasoning_score": record.reasoning_score if completed else None,
+        "interaction_score": record.interaction_score if completed else None,
+        "stability_score": record.stability_score if completed else None,
+        "report_code": record.report_code,
+        "created_at": record.created_at.isoformat() if record.created_at else None,
+        "completed_at": record.completed_at.isoformat() if record.completed_at else None
+    }
+    if include:
+        content = unpack_report_content(record.content)
+        if "dimensions" in include:
+            row["dimensions"] = content.get("dimensions")
+        if "recommendations" in include:
+            # 与报告详情一致，未解锁的深度报告不导出建议
+            row["recommendations"] = content.get("recommendations") if record.is_deep_report == 1 else None
+    return row
+
+
+def export_user_assessments(
+    bind: Union[Engine, Connection],
+    user_id: str,
+    fmt: str = "ndjson",
+    include: Optional[List[str]] = None,
+    batch_rows: int = EXPORT_BATCH_ROWS
+) -> Iterator[bytes]:
+    """
+    按创建时间顺序导出用户名下所有Bot的测评任务（生成器，每批产出一块字节）
+    使用独立会话：流式响应开始发送时请求的数据库会话已关闭
+    """
+    include = include or []
+    columns = [
+        AssessmentTask.task_code, AssessmentTask.agent_id, AssessmentTask.agent_name, AssessmentTask.status,
+        AssessmentTask.total_score, AssessmentTask.level, AssessmentTask.tool_score,
+        AssessmentTask.reasoning_score, AssessmentTask.interaction_score, AssessmentTask.stability_score,
+        AssessmentTask.created_at, AssessmentTask.completed_at, Report.report_code, Report.is_deep_report
+    ]
+    if include:
+        # 报告正文只在需要时读取
+        columns.append(Report.content)
+
+    agent_ids = select(AgentBinding.agent_id).where(
+        AgentBinding.user_id == user_id,
+        AgentBinding.status == "active"
+    )
+
+    db = Session(bind=bind)
+    try:
+        rows = db.query(*columns).outerjoin(
+            Report, Report.task_id == AssessmentTask.id
+        ).filter(
+            AssessmentTask.agent_id.in_(agent_ids)
+        ).order_by(
+            AssessmentTask.created_at, AssessmentTask.id
+        ).execution_options(stream_results=True, yield_per=batch_rows)
+
+        fieldnames = BASE_FIELDS + include
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            pending = 0
+            for record in rows:
+                row = _row(record, include)
+                for field in include:
+                    row[field] = json.dumps(row[field], ensure_ascii=False) if row[field] is not None else ""
+                writer.writerow(row)
+                pending += 1
+                if pending >= batch_rows:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+            yield buffer.getvalue().encode("utf-8")
+        else:
+            lines: List[str] = []
+            for record in rows:
+                lines.append(json.dumps(_row(record, include), ensure_ascii=False, default=str))
+                if len(lines) >= batch_rows:
+                    yield ("\n".join(lines) + "\n").encode("utf-8")
+                    lines = []
+            if lines:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+    finally:
+        db.close()
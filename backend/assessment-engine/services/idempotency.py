@@ -0,0 +1,156 @@
+"""
+幂等键支持 - Bot超时重试时返回首次请求的响应，不再重复创建任务/报告/Token
+存储: 配置REDIS_URL时使用Redis（多进程共享），否则使用进程内TTL缓存
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
+# 处理中标记的有效期，进程崩溃后该键可被重新使用
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+
+class IdempotencyConflict(Exception):
+    """同一幂等键的请求正在处理中，或请求内容与首次请求不一致"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fingerprint(payload: Any) -> str:
+    """请求内容指纹"""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class MemoryIdempotencyStore:
+    """进程内TTL存储（单进程部署和测试用）"""
+
+    def __init__(self, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def reserve(self, key: str, entry: Dict[str, Any], ttl: int) -> Optional[Dict[str, Any]]:
+        """键不存在时写入entry并返回None，否则返回已有的记录"""
+        now = time.monotonic()
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing and existing[0] > now:
+                return existing[1]
+            self._entries[key] = (now + ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return None
+
+    def set(self, key: str, entry: Dict[str, Any], ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end(key)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisIdempotencyStore:
+    """Redis存储（读取已有记录与写入预留在同一个Lua脚本中原子完成）"""
+
+    # 键存在时返回其值，否则写入并返回nil；SET NX后再GET之间键可能过期，分两步会误判为可以处理
+    RESERVE_SCRIPT = """
+local existing = redis.call('GET', KEYS[1])
+if existing then
+    return existing
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._reserve = self._redis.register_script(self.RESERVE_SCRIPT)
+
+    def reserve(self, key: str, entry: Dict[str, Any], ttl: int) -> Optional[Dict[str, Any]]:
+        raw = self._reserve(keys=[key], args=[json.dumps(entry), ttl])
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: Dict[str, Any], ttl: int):
+        self._redis.set(key, json.dumps(entry, default=str), ex=ttl)
+
+    def delete(self, key: str):
+        self._redis.delete(key)
+
+
+class IdempotencyManager:
+    """
+    幂等请求管理
+
+    用法:
+        cached = idempotency.begin(scope, key, payload)
+        if cached is not None:
+            return cached
+        try:
+            response = ...
+        except Exception:
+            idempotency.release(scope, key)
+            raise
+        return idempotency.complete(scope, key, payload, response)
+    """
+
+    def __init__(self, store=None, ttl: int = IDEMPOTENCY_TTL_SECONDS, lock_ttl: int = IDEMPOTENCY_LOCK_SECONDS):
+        self._store = store
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+
+    @property
+    def store(self):
+        if self._store is None:
+            redis_url = os.getenv("REDIS_URL")
+            self._store = RedisIdempotencyStore(redis_url) if redis_url else MemoryIdempotencyStore()
+        return self._store
+
+    @staticmethod
+    def _key(scope: str, key: str) -> str:
+        return f"idempotency:{scope}:{key}"
+
+    def begin(self, scope: str, key: Optional[str], payload: Any) -> Optional[Dict[str, Any]]:
+        """
+        开始处理请求
+        返回None表示需要正常处理；返回dict为首次请求的响应
+        """
+        if not key:
+            return None
+        digest = fingerprint(payload)
+        existing = self.store.reserve(self._key(scope, key), {"fingerprint": digest, "pending": True}, self.lock_ttl)
+        if existing is None:
+            return None
+        if existing.get("fingerprint") != digest:
+            raise IdempotencyConflict("Idempotency-Key已用于不同的请求内容", 422)
+        if existing.get("pending"):
+            raise IdempotencyConflict("相同Idempotency-Key的请求正在处理中", 409)
+        return existing["response"]
+
+    def complete(self, scope: str, key: Optional[str], payload: Any, response: Dict[str, Any]) -> Dict[str, Any]:
+        """保存响应，供重试请求直接返回"""
+        if key:
+            self.store.set(self._key(scope, key), {"fingerprint": fingerprint(payload), "response": response}, self.ttl)
+        return response
+
+    def release(self, scope: str, key: Optional[str]):
+        """处理失败时释放键，允许重试"""
+        if key:
+            self.store.delete(self._key(scope, key))
+
+
+# 全局实例
+idempotency = IdempotencyManager()
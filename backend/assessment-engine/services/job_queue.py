@@ -0,0 +1,265 @@
+"""
+测评任务队列 - 以AssessmentTask.status作为持久化队列
+HTTP接口只负责入队并立即返回task_code，由Worker线程池认领并执行测评
+"""
+
+import os
+import math
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from models.database import AssessmentTask, generate_uuid
+from schemas import TaskStatus
+
+logger = logging.getLogger(__name__)
+
+# Worker配置
+ASSESSMENT_WORKERS = int(os.getenv("ASSESSMENT_WORKERS", "4"))
+ASSESSMENT_POLL_SECONDS = float(os.getenv("ASSESSMENT_POLL_SECONDS", "2"))
+# running状态超过该时长视为Worker已崩溃，重新放回队列
+ASSESSMENT_STALE_SECONDS = int(os.getenv("ASSESSMENT_STALE_SECONDS", "600"))
+# 单个任务最多被认领的次数，超过后不再放回队列（避免反复拖垮Worker的任务无限重试）
+ASSESSMENT_MAX_ATTEMPTS = int(os.getenv("ASSESSMENT_MAX_ATTEMPTS", "3"))
+# 队列容量（已入队 + 执行中），超出后拒绝新任务
+ASSESSMENT_MAX_BACKLOG = int(os.getenv("ASSESSMENT_MAX_BACKLOG", str(ASSESSMENT_WORKERS * 25)))
+# 单个测评的平均耗时，用于估算Retry-After
+ASSESSMENT_AVG_SECONDS = float(os.getenv("ASSESSMENT_AVG_SECONDS", "5"))
+
+
+class QueueFullError(Exception):
+    """队列已满"""
+
+    def __init__(self, backlog: int, retry_after: int):
+        super().__init__(f"测评队列已满（{backlog}个任务）")
+        self.backlog = backlog
+        self.retry_after = retry_after
+
+
+class AssessmentJobQueue:
+    """
+    测评任务队列
+
+    状态流转: pending(已入队) -> running(已认领) -> completed/failed
+    - 队列本身就是assessment_tasks表，进程重启不会丢任务
+    - 认领使用带status条件的UPDATE，多进程/多Worker之间不会重复执行
+    - 每个任务使用Worker自己创建的数据库会话，与请求会话无关
+    - 每次认领attempts加一，超时回收时达到max_attempts的任务转为failed
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        workers: int = ASSESSMENT_WORKERS,
+        poll_seconds: float = ASSESSMENT_POLL_SECONDS,
+        stale_seconds: int = ASSESSMENT_STALE_SECONDS,
+        max_attempts: int = ASSESSMENT_MAX_ATTEMPTS,
+        max_backlog: int = ASSESSMENT_MAX_BACKLOG,
+        avg_seconds: float = ASSESSMENT_AVG_SECONDS,
+        handler: Optional[Callable[[Session, AssessmentTask], None]] = None,
+        on_failed: Optional[Callable[[str], None]] = None
+    ):
+        self._session_factory = session_factory
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.max_backlog = max_backlog
+        self.avg_seconds = avg_seconds
+        self._handler = handler
+        self._on_failed = on_failed
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @property
+    def handler(self) -> Callable[[Session, AssessmentTask], None]:
+        if self._handler is None:
+            from services.assessment_service import AssessmentService
+            self._handler = AssessmentService.execute_task
+        return self._handler
+
+    @property
+    def on_failed(self) -> Callable[[str], None]:
+        """任务失败且failed状态已提交后调用（默认投递测评结束Webhook）"""
+        if self._on_failed is None:
+            from services.webhooks import webhook_dispatcher
+            self._on_failed = webhook_dispatcher.assessment_finished
+        return self._on_failed
+
+    # ============== 生产者 ==============
+
+    def enqueue(self, db: Session, task: AssessmentTask) -> AssessmentTask:
+        """将任务标记为已入队并唤醒Worker"""
+        task.status = TaskStatus.PENDING.value
+        task.queued_at = datetime.utcnow()
+        task.attempts = 0
+        db.commit()
+        self._wakeup.set()
+        return task
+
+    def enqueue_many(self, db: Session, rows: List[Dict[str, Any]]) -> int:
+        """批量插入并入队任务（一次executemany + 一次提交）"""
+        if not rows:
+            return 0
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault("id", generate_uuid())
+            row.setdefault("created_at", now)
+            row["status"] = TaskStatus.PENDING.value
+            row["queued_at"] = now
+            row["attempts"] = 0
+        db.execute(insert(AssessmentTask), rows)
+        db.commit()
+        self._wakeup.set()
+        return len(rows)
+
+    def submit(self, db: Session, task: AssessmentTask) -> AssessmentTask:
+        """有界入队，队列已满时抛出QueueFullError"""
+        backlog = self.backlog(db)
+        if backlog >= self.max_backlog:
+            raise QueueFullError(backlog, self.estimate_wait_seconds(backlog))
+        return self.enqueue(db, task)
+
+    def backlog(self, db: Session) -> int:
+        """已入队但尚未结束的任务数"""
+        return db.query(AssessmentTask).filter(
+            AssessmentTask.status.in_([TaskStatus.PENDING.value, TaskStatus.RUNNING.value]),
+            AssessmentTask.queued_at.isnot(None)
+        ).count()
+
+    def estimate_wait_seconds(self, backlog: int) -> int:
+        """按Worker数和平均耗时估算排空当前队列所需时间"""
+        rounds = math.ceil((backlog - self.max_backlog + 1) / self.workers)
+        return max(1, int(rounds * self.avg_seconds))
+
+    # ============== 消费者 ==============
+
+    def claim_next(self, db: Session) -> Optional[AssessmentTask]:
+        """认领最早入队的任务，认领失败（被其他Worker抢先）时尝试下一个"""
+        candidates = db.query(AssessmentTask.id).filter(
+            AssessmentTask.status == TaskStatus.PENDING.value,
+            AssessmentTask.queued_at.isnot(None)
+        ).order_by(AssessmentTask.queued_at).limit(self.workers).all()
+
+        for (task_id,) in candidates:
+            claimed = db.query(AssessmentTask).filter(
+                AssessmentTask.id == task_id,
+                AssessmentTask.status == TaskStatus.PENDING.value
+            ).update({
+                "status": TaskStatus.RUNNING.value,
+                "started_at": datetime.utcnow(),
+                "attempts": func.coalesce(AssessmentTask.attempts, 0) + 1
+            }, synchronize_session=False)
+            db.commit()
+
+            if claimed:
+                return db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
+
+        return None
+
+    def run_once(self) -> bool:
+        """认领并执行一个任务，队列为空时返回False"""
+        db = self.session_factory()
+        try:
+            task = self.claim_next(db)
+            if not task:
+                return False
+
+            task_id, task_code = task.id, task.task_code
+            try:
+                self.handler(db, task)
+            except Exception:
+                logger.exception("Assessment task %s failed", task_code)
+                db.rollback()
+                db.query(AssessmentTask).filter(AssessmentTask.id == task_id).update({
+                    "status": TaskStatus.FAILED.value,
+                    "completed_at": datetime.utcnow()
+                }, synchronize_session=False)
+                db.commit()
+                self.on_failed(task_id)
+            return True
+        finally:
+            db.close()
+
+    def requeue_stale(self, db: Session) -> int:
+        """
+        将长时间停留在running状态的任务放回队列
+        已认领max_attempts次的任务不再重试，直接标记为failed
+        """
+        now = datetime.utcnow()
+        stale = [
+            AssessmentTask.status == TaskStatus.RUNNING.value,
+            AssessmentTask.queued_at.isnot(None),
+            AssessmentTask.started_at < now - timedelta(seconds=self.stale_seconds)
+        ]
+        exhausted = func.coalesce(AssessmentTask.attempts, 0) >= self.max_attempts
+        failed = db.query(AssessmentTask).filter(*stale, exhausted).update({
+            "status": TaskStatus.FAILED.value,
+            "completed_at": now
+        }, synchronize_session=False)
+        count = db.query(AssessmentTask).filter(*stale, ~exhausted).update(
+            {"status": TaskStatus.PENDING.value}, synchronize_session=False
+        )
+        db.commit()
+        if failed:
+            logger.warning("Failed %d stale assessment tasks after %d attempts", failed, self.max_attempts)
+        return count
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Assessment worker error")
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+    # ============== 生命周期 ==============
+
+    def start(self):
+        """启动Worker线程池"""
+        if self._threads:
+            return
+
+        db = self.session_factory()
+        try:
+            requeued = self.requeue_stale(db)
+            if requeued:
+                logger.warning("Requeued %d stale assessment tasks", requeued)
+        finally:
+            db.close()
+
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"assessment-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        """停止Worker线程池，等待正在执行的任务结束"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+# 全局队列实例
+assessment_queue = AssessmentJobQueue()
@@ -0,0 +1,583 @@
+"""
+排行榜有序集合存储 - 名次查询和Top-K分页均为O(log N)，不经过SQL
+存储: 配置REDIS_URL时使用Redis有序集合（多进程共享），否则使用进程内跳表（单机部署和测试用）
+数据库rankings表仍是权威数据，存储为空时从表中重建
+"""
+
+import os
+import json
+import random
+import time
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.database import Ranking, RankingRollup
+
+# 总榜（历史最高分）的键前缀；时间窗口榜为 leaderboard:{period}:{YYYYMMDD}
+ALL_TIME = "leaderboard"
+GLOBAL_KEY = f"{ALL_TIME}:global"
+
+# 时间窗口榜: 窗口结束后保留的天数，到期后由存储自动过期
+PERIODS = ("daily", "weekly", "monthly")
+WINDOW_RETENTION_DAYS = {"daily": 7, "weekly": 56, "monthly": 366}
+
+# 可排行的分数维度（与rankings表列名一致），维度榜为 leaderboard:dim:{dimension}
+TOTAL = "total_score"
+DIMENSION_COLUMNS = ("tool_score", "reasoning_score", "interaction_score", "stability_score")
+
+
+def global_key(board: str = ALL_TIME) -> str:
+    return f"{board}:global"
+
+
+def type_key(agent_type: str, board: str = ALL_TIME) -> str:
+    return f"{board}:type:{agent_type}"
+
+
+def level_key(level: str, board: str = ALL_TIME) -> str:
+    return f"{board}:level:{level}"
+
+
+def type_level_key(agent_type: str, level: str, board: str = ALL_TIME) -> str:
+    return f"{board}:type:{agent_type}:level:{level}"
+
+
+def filter_key(agent_type: Optional[str] = None, level: Optional[str] = None, board: str = ALL_TIME) -> str:
+    """筛选条件对应的有序集合（每种agent_type/level组合各有一个，查询均为区间扫描）"""
+    if agent_type and level:
+        return type_level_key(agent_type, level, board)
+    if agent_type:
+        return type_key(agent_type, board)
+    if level:
+        return level_key(level, board)
+    return global_key(board)
+
+
+def meta_key(board: str = ALL_TIME) -> str:
+    return f"{board}:meta"
+
+
+def in_board(key: str, board: str) -> bool:
+    """键是否属于该榜自身（总榜前缀同时是窗口榜、维度榜的前缀，需排除）"""
+    if not key.startswith(f"{board}:"):
+        return False
+    return key[len(board) + 1:].split(":", 1)[0] in ("global", "type", "level", "meta")
+
+
+def dimension_board(dimension: str) -> str:
+    """维度对应的总榜键前缀（total_score即总榜）"""
+    if dimension == TOTAL:
+        return ALL_TIME
+    if dimension not in DIMENSION_COLUMNS:
+        raise ValueError(f"dimension须为{'/'.join((TOTAL,) + DIMENSION_COLUMNS)}")
+    return f"{ALL_TIME}:dim:{dimension}"
+
+
+def window_start(period: str, at: Optional[datetime] = None) -> datetime:
+    """时间窗口起点（UTC）: 日榜当天0点，周榜周一0点，月榜1日0点"""
+    day = (at or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "daily":
+        return day
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period == "monthly":
+        return day.replace(day=1)
+    raise ValueError(f"未知的排行榜周期: {period}")
+
+
+def window_end(period: str, start: datetime) -> datetime:
+    if period == "daily":
+        return start + timedelta(days=1)
+    if period == "weekly":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def window_board(period: str, start: datetime) -> str:
+    return f"{ALL_TIME}:{period}:{start.strftime('%Y%m%d')}"
+
+
+def window_ttl_seconds(period: str, start: datetime, now: Optional[datetime] = None) -> int:
+    """窗口键的剩余存活时间 = 距窗口结束 + 保留期"""
+    expires = window_end(period, start) + timedelta(days=WINDOW_RETENTION_DAYS[period])
+    return max(int((expires - (now or datetime.utcnow())).total_seconds()), 1)
+
+
+@dataclass
+class LeaderboardEntry:
+    """排行榜条目（rank为该榜的全局名次，同分同名次；score为排序分数，总榜即total_score）"""
+    rank: int
+    agent_name: str
+    agent_type: Optional[str]
+    total_score: float
+    level: Optional[str]
+    task_count: int
+    score: float
+
+
+# ============== 进程内跳表 ==============
+
+class _SkipNode:
+    __slots__ = ("score", "member", "forward", "span")
+
+    def __init__(self, level: int, score: float = 0.0, member: str = ""):
+        self.score = score
+        self.member = member
+        self.forward: List[Optional["_SkipNode"]] = [None] * level
+        self.span: List[int] = [0] * level
+
+
+class SortedSet:
+    """
+    带跨度的跳表（同Redis zset），按(score, member)升序
+    插入/删除/按分数计数/按下标定位均为O(log N)
+    """
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self._head = _SkipNode(self.MAX_LEVEL)
+        self._level = 1
+        self._scores: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def score(self, member: str) -> Optional[float]:
+        return self._scores.get(member)
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+    def add(self, member: str, score: float):
+        current = self._scores.get(member)
+        if current == score:
+            return
+        if current is not None:
+            self._delete(member, current)
+
+        update = [self._head] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            rank[i] = 0 if i == self._level - 1 else rank[i + 1]
+            while x.forward[i] and (x.forward[i].score, x.forward[i].member) < (score, member):
+                rank[i] += x.span[i]
+                x = x.forward[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = self._head
+                self._head.span[i] = len(self._scores)
+            self._level = level
+
+        node = _SkipNode(level, score, member)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self._level):
+            update[i].span[i] += 1
+
+        self._scores[member] = score
+
+    def remove(self, member: str) -> bool:
+        score = self._scores.get(member)
+        if score is None:
+            return False
+        self._delete(member, score)
+        return True
+
+    def _delete(self, member: str, score: float):
+        update = [self._head] * self.MAX_LEVEL
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] and (x.forward[i].score, x.forward[i].member) < (score, member):
+                x = x.forward[i]
+            update[i] = x
+
+        node = x.forward[0]
+        for i in range(self._level):
+            if update[i].forward[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].forward[i] = node.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self._level > 1 and self._head.forward[self._level - 1] is None:
+            self._level -= 1
+        del self._scores[member]
+
+    def count_le(self, score: float) -> int:
+        """分数 <= score 的成员数"""
+        x, count = self._head, 0
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] and x.forward[i].score <= score:
+                count += x.span[i]
+                x = x.forward[i]
+        return count
+
+    def count_before(self, score: float, member: str) -> int:
+        """按(score, member)排在其前面的成员数（即该位置的升序下标）"""
+        x, count = self._head, 0
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] and (x.forward[i].score, x.forward[i].member) < (score, member):
+                count += x.span[i]
+                x = x.forward[i]
+        return count
+
+    def range(self, start: int, stop: int) -> List[Tuple[str, float]]:
+        """升序下标[start, stop)的成员"""
+        if start >= stop or start >= len(self._scores):
+            return []
+        x, traversed = self._head, 0
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] and traversed + x.span[i] <= start:
+                traversed += x.span[i]
+                x = x.forward[i]
+
+        items = []
+        x = x.forward[0]
+        while x and len(items) < stop - start:
+            items.append((x.member, x.score))
+            x = x.forward[0]
+        return items
+
+
+class MemoryLeaderboardStore:
+    """进程内存储（每个进程各自一份，多进程部署请配置REDIS_URL）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sets: Dict[str, SortedSet] = {}
+        self._meta: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _zset(self, key: str) -> Optional[SortedSet]:
+        """取有序集合（已过期的键在访问时删除，需持有锁）"""
+        self._purge(key)
+        return self._sets.get(key)
+
+    def _purge(self, key: str):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._sets.pop(key, None)
+            self._meta.pop(key, None)
+            del self._expires[key]
+
+    def add(self, key: str, member: str, score: float):
+        with self._lock:
+            self._purge(key)
+            self._sets.setdefault(key, SortedSet()).add(member, score)
+
+    def remove(self, key: str, member: str):
+        with self._lock:
+            zset = self._zset(key)
+            if zset:
+                zset.remove(member)
+
+    def score(self, key: str, member: str) -> Optional[float]:
+        with self._lock:
+            zset = self._zset(key)
+            return zset.score(member) if zset else None
+
+    def count_above(self, key: str, score: float) -> int:
+        with self._lock:
+            zset = self._zset(key)
+            return len(zset) - zset.count_le(score) if zset else 0
+
+    def rev_range(self, key: str, offset: int, limit: int) -> List[Tuple[str, float]]:
+        """按分数降序的第offset起limit个成员（同ZREVRANGE）"""
+        with self._lock:
+            zset = self._zset(key)
+            if not zset:
+                return []
+            size = len(zset)
+            items = zset.range(max(size - offset - limit, 0), max(size - offset, 0))
+        return items[::-1]
+
+    def rev_index_after(self, key: str, score: float, member: str) -> int:
+        """降序排列中紧接在(score, member)之后的下标（游标分页用）"""
+        with self._lock:
+            zset = self._zset(key)
+            return len(zset) - zset.count_before(score, member) if zset else 0
+
+    def card(self, key: str) -> int:
+        with self._lock:
+            zset = self._zset(key)
+            return len(zset) if zset else 0
+
+    def set_meta(self, key: str, member: str, meta: Dict[str, Any]):
+        with self._lock:
+            self._purge(key)
+            self._meta.setdefault(key, {})[member] = meta
+
+    def get_meta(self, key: str, members: List[str]) -> List[Optional[Dict[str, Any]]]:
+        with self._lock:
+            self._purge(key)
+            metas = self._meta.get(key, {})
+            return [metas.get(member) for member in members]
+
+    def expire(self, key: str, seconds: int):
+        with self._lock:
+            self._expires[key] = time.monotonic() + seconds
+
+    def clear(self, board: str = ALL_TIME):
+        """删除某个榜的所有键"""
+        with self._lock:
+            for store in (self._sets, self._meta, self._expires):
+                for key in [k for k in store if in_board(k, board)]:
+                    del store[key]
+
+
+class RedisLeaderboardStore:
+    """Redis存储（ZADD / ZCOUNT / ZREVRANGE，元数据存HASH，窗口榜依赖EXPIRE过期）"""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def add(self, key: str, member: str, score: float):
+        self._redis.zadd(key, {member: score})
+
+    def remove(self, key: str, member: str):
+        self._redis.zrem(key, member)
+
+    def score(self, key: str, member: str) -> Optional[float]:
+        return self._redis.zscore(key, member)
+
+    def count_above(self, key: str, score: float) -> int:
+        return self._redis.zcount(key, f"({score}", "+inf")
+
+    def rev_range(self, key: str, offset: int, limit: int) -> List[Tuple[str, float]]:
+        if limit <= 0:
+            return []
+        return self._redis.zrevrange(key, offset, offset + limit - 1, withscores=True)
+
+    def rev_index_after(self, key: str, score: float, member: str) -> int:
+        if self._redis.zscore(key, member) == score:
+            return self._redis.zrevrank(key, member) + 1
+        # 游标成员的分数已变化：从同分组开头继续（同分成员可能重复出现，不会遗漏）
+        return self._redis.zcount(key, f"({score}", "+inf")
+
+    def card(self, key: str) -> int:
+        return self._redis.zcard(key)
+
+    def set_meta(self, key: str, member: str, meta: Dict[str, Any]):
+        self._redis.hset(key, member, json.dumps(meta))
+
+    def get_meta(self, key: str, members: List[str]) -> List[Optional[Dict[str, Any]]]:
+        if not members:
+            return []
+        return [json.loads(raw) if raw else None for raw in self._redis.hmget(key, members)]
+
+    def expire(self, key: str, seconds: int):
+        self._redis.expire(key, seconds)
+
+    def clear(self, board: str = ALL_TIME):
+        keys = [key for key in self._redis.scan_iter(f"{board}:*") if in_board(key, board)]
+        if keys:
+            self._redis.delete(*keys)
+
+
+# ============== 排行榜 ==============
+
+class Leaderboard:
+    """
+    排行榜
+    - 总榜: 全局 + 按agent_type分榜，成员为agent_name，分数为历史最高分，数据源为rankings表
+    - 维度榜: 与总榜结构相同，分数为各维度（tool/reasoning/interaction/stability）的历史最高分
+    - 每个榜另按level、agent_type + level各维护一个有序集合，任意筛选组合都只读一个集合
+    - 时间窗口榜（日/周/月）: 每个窗口一个独立的榜，分数为窗口内最高分，数据源为ranking_rollups表，
+      键带TTL，窗口结束并超过保留期后自动过期
+    - 名次 = 同一榜全局集合中分数更高的成员数 + 1（同分同名次）
+    """
+
+    def __init__(self, store=None):
+        self._store = store
+        self._loaded = False
+        self._loaded_windows: Dict[str, float] = {}
+        self._load_lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            redis_url = os.getenv("REDIS_URL")
+            self._store = RedisLeaderboardStore(redis_url) if redis_url else MemoryLeaderboardStore()
+        return self._store
+
+    # ============== 总榜 ==============
+
+    def ensure_loaded(self, db: Session):
+        """首次使用时，存储为空则从rankings表重建"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                if self.store.card(GLOBAL_KEY) == 0:
+                    self.rebuild(db)
+                self._loaded = True
+
+    def rebuild(self, db: Session) -> int:
+        """从rankings表全量重建总榜及各维度榜，返回条目数"""
+        boards = [ALL_TIME] + [dimension_board(d) for d in DIMENSION_COLUMNS]
+        for board in boards:
+            self.store.clear(board)
+        count = 0
+        rows = db.query(
+            Ranking.agent_name, Ranking.agent_type, Ranking.level, Ranking.task_count, Ranking.total_score,
+            *[getattr(Ranking, d) for d in DIMENSION_COLUMNS]
+        ).yield_per(5000)
+        for agent_name, agent_type, level, task_count, *scores in rows:
+            total_score = scores[0]
+            for board, score in zip(boards, scores):
+                if score is not None:
+                    self._write(board, agent_name, agent_type or "general", score, level, task_count,
+                                total_score=total_score, check_previous=False)
+            count += 1
+        self._loaded = True
+        return count
+
+    def record(self, ranking: Ranking):
+        """写入/更新一个Agent的历史最高分（总分及各维度）"""
+        agent_type = ranking.agent_type or "general"
+        for dimension in (TOTAL,) + DIMENSION_COLUMNS:
+            score = getattr(ranking, dimension)
+            if score is not None:
+                self._write(dimension_board(dimension), ranking.agent_name, agent_type, score,
+                            ranking.level, ranking.task_count, total_score=ranking.total_score)
+
+    def _write(self, board: str, agent_name: str, agent_type: str, score: float,
+               level: Optional[str], task_count: int, total_score: Optional[float] = None,
+               check_previous: bool = True):
+        """写入一个成员；agent_type或level变化时先从原筛选集合中移除（全量重建时无需检查）"""
+        if check_previous:
+            previous = self.store.get_meta(meta_key(board), [agent_name])[0]
+            if previous:
+                old_type, old_level = previous.get("agent_type"), previous.get("level")
+                stale = [type_key(old_type, board)] if old_type != agent_type else []
+                if old_level and old_level != level:
+                    stale.append(level_key(old_level, board))
+                if old_level and (old_type, old_level) != (agent_type, level):
+                    stale.append(type_level_key(old_type, old_level, board))
+                for key in stale:
+                    self.store.remove(key, agent_name)
+
+        keys = [global_key(board), type_key(agent_type, board)]
+        if level:
+            keys += [level_key(level, board), type_level_key(agent_type, level, board)]
+        for key in keys:
+            self.store.add(key, agent_name, score)
+        meta = {"agent_type": agent_type, "level": level, "task_count": task_count}
+        if total_score is not None and board != ALL_TIME:
+            meta["total_score"] = total_score
+        self.store.set_meta(meta_key(board), agent_name, meta)
+
+    # ============== 时间窗口榜 ==============
+
+    def ensure_window_loaded(self, db: Session, period: str, start: datetime):
+        """窗口榜在本进程首次使用（或存储被清空）时从ranking_rollups重建"""
+        board = window_board(period, start)
+        if board in self._loaded_windows and self.store.card(global_key(board)):
+            return
+        with self._load_lock:
+            if self.store.card(global_key(board)) == 0:
+                self.rebuild_window(db, period, start)
+            self._loaded_windows[board] = time.monotonic()
+
+    def rebuild_window(self, db: Session, period: str, start: datetime) -> int:
+        board = window_board(period, start)
+        self.store.clear(board)
+        count = 0
+        rows = db.query(RankingRollup).filter(
+            RankingRollup.period == period,
+            RankingRollup.window_start == start
+        ).yield_per(5000)
+        groups = set()
+        for rollup in rows:
+            agent_type = rollup.agent_type or "general"
+            self._write(board, rollup.agent_name, agent_type, rollup.best_score, rollup.level, rollup.task_count,
+                        check_previous=False)
+            groups.add((agent_type, rollup.level))
+            count += 1
+        self._expire_window(period, start, groups)
+        return count
+
+    def record_window(self, rollup: RankingRollup):
+        """写入一个Agent在某个时间窗口内的最高分"""
+        agent_type = rollup.agent_type or "general"
+        board = window_board(rollup.period, rollup.window_start)
+        self._write(board, rollup.agent_name, agent_type, rollup.best_score, rollup.level, rollup.task_count)
+        self._expire_window(rollup.period, rollup.window_start, {(agent_type, rollup.level)})
+
+    def _expire_window(self, period: str, start: datetime, groups):
+        """groups为窗口内出现过的(agent_type, level)组合"""
+        board = window_board(period, start)
+        ttl = window_ttl_seconds(period, start)
+        keys = {global_key(board), meta_key(board)}
+        for agent_type, level in groups:
+            keys.add(type_key(agent_type, board))
+            if level:
+                keys.update((level_key(level, board), type_level_key(agent_type, level, board)))
+        for key in keys:
+            self.store.expire(key, ttl)
+
+    # ============== 查询 ==============
+
+    def rank_of(self, score: float, board: str = ALL_TIME) -> int:
+        return self.store.count_above(global_key(board), score) + 1
+
+    def size(self, agent_type: Optional[str] = None, board: str = ALL_TIME, level: Optional[str] = None) -> int:
+        """上榜Agent总数"""
+        return self.store.card(filter_key(agent_type, level, board))
+
+    def get(self, agent_name: str, board: str = ALL_TIME) -> Optional[LeaderboardEntry]:
+        score = self.store.score(global_key(board), agent_name)
+        if score is None:
+            return None
+        return self._entries(board, [(agent_name, score)])[0]
+
+    def page(
+        self,
+        agent_type: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[Tuple[float, str]] = None,
+        board: str = ALL_TIME,
+        level: Optional[str] = None
+    ) -> List[LeaderboardEntry]:
+        """按分数降序取一页；after为上一页最后一项的(分数, agent_name)"""
+        key = filter_key(agent_type, level, board)
+        start = self.store.rev_index_after(key, *after) if after else max(skip, 0)
+        return self._entries(board, self.store.rev_range(key, start, limit))
+
+    def _entries(self, board: str, items: List[Tuple[str, float]]) -> List[LeaderboardEntry]:
+        metas = self.store.get_meta(meta_key(board), [member for member, _ in items])
+        entries = []
+        for (member, score), meta in zip(items, metas):
+            meta = meta or {}
+            entries.append(LeaderboardEntry(
+                rank=self.rank_of(score, board),
+                agent_name=member,
+                agent_type=meta.get("agent_type"),
+                total_score=meta.get("total_score", score),
+                level=meta.get("level"),
+                task_count=meta.get("task_count", 1),
+                score=score
+            ))
+        return entries
+
+
+# 全局排行榜
+leaderboard = Leaderboard()
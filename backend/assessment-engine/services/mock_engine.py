@@ -3,12 +3,98 @@
 使用随机数据模拟真实测评结果
 """
 
+import os
+import math
 import random
 import time
+import asyncio
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence
 from sqlalchemy.orm import Session
 from models.database import AssessmentTask, Report, TempToken
+from services.scoring_rules import ScoringRules, scoring_rules
+
+# 模拟测评耗时分布，格式见 LatencyProfile.from_spec
+MOCK_LATENCY_PROFILE = os.getenv("MOCK_LATENCY_PROFILE", "uniform:3,5")
+
+
+class LatencyProfile:
+    """
+    模拟测评耗时分布（压测用）
+    
+    支持:
+    - fixed:     固定耗时
+    - uniform:   [low, high] 均匀分布
+    - lognormal: 以median为中位数、sigma为形状参数的对数正态分布，上限max_seconds
+    - replay:    从真实测评耗时中随机回放
+    """
+    
+    def __init__(self, kind: str, params: Optional[Dict[str, float]] = None,
+                 samples: Optional[Sequence[float]] = None):
+        if kind not in ("fixed", "uniform", "lognormal", "replay"):
+            raise ValueError(f"不支持的耗时分布: {kind}")
+        if kind == "replay" and not samples:
+            raise ValueError("replay分布需要至少一个样本")
+        self.kind = kind
+        self.params = params or {}
+        self.samples = list(samples or [])
+    
+    @classmethod
+    def fixed(cls, seconds: float) -> "LatencyProfile":
+        return cls("fixed", {"seconds": seconds})
+    
+    @classmethod
+    def uniform(cls, low: float, high: float) -> "LatencyProfile":
+        return cls("uniform", {"low": low, "high": high})
+    
+    @classmethod
+    def lognormal(cls, median: float, sigma: float, max_seconds: float = 60) -> "LatencyProfile":
+        return cls("lognormal", {"median": median, "sigma": sigma, "max_seconds": max_seconds})
+    
+    @classmethod
+    def replay(cls, durations: Sequence[float]) -> "LatencyProfile":
+        return cls("replay", samples=[d for d in durations if d is not None and d >= 0])
+    
+    @classmethod
+    def from_recorded(cls, db: Session, limit: int = 1000) -> "LatencyProfile":
+        """使用最近完成的测评任务的真实耗时"""
+        rows = db.query(AssessmentTask.duration_seconds).filter(
+            AssessmentTask.status == "completed",
+            AssessmentTask.duration_seconds.isnot(None)
+        ).order_by(AssessmentTask.completed_at.desc()).limit(limit).all()
+        return cls.replay([r[0] for r in rows])
+    
+    @classmethod
+    def from_spec(cls, spec: str) -> "LatencyProfile":
+        """
+        解析文本配置:
+        fixed:4 / uniform:3,5 / lognormal:4,0.5[,60] / replay:3.2,4.1,5.0
+        """
+        kind, _, raw = spec.partition(":")
+        values = [float(v) for v in raw.split(",") if v.strip()]
+        kind = kind.strip()
+        if kind == "fixed":
+            return cls.fixed(values[0])
+        if kind == "uniform":
+            return cls.uniform(values[0], values[1])
+        if kind == "lognormal":
+            return cls.lognormal(*values[:3])
+        if kind == "replay":
+            return cls.replay(values)
+        raise ValueError(f"不支持的耗时分布: {kind}")
+    
+    def sample(self, rng: Optional[random.Random] = None) -> float:
+        """采样一次耗时（秒）"""
+        rng = rng or random
+        if self.kind == "fixed":
+            return self.params["seconds"]
+        if self.kind == "uniform":
+            return rng.uniform(self.params["low"], self.params["high"])
+        if self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(self.params["median"]), self.params["sigma"])
+            return min(value, self.params["max_seconds"])
+        return rng.choice(self.samples)
+
 
 def run_mock_assessment(db: Session, task: AssessmentTask) -> Dict[str, Any]:
     """
@@ -18,8 +104,91 @@ def run_mock_assessment(db: Session, task: AssessmentTask) -> Dict[str, Any]:
     # 模拟测试耗时 3-5 秒
     time.sleep(random.uniform(3, 5))
     
+    return _score_mock_assessment(task.agent_id)
+
+def run_standardized_mock_assessment(
+    agent_id: str,
+    agent_name: Optional[str] = None,
+    latency: Optional[LatencyProfile] = None
+) -> Dict[str, Any]:
+    """
+    标准化测评的模拟实现（assessment_engine_v2未部署时Bot测评使用）
+    返回与run_standardized_assessment_v2相同的结构: dimensions / raw_score / level
+    """
+    latency = latency or LatencyProfile.from_spec(MOCK_LATENCY_PROFILE)
+    time.sleep(latency.sample())
+    
+    result = _score_mock_assessment(agent_id)
+    return {
+        "agent_id": agent_id,
+        "agent_name": agent_name or agent_id,
+        "dimensions": {
+            "tool_usage": {"score": result["tool_score"], "max_score": 400},
+            "reasoning": {"score": result["reasoning_score"], "max_score": 300},
+            "interaction": {"score": result["interaction_score"], "max_score": 200},
+            "stability": {"score": result["stability_score"], "max_score": 100}
+        },
+        "raw_score": result["total_score"],
+        "level": result["level"],
+        "engine": "mock"
+    }
+
+async def run_mock_assessment_async(
+    db: Optional[Session],
+    task: AssessmentTask,
+    latency: Optional[LatencyProfile] = None
+) -> Dict[str, Any]:
+    """
+    运行模拟测评（asyncio版本）
+    等待期间不占用线程，单进程可同时模拟数千个测评；返回结果与run_mock_assessment一致
+    """
+    latency = latency or LatencyProfile.from_spec(MOCK_LATENCY_PROFILE)
+    await asyncio.sleep(latency.sample())
+    
+    return _score_mock_assessment(task.agent_id)
+
+async def simulate_mock_load(
+    agent_ids: List[str],
+    latency: Optional[LatencyProfile] = None,
+    concurrency: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    压测：并发运行一批模拟测评
+    concurrency为空时全部同时发起
+    """
+    latency = latency or LatencyProfile.from_spec(MOCK_LATENCY_PROFILE)
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    durations: List[float] = []
+    
+    async def _run_one(agent_id: str) -> Dict[str, Any]:
+        task = AssessmentTask(agent_id=agent_id)
+        started = time.perf_counter()
+        if semaphore:
+            async with semaphore:
+                result = await run_mock_assessment_async(None, task, latency)
+        else:
+            result = await run_mock_assessment_async(None, task, latency)
+        durations.append(time.perf_counter() - started)
+        return result
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_run_one(agent_id) for agent_id in agent_ids))
+    wall_seconds = time.perf_counter() - started
+    
+    durations.sort()
+    return {
+        "count": len(results),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(len(results) / wall_seconds, 1) if wall_seconds else None,
+        "latency_p50": round(durations[len(durations) // 2], 3) if durations else None,
+        "latency_p95": round(durations[int(len(durations) * 0.95) - 1], 3) if durations else None,
+        "results": results
+    }
+
+def _score_mock_assessment(agent_id: str) -> Dict[str, Any]:
+    """模拟4维度评分"""
     # 模拟4维度评分 (基于agent_id生成固定但合理的结果)
-    agent_seed = hash(task.agent_id) % 1000
+    agent_seed = hash(agent_id) % 1000
     
     # 工具调用 (0-400分)
     tool_score = min(400, max(200, 250 + agent_seed % 150 + random.randint(-30, 30)))
@@ -59,11 +228,7 @@ def run_mock_assessment(db: Session, task: AssessmentTask) -> Dict[str, Any]:
     }
 
 def generate_free_report(task_code: str, agent_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
-    """生成免费版报告"""
-    # 计算百分位
-    total_score = result.get("total_score", 0)
-    ranking_percentile = min(99, max(10, 50 + (total_score - 500) / 5))
-    
+    """生成免费版报告（ranking_percentile由分数分布草图计算）"""
     return {
         "version": "1.0",
         "task_code": task_code,
@@ -73,62 +238,23 @@ def generate_free_report(task_code: str, agent_id: str, result: Dict[str, Any])
             "total": result["total_score"],
             "max": 1000,
             "level": result["level"],
-            "percentile": round(ranking_percentile, 1)
+            "percentile": result["ranking_percentile"]
         },
         "summary": f"Agent {agent_id} 总体表现{result['level']}水平",
         "upgrade_prompt": "解锁深度报告查看4维度详细分析和改进建议"
     }
 
-def generate_full_report(task_code: str, agent_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
-    """生成完整深度报告"""
-    dimensions = {
-        "tool_usage": {
-            "score": result["tool_score"],
-            "max_score": 400,
-            "weight": 0.4,
-            "level": _get_dimension_level(result["tool_score"], 400),
-            "details": {
-                "tool_selection": round(result["tool_score"] * 0.3, 1),
-                "parameter_filling": round(result["tool_score"] * 0.3, 1),
-                "tool_chaining": round(result["tool_score"] * 0.25, 1),
-                "error_correction": round(result["tool_score"] * 0.15, 1)
-            }
-        },
-        "reasoning": {
-            "score": result["reasoning_score"],
-            "max_score": 300,
-            "weight": 0.3,
-            "level": _get_dimension_level(result["reasoning_score"], 300),
-            "details": {
-                "logic": round(result["reasoning_score"] * 0.35, 1),
-                "math": round(result["reasoning_score"] * 0.35, 1),
-                "long_text": round(result["reasoning_score"] * 0.3, 1)
-            }
-        },
-        "interaction": {
-            "score": result["interaction_score"],
-            "max_score": 200,
-            "weight": 0.2,
-            "level": _get_dimension_level(result["interaction_score"], 200),
-            "details": {
-                "intent_recognition": round(result["interaction_score"] * 0.5, 1),
-                "emotion_perception": round(result["interaction_score"] * 0.5, 1)
-            }
-        },
-        "stability": {
-            "score": result["stability_score"],
-            "max_score": 100,
-            "weight": 0.1,
-            "level": _get_dimension_level(result["stability_score"], 100),
-            "details": {
-                "consistency": round(result["stability_score"] * 0.5, 1),
-                "compliance": round(result["stability_score"] * 0.5, 1)
-            }
-        }
-    }
-    
-    # 生成建议
-    recommendations = _generate_recommendations(result)
+def generate_full_report(
+    task_code: str,
+    agent_id: str,
+    result: Dict[str, Any],
+    rules: Optional[ScoringRules] = None
+) -> Dict[str, Any]:
+    """生成完整深度报告（维度等级、子项和建议由评分规则计算）"""
+    rules = rules or scoring_rules.current()
+    scored = rules.apply([result], ruleset="bot", decimals=1, with_level=True)[0]
+    dimensions = scored["dimensions"]
+    recommendations = scored["recommendations"]
     
     return {
         "version": "1.0",
@@ -144,83 +270,9 @@ def generate_full_report(task_code: str, agent_id: str, result: Dict[str, Any])
         "dimensions": dimensions,
         "recommendations": recommendations,
         "ranking": {
-            "global_rank": int(1000 - result["ranking_percentile"] * 10),
-            "total_agents": 1000,
-            "top_percentile": round(result["ranking_percentile"], 1)
+            "global_rank": result["global_rank"],
+            "total_agents": result["total_agents"],
+            "top_percentile": round(result["global_rank"] * 100 / result["total_agents"], 1)
         }
     }
 
-def _get_dimension_level(score: float, max_score: float) -> str:
-    """获取维度等级"""
-    ratio = score / max_score
-    if ratio >= 0.85:
-        return "Excellent"
-    elif ratio >= 0.7:
-        return "Good"
-    elif ratio >= 0.5:
-        return "Average"
-    else:
-        return "Needs Improvement"
-
-def _generate_recommendations(result: Dict[str, Any]) -> list:
-    """生成改进建议"""
-    recommendations = []
-    
-    if result["tool_score"] < 300:
-        recommendations.append({
-            "area": "工具调用",
-            "current_score": result["tool_score"],
-            "target_score": 350,
-            "priority": "High",
-            "suggestions": [
-                "加强对API工具的理解",
-                "优化参数填写准确性",
-                "练习多工具串联使用"
-            ]
-        })
-    
-    if result["reasoning_score"] < 220:
-        recommendations.append({
-            "area": "认知推理",
-            "current_score": result["reasoning_score"],
-            "target_score": 250,
-            "priority": "Medium",
-            "suggestions": [
-                "提升逻辑推理能力",
-                "加强数学计算准确性",
-                "优化长文本理解"
-            ]
-        })
-    
-    if result["interaction_score"] < 150:
-        recommendations.append({
-            "area": "交互理解",
-            "current_score": result["interaction_score"],
-            "target_score": 170,
-            "priority": "Medium",
-            "suggestions": [
-                "增强用户意图识别",
-                "提升多轮对话能力"
-            ]
-        })
-    
-    if result["stability_score"] < 70:
-        recommendations.append({
-            "area": "稳定性",
-            "current_score": result["stability_score"],
-            "target_score": 80,
-            "priority": "Low",
-            "suggestions": [
-                "优化异常处理能力",
-                "增强输出一致性"
-            ]
-        })
-    
-    if not recommendations:
-        recommendations.append({
-            "area": "整体表现",
-            "message": "表现优秀！继续保持",
-            "priority": "None"
-        })
-    
-    return recommendations
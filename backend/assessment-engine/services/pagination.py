@@ -0,0 +1,138 @@
+"""
+游标分页 - 按索引列(排序键, id)做keyset查询，任意深度的翻页代价相同
+游标对客户端不透明（base64编码的上一页最后一行排序键），总数单独缓存
+未传游标时仍接受skip（OFFSET，兼容旧客户端翻页），深翻页应改用游标
+"""
+
+import os
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.orm import Query
+
+PAGINATION_COUNT_TTL_SECONDS = float(os.getenv("PAGINATION_COUNT_TTL_SECONDS", "30"))
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析或与当前排序不匹配"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int, types: Optional[Sequence[Any]] = None) -> List[Any]:
+    """解析游标，types为各位置允许的类型（如排行榜的(分数, agent_name)为((int, float), str)）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor("无效的分页游标")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("无效的分页游标")
+    if types and not all(
+        isinstance(v, t) and not isinstance(v, bool) for v, t in zip(values, types)
+    ):
+        raise InvalidCursor("无效的分页游标")
+    return values
+
+
+def keyset_page(
+    query: Query,
+    columns: Sequence[Any],
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    descending: bool = True,
+    skip: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    按columns（末列须唯一，通常为id）排序取一页
+    返回(本页记录, 下一页游标)，没有下一页时游标为None
+    skip仅在未传cursor时生效
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        try:
+            values = [
+                datetime.fromisoformat(v) if isinstance(col.type, DateTime) and v is not None else v
+                for col, v in zip(columns, values)
+            ]
+        except (TypeError, ValueError):
+            raise InvalidCursor("无效的分页游标")
+        query = query.filter(_after(columns, values, descending))
+
+    order = [col.desc() if descending else col.asc() for col in columns]
+    query = query.order_by(*order)
+    if skip > 0 and not cursor:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, col.key) for col in columns])
+    return rows, next_cursor
+
+
+def _after(columns: Sequence[Any], values: Sequence[Any], descending: bool):
+    """(c1, c2, ...) 严格位于游标之后的条件，展开为 c1 < v1 OR (c1 = v1 AND c2 < v2) ...（便于命中复合索引）"""
+    clauses = []
+    for i, (col, value) in enumerate(zip(columns, values)):
+        beyond = col < value if descending else col > value
+        clauses.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], beyond))
+    return or_(*clauses)
+
+
+def set_page_headers(response, next_cursor: Optional[str], total: Optional[int] = None):
+    """列表接口的响应体保持为数组，分页信息放在响应头中"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+
+class CountCache:
+    """
+    总数缓存：COUNT(*)在大表上代价与深翻页相同，按查询条件缓存一段时间（近似总数）
+    最多保留max_keys个查询条件，超出时淘汰最久未使用的
+    """
+
+    def __init__(self, ttl: float = PAGINATION_COUNT_TTL_SECONDS, max_keys: int = 10000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+    def get(self, key: str, counter: Callable[[], int]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+        total = counter()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return total
+
+    def invalidate(self, prefix: str = ""):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+
+# 全局总数缓存
+count_cache = CountCache()
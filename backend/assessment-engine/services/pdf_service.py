@@ -0,0 +1,230 @@
+"""
+PDF报告渲染 - 在独立进程池中渲染（WeasyPrint），API Worker从不参与渲染
+输出按报告内容哈希缓存在磁盘上，重复下载直接以文件响应返回（服务器支持时为零拷贝发送）
+报告生成后立即提交预渲染，Bot下载时通常已命中缓存；未命中时返回202由Bot稍后重试
+"""
+
+import os
+import json
+import html
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from models.database import AssessmentTask, Report
+
+logger = logging.getLogger(__name__)
+
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+# 排队 + 渲染中的任务上限，超出后拒绝（预渲染直接丢弃，下载返回503）
+PDF_RENDER_MAX_PENDING = int(os.getenv("PDF_RENDER_MAX_PENDING", "64"))
+# 单个PDF的平均渲染耗时，用于估算Retry-After
+PDF_RENDER_AVG_SECONDS = float(os.getenv("PDF_RENDER_AVG_SECONDS", "2"))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "oaeas-pdf-cache"))
+# 模板变化时递增，使旧缓存失效
+PDF_TEMPLATE_VERSION = "1"
+
+DIMENSION_LABELS = {
+    "tool_usage": "工具调用",
+    "reasoning": "推理能力",
+    "interaction": "交互理解",
+    "stability": "稳定性"
+}
+
+
+class RenderQueueFull(Exception):
+    """渲染队列已满"""
+
+    def __init__(self, pending: int, retry_after: int):
+        super().__init__(f"PDF渲染队列已满（{pending}个任务）")
+        self.pending = pending
+        self.retry_after = retry_after
+
+
+# ============== 报告数据 / 渲染（在子进程中执行） ==============
+
+def report_pdf_data(task: AssessmentTask, report: Report) -> Dict[str, Any]:
+    """PDF中使用的报告内容（缓存键即由此计算）"""
+    json_report = report.json_report or {}
+    return {
+        "agent_id": task.agent_id,
+        "task_code": task.task_code,
+        "total_score": task.total_score,
+        "level": task.level,
+        "dimensions": json_report.get("dimensions") or report.dimensions or {}
+    }
+
+
+def content_key(data: Dict[str, Any]) -> str:
+    raw = json.dumps([PDF_TEMPLATE_VERSION, data], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def render_html(data: Dict[str, Any]) -> str:
+    rows = []
+    for name, dimension in (data.get("dimensions") or {}).items():
+        score = dimension.get("score") if isinstance(dimension, dict) else dimension
+        max_score = dimension.get("max_score", "") if isinstance(dimension, dict) else ""
+        rows.append(
+            f"<tr><td>{html.escape(DIMENSION_LABELS.get(name, str(name)))}</td>"
+            f"<td>{html.escape(str(score))}</td><td>{html.escape(str(max_score))}</td></tr>"
+        )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><style>
+body {{ font-family: "Noto Sans CJK SC", sans-serif; margin: 40px; }}
+h1 {{ font-size: 22px; }} table {{ border-collapse: collapse; width: 100%; }}
+td, th {{ border: 1px solid #ccc; padding: 6px 10px; text-align: left; }}
+</style></head><body>
+<h1>OAEAS 测评报告</h1>
+<p>Agent: {html.escape(str(data.get("agent_id")))}　任务: {html.escape(str(data.get("task_code")))}</p>
+<p>总分: {html.escape(str(data.get("total_score")))} / 1000　等级: {html.escape(str(data.get("level")))}</p>
+<table><tr><th>维度</th><th>得分</th><th>满分</th></tr>{"".join(rows)}</table>
+</body></html>"""
+
+
+def render_pdf(data: Dict[str, Any]) -> bytes:
+    """WeasyPrint渲染（在进程池中调用）"""
+    from weasyprint import HTML
+    return HTML(string=render_html(data)).write_pdf()
+
+
+def _render_to_file(render: Callable[[Dict[str, Any]], bytes], data: Dict[str, Any], path: str) -> str:
+    """子进程: 渲染并原子写入缓存文件，只把路径传回父进程"""
+    pdf = render(data)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+    return path
+
+
+# ============== 渲染服务 ==============
+
+class PdfRenderer:
+    """
+    PDF渲染服务
+
+    - 渲染在ProcessPoolExecutor中进行，同一内容同时只渲染一次
+    - 排队中的任务数有上限，超出时抛出RenderQueueFull
+    - 缓存文件为 {cache_dir}/{key[:2]}/{key}.pdf，内容不变则键不变
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = PDF_CACHE_DIR,
+        workers: int = PDF_RENDER_WORKERS,
+        max_pending: int = PDF_RENDER_MAX_PENDING,
+        avg_seconds: float = PDF_RENDER_AVG_SECONDS,
+        render: Callable[[Dict[str, Any]], bytes] = render_pdf
+    ):
+        self.cache_dir = cache_dir
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.avg_seconds = avg_seconds
+        self._render = render
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        # 渲染失败的结果保留到下一次请求读取（返回错误），之后的请求重新渲染
+        self._failed: Dict[str, Future] = {}
+
+    # ============== 生命周期 ==============
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._inflight.clear()
+            self._failed.clear()
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    # ============== 缓存 ==============
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pdf")
+
+    def cached_path(self, data: Dict[str, Any]) -> Optional[str]:
+        path = self.path_for(content_key(data))
+        return path if os.path.exists(path) else None
+
+    # ============== 渲染 ==============
+
+    def submit(self, data: Dict[str, Any]) -> Future:
+        """提交渲染（已缓存时返回已完成的Future，同一内容渲染中时返回同一个Future）"""
+        key = content_key(data)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            done: Future = Future()
+            done.set_result(path)
+            return done
+
+        self.start()
+        with self._lock:
+            failed = self._failed.pop(key, None)
+            if failed is not None:
+                return failed
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if len(self._inflight) >= self.max_pending:
+                pending = len(self._inflight)
+                raise RenderQueueFull(pending, self.estimate_wait_seconds(pending))
+            future = self._executor.submit(_render_to_file, self._render, data, path)
+            self._inflight[key] = future
+        future.add_done_callback(lambda f, key=key: self._finished(key, f))
+        return future
+
+    def _finished(self, key: str, future: Future):
+        failed = not future.cancelled() and future.exception() is not None
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if failed:
+                if len(self._failed) >= self.max_pending:
+                    self._failed.pop(next(iter(self._failed)))
+                self._failed[key] = future
+        if failed:
+            logger.error("PDF render failed for %s: %s", key, future.exception())
+
+    def prerender(self, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        批量预渲染（报告生成后调用，不等待结果）
+        进程池未启动（测试/脚本）时不渲染；队列满时丢弃，下载时再按需渲染
+        返回提交的数量
+        """
+        if not self.started:
+            return 0
+        submitted = 0
+        for data in items:
+            try:
+                self.submit(data)
+                submitted += 1
+            except RenderQueueFull:
+                logger.warning("PDF render queue full, skipping pre-render")
+                break
+        return submitted
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def estimate_wait_seconds(self, pending: Optional[int] = None) -> int:
+        pending = self.pending() if pending is None else pending
+        return max(1, int(-(-(pending + 1) * self.avg_seconds // self.workers)))
+
+
+# 全局PDF渲染服务
+pdf_renderer = PdfRenderer()
@@ -0,0 +1,249 @@
+"""
+测评进度推送 - 进程内进度跟踪 + SSE事件流
+Worker线程上报用例/维度进度，SSE连接实时收到事件，Bot无需轮询状态接口
+
+用例级进度（case事件）由逐个执行用例的引擎上报：基于ConcurrentTestExecutor的引擎
+将executor_hooks(task_id)作为on_case_started / on_result传入即可；
+只按维度出分的引擎（内置模拟引擎）只推送progress / dimension事件
+"""
+
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.job_queue import ASSESSMENT_AVG_SECONDS
+
+# 四个测评维度（与报告dimensions一致）
+DIMENSIONS = ["tool_usage", "reasoning", "interaction", "stability"]
+
+# 用例生成器的维度名 -> 报告维度名
+CASE_DIMENSION_ALIASES = {"cognition": "reasoning", "compliance": "stability"}
+
+# SSE心跳间隔，同时也是跨进程兜底查询数据库的间隔
+SSE_HEARTBEAT_SECONDS = 15
+
+FINAL_STATUSES = ("completed", "failed")
+
+
+class ProgressTracker:
+    """
+    测评进度跟踪器
+
+    - 状态只保存在内存中，任务结束后即清除（最终结果以数据库为准）
+    - 线程安全：Worker线程上报，事件通过call_soon_threadsafe投递到订阅者的事件循环
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    # ============== 上报 ==============
+
+    def start(self, task_id: str, cases_per_dimension: Optional[Dict[str, int]] = None):
+        """开始跟踪，cases_per_dimension为各维度用例数（默认每维度1个单元）"""
+        cases_per_dimension = cases_per_dimension or {d: 1 for d in DIMENSIONS}
+        with self._lock:
+            self._states[task_id] = {
+                "status": "running",
+                "started": time.monotonic(),
+                "total_cases": sum(cases_per_dimension.values()),
+                "completed_cases": 0,
+                "current_test": None,
+                "dimensions": {
+                    name: {"total": total, "completed": 0, "score": None}
+                    for name, total in cases_per_dimension.items()
+                }
+            }
+        self._publish(task_id, "progress", self.snapshot(task_id))
+
+    def case_started(self, task_id: str, case_id: str):
+        """记录当前正在执行的用例"""
+        with self._lock:
+            state = self._states.get(task_id)
+            if state:
+                state["current_test"] = case_id
+
+    def case_done(self, task_id: str, case_id: str, dimension: str, status: str = "completed"):
+        """单个用例完成"""
+        with self._lock:
+            state = self._states.get(task_id)
+            if not state:
+                return
+            state["completed_cases"] += 1
+            dim = state["dimensions"].setdefault(dimension, {"total": 1, "completed": 0, "score": None})
+            dim["completed"] += 1
+        event = self.snapshot(task_id)
+        event.update({"case_id": case_id, "dimension": dimension, "case_status": status})
+        self._publish(task_id, "case", event)
+
+    def dimension_done(self, task_id: str, dimension: str, score: Optional[float] = None):
+        """维度完成（未逐个上报用例时，剩余用例一并计为完成）"""
+        with self._lock:
+            state = self._states.get(task_id)
+            if not state:
+                return
+            dim = state["dimensions"].setdefault(dimension, {"total": 1, "completed": 0, "score": None})
+            state["completed_cases"] += dim["total"] - dim["completed"]
+            dim["completed"] = dim["total"]
+            dim["score"] = score
+            state["current_test"] = None
+        event = self.snapshot(task_id)
+        event.update({"dimension": dimension, "score": score})
+        self._publish(task_id, "dimension", event)
+
+    def finish(self, task_id: str, status: str, **data):
+        """任务结束，推送最终事件并清除状态"""
+        event = {"status": status, "progress_percent": 100 if status == "completed" else None}
+        event.update(data)
+        self._publish(task_id, status, event)
+        with self._lock:
+            self._states.pop(task_id, None)
+
+    def executor_hooks(self, task_id: str) -> Dict[str, Callable[[Any], None]]:
+        """
+        ConcurrentTestExecutor的进度回调: ConcurrentTestExecutor(caller, **progress_tracker.executor_hooks(task_id))
+        on_case_started接收用例，on_result接收TestResult（按属性读取，不依赖执行器模块）
+        """
+        def on_case_started(case):
+            self.case_started(task_id, case.case_id)
+
+        def on_result(result):
+            dimension = getattr(result.dimension, "value", result.dimension)
+            self.case_done(
+                task_id, result.case_id, CASE_DIMENSION_ALIASES.get(dimension, dimension), result.status
+            )
+
+        return {"on_case_started": on_case_started, "on_result": on_result}
+
+    # ============== 查询 ==============
+
+    def snapshot(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """当前进度快照，未跟踪的任务返回None"""
+        with self._lock:
+            state = self._states.get(task_id)
+            if not state:
+                return None
+            total = state["total_cases"] or 1
+            done = state["completed_cases"]
+            elapsed = time.monotonic() - state["started"]
+            if done:
+                remaining = elapsed / done * (total - done)
+            else:
+                remaining = max(ASSESSMENT_AVG_SECONDS - elapsed, 0)
+            return {
+                "status": state["status"],
+                "progress_percent": min(99, int(done * 100 / total)),
+                "completed_cases": done,
+                "total_cases": total,
+                "current_test": state["current_test"],
+                "estimated_remaining_seconds": int(round(remaining)),
+                "dimensions": {
+                    name: {
+                        "progress_percent": int(d["completed"] * 100 / (d["total"] or 1)),
+                        "score": d["score"]
+                    }
+                    for name, d in state["dimensions"].items()
+                }
+            }
+
+    # ============== 订阅 ==============
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        """订阅任务事件（需在事件循环中调用）"""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = [s for s in self._subscribers.get(task_id, []) if s[1] is not queue]
+            if subscribers:
+                self._subscribers[task_id] = subscribers
+            else:
+                self._subscribers.pop(task_id, None)
+
+    def _publish(self, task_id: str, event_type: str, data: Optional[Dict[str, Any]]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (event_type, data))
+            except RuntimeError:
+                # 订阅方的事件循环已关闭
+                self.unsubscribe(task_id, queue)
+
+
+def estimate_progress(task_status: str, started_at: Optional[datetime]) -> Tuple[int, Optional[int]]:
+    """没有进程内进度时（任务在其他进程执行），按平均耗时估算进度和剩余时间"""
+    if task_status == "completed":
+        return 100, 0
+    if task_status != "running" or not started_at:
+        return 0, None
+    elapsed = (datetime.utcnow() - started_at.replace(tzinfo=None)).total_seconds()
+    percent = min(95, int(elapsed * 100 / ASSESSMENT_AVG_SECONDS)) if ASSESSMENT_AVG_SECONDS else 50
+    return max(percent, 0), int(max(ASSESSMENT_AVG_SECONDS - elapsed, 0))
+
+
+def load_task_status(task_id: str) -> Optional[str]:
+    """使用独立会话读取任务状态"""
+    from database import SessionLocal
+    from models.database import AssessmentTask
+
+    db = SessionLocal()
+    try:
+        row = db.query(AssessmentTask.status).filter(AssessmentTask.id == task_id).first()
+        return row[0] if row else None
+    finally:
+        db.close()
+
+
+def format_sse(event_type: str, data: Any) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_task_events(
+    task_id: str,
+    task_code: str,
+    initial_status: str,
+    status_loader: Callable[[str], Optional[str]] = load_task_status
+):
+    """
+    SSE事件流
+    status_loader(task_id)用于心跳时从数据库兜底确认状态（任务可能在其他进程执行）
+    """
+    queue = progress_tracker.subscribe(task_id)
+    try:
+        snapshot = progress_tracker.snapshot(task_id) or {"status": initial_status}
+        snapshot["task_code"] = task_code
+        yield format_sse("progress", snapshot)
+        if initial_status in FINAL_STATUSES:
+            yield format_sse(initial_status, {"task_code": task_code, "status": initial_status})
+            return
+
+        while True:
+            try:
+                event_type, data = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                status = await asyncio.to_thread(status_loader, task_id)
+                if status in FINAL_STATUSES:
+                    yield format_sse(status, {"task_code": task_code, "status": status})
+                    return
+                yield ": keepalive\n\n"
+                continue
+
+            data = dict(data or {})
+            data["task_code"] = task_code
+            yield format_sse(event_type, data)
+            if event_type in FINAL_STATUSES:
+                return
+    finally:
+        progress_tracker.unsubscribe(task_id, queue)
+
+
+# 全局进度跟踪器
+progress_tracker = ProgressTracker()
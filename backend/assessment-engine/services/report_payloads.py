@@ -0,0 +1,190 @@
+"""
+报告响应预序列化 - 免费版/完整版报告的最终JSON字节在生成或解锁时序列化一次，gzip压缩后落库（reports.free_payload / full_payload）
+接口直接返回字节并带强ETag，Bot轮询时If-None-Match命中即返回304，不再查询任务/报告，也不做序列化
+进程内按task_code做LRU缓存；缓存带TTL，其他进程解锁后最多TTL秒内生效
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from models.database import AssessmentTask, Report
+
+REPORT_PAYLOAD_CACHE_TTL_SECONDS = float(os.getenv("REPORT_PAYLOAD_CACHE_TTL_SECONDS", "300"))
+REPORT_PAYLOAD_CACHE_SIZE = int(os.getenv("REPORT_PAYLOAD_CACHE_SIZE", "10000"))
+
+VIEWS = ("free", "full")
+
+
+@dataclass(frozen=True)
+class ReportPayload:
+    """某个视图的最终响应字节（agent_id用于缓存命中时的归属校验）"""
+    agent_id: str
+    body: bytes
+    etag: str
+
+
+# ============== 报告视图 ==============
+
+def build_free_report(task: AssessmentTask, report: Report) -> Dict[str, Any]:
+    """免费版：仅包含总分、等级、排名百分位、摘要"""
+    json_report = report.json_report or {}
+    score_data = json_report.get("score", {})
+    return {
+        "version": "1.0",
+        "task_code": task.task_code,
+        "agent_id": task.agent_id,
+        "generated_at": report.created_at.isoformat() if report.created_at else None,
+        "score": {
+            "total": score_data.get("total", task.total_score),
+            "max": 1000,
+            "level": score_data.get("level", task.level),
+            "percentile": score_data.get("percentile", report.ranking_percentile)
+        },
+        "summary": f"Agent {task.agent_id} 测评完成，总分{task.total_score}分",
+        "upgrade_prompt": "免费模式下所有报告已解锁，可直接获取完整报告"
+    }
+
+
+def build_full_report(db: Session, task: AssessmentTask, report: Report) -> Dict[str, Any]:
+    """完整版：优先使用生成时的json_report，旧报告按当前排名补全"""
+    if report.json_report:
+        return report.json_report
+
+    from services.assessment_service import RankingService
+    global_rank = RankingService.rank_of(db, task.total_score or 0)
+    total_agents = max(RankingService.total_agents(db), global_rank)
+    return {
+        "version": "1.0",
+        "task_code": task.task_code,
+        "agent_id": task.agent_id,
+        "generated_at": report.created_at.isoformat() if report.created_at else None,
+        "score": {
+            "total": task.total_score,
+            "max": 1000,
+            "level": task.level,
+            "percentile": report.ranking_percentile
+        },
+        "dimensions": report.dimensions,
+        "recommendations": report.recommendations,
+        "ranking": {
+            "global_rank": global_rank,
+            "total_agents": total_agents,
+            "top_percentile": round(global_rank * 100 / total_agents, 1)
+        }
+    }
+
+
+def serialize(data: Any) -> bytes:
+    """与JSONResponse相同的编码方式（紧凑、不转义中文）"""
+    envelope = {"code": 200, "message": "success", "data": data}
+    return json.dumps(
+        jsonable_encoder(envelope), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    """强ETag：响应字节的摘要"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match使用弱比较
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def payload_response(payload: ReportPayload, if_none_match: Optional[str] = None) -> Response:
+    headers = {"ETag": payload.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, payload.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+# ============== 缓存 ==============
+
+class ReportPayloads:
+    """报告响应字节: 落库 + 进程内LRU"""
+
+    def __init__(self, ttl: float = REPORT_PAYLOAD_CACHE_TTL_SECONDS, max_keys: int = REPORT_PAYLOAD_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, ReportPayload]]" = OrderedDict()
+
+    def get(self, task_code: str, view: str, agent_id: str) -> Optional[ReportPayload]:
+        """缓存命中且属于该Agent时返回，否则返回None（由调用方查库后load）"""
+        key = (task_code, view)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            payload = entry[1]
+        return payload if payload.agent_id == agent_id else None
+
+    def load(self, db: Session, task: AssessmentTask, report: Report, view: str) -> ReportPayload:
+        """读取已落库的字节；旧报告尚未序列化时补做一次"""
+        stored = getattr(report, f"{view}_payload")
+        if not stored:
+            self.store(db, task, report)
+            db.commit()
+            stored = getattr(report, f"{view}_payload")
+        body = gzip.decompress(stored)
+        payload = ReportPayload(agent_id=task.agent_id, body=body, etag=make_etag(body))
+        self._put(task.task_code, view, payload)
+        return payload
+
+    def store(self, db: Session, task: AssessmentTask, report: Report):
+        """序列化两个视图并写入report（由调用方提交），同时刷新本进程缓存"""
+        views = {
+            "free": build_free_report(task, report),
+            "full": build_full_report(db, task, report)
+        }
+        for view, data in views.items():
+            body = serialize(data)
+            setattr(report, f"{view}_payload", gzip.compress(body, mtime=0))
+            self._put(task.task_code, view, ReportPayload(agent_id=task.agent_id, body=body, etag=make_etag(body)))
+
+    def refresh(self, db: Session, report: Report):
+        """报告解锁等变更后重新序列化并提交"""
+        task = report.task or db.query(AssessmentTask).filter(AssessmentTask.id == report.task_id).first()
+        if not task:
+            return
+        self.store(db, task, report)
+        db.commit()
+
+    def invalidate(self, task_code: str):
+        with self._lock:
+            for view in VIEWS:
+                self._entries.pop((task_code, view), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, task_code: str, view: str, payload: ReportPayload):
+        with self._lock:
+            self._entries[(task_code, view)] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end((task_code, view))
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+
+# 全局报告响应缓存
+report_payloads = ReportPayloads()
@@ -0,0 +1,202 @@
+"""
+Agent历史成绩 - 报告中的上次得分、变化量和趋势，以及按时间降采样的历史曲线
+
+- 生成报告时走 (agent_id, completed_at) 覆盖索引取最近N条（不读缓存，多进程下也能看到其他Worker刚写入的成绩）
+- 历史接口读取进程内缓存（LRU + TTL），未命中时同样只取最近N条，不扫描assessment_tasks
+- 历史曲线按时间等宽分桶（平均/最低/最高），返回点数与Agent测评次数无关
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.database import AssessmentTask
+
+SCORE_HISTORY_WINDOW = int(os.getenv("SCORE_HISTORY_WINDOW", "10"))
+SCORE_HISTORY_CACHE_SIZE = int(os.getenv("SCORE_HISTORY_CACHE_SIZE", "10000"))
+# 其他进程写入的成绩最多TTL秒后可见
+SCORE_HISTORY_CACHE_TTL_SECONDS = float(os.getenv("SCORE_HISTORY_CACHE_TTL_SECONDS", "300"))
+# 每次测评平均变化低于该值视为持平
+SCORE_TREND_THRESHOLD = float(os.getenv("SCORE_TREND_THRESHOLD", "5"))
+MAX_HISTORY_POINTS = 1000
+
+
+@dataclass(frozen=True)
+class HistoryPoint:
+    task_code: str
+    score: float
+    completed_at: datetime
+
+
+def trend_of(scores: List[float], threshold: float = SCORE_TREND_THRESHOLD) -> Optional[str]:
+    """按最小二乘斜率（每次测评的平均变化）判断趋势: up / down / flat"""
+    n = len(scores)
+    if n < 2:
+        return None
+    mean_x = (n - 1) / 2
+    mean_y = sum(scores) / n
+    slope = sum((i - mean_x) * (y - mean_y) for i, y in enumerate(scores)) / sum(
+        (i - mean_x) ** 2 for i in range(n)
+    )
+    if slope >= threshold:
+        return "up"
+    if slope <= -threshold:
+        return "down"
+    return "flat"
+
+
+def _completed(db: Session, agent_id: str):
+    return db.query(AssessmentTask).filter(
+        AssessmentTask.agent_id == agent_id,
+        AssessmentTask.status == "completed",
+        AssessmentTask.completed_at.isnot(None)
+    )
+
+
+class ScoreHistory:
+    """每个Agent最近N次成绩的缓存"""
+
+    def __init__(
+        self,
+        window: int = SCORE_HISTORY_WINDOW,
+        max_agents: int = SCORE_HISTORY_CACHE_SIZE,
+        ttl: float = SCORE_HISTORY_CACHE_TTL_SECONDS
+    ):
+        self.window = window
+        self.max_agents = max_agents
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Deque[HistoryPoint]]]" = OrderedDict()
+
+    # ============== 最近N次 ==============
+
+    def recent(self, db: Session, agent_id: str) -> List[HistoryPoint]:
+        """最近N次成绩（按完成时间升序）"""
+        with self._lock:
+            entry = self._entries.get(agent_id)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(agent_id)
+                return list(entry[1])
+        points = self._load(db, agent_id)
+        self._put(agent_id, points)
+        return list(points)
+
+    def _load(self, db: Session, agent_id: str) -> Deque[HistoryPoint]:
+        rows = _completed(db, agent_id).with_entities(
+            AssessmentTask.task_code, AssessmentTask.total_score, AssessmentTask.completed_at
+        ).order_by(AssessmentTask.completed_at.desc()).limit(self.window).all()
+        return deque(
+            (HistoryPoint(row[0], row[1] or 0, row[2]) for row in reversed(rows)),
+            maxlen=self.window
+        )
+
+    def _put(self, agent_id: str, points: Deque[HistoryPoint]):
+        with self._lock:
+            self._entries[agent_id] = (time.monotonic() + self.ttl, points)
+            self._entries.move_to_end(agent_id)
+            while len(self._entries) > self.max_agents:
+                self._entries.popitem(last=False)
+
+    def record(self, db: Session, task: AssessmentTask) -> Dict[str, Any]:
+        """
+        计入本次成绩并返回与上次的对比（任务须已标记完成）
+        previous_score / delta在首次测评时为None
+        总是查库（索引取最近N条），查询结果同时刷新缓存
+        """
+        points = self._load(db, task.agent_id)
+        current = HistoryPoint(task.task_code, task.total_score or 0, task.completed_at or datetime.utcnow())
+        # 本次成绩已提交时会随查询一并载入，去重后再追加
+        points = [p for p in points if p.task_code != task.task_code]
+        previous = points[-1] if points else None
+        points.append(current)
+        self._put(task.agent_id, deque(points, maxlen=self.window))
+
+        scores = [p.score for p in points[-self.window:]]
+        return {
+            "previous_score": round(previous.score, 2) if previous else None,
+            "previous_task_code": previous.task_code if previous else None,
+            "delta": round(current.score - previous.score, 2) if previous else None,
+            "trend": trend_of(scores),
+            "best_recent_score": round(max(scores), 2),
+            "recent_scores": [round(s, 2) for s in scores]
+        }
+
+    def invalidate(self, agent_id: str):
+        with self._lock:
+            self._entries.pop(agent_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ============== 历史曲线 ==============
+
+    def series(
+        self,
+        db: Session,
+        agent_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        points: int = 100
+    ) -> Dict[str, Any]:
+        """
+        时间范围内的成绩曲线，超过points次时按时间等宽分桶降采样
+        只读取 (completed_at, total_score) 两列，逐行聚合，内存只与points有关
+        """
+        points = max(1, min(points, MAX_HISTORY_POINTS))
+        query = _completed(db, agent_id)
+        if since:
+            query = query.filter(AssessmentTask.completed_at >= since)
+        if until:
+            query = query.filter(AssessmentTask.completed_at <= until)
+
+        total, first, last = query.with_entities(
+            func.count(AssessmentTask.id),
+            func.min(AssessmentTask.completed_at),
+            func.max(AssessmentTask.completed_at)
+        ).one()
+        rows = query.with_entities(
+            AssessmentTask.completed_at, AssessmentTask.total_score
+        ).order_by(AssessmentTask.completed_at).execution_options(yield_per=1000)
+
+        downsampled = total > points
+        if not downsampled:
+            series = [
+                {"completed_at": t.isoformat(), "score": round(s or 0, 2),
+                 "min_score": round(s or 0, 2), "max_score": round(s or 0, 2), "count": 1}
+                for t, s in rows
+            ]
+        else:
+            width = (last - first).total_seconds() / points or 1
+            buckets: Dict[int, List[float]] = {}
+            for t, s in rows:
+                index = min(int((t - first).total_seconds() / width), points - 1)
+                bucket = buckets.setdefault(index, [0.0, 0, float("inf"), float("-inf"), t])
+                s = s or 0
+                bucket[0] += s
+                bucket[1] += 1
+                bucket[2] = min(bucket[2], s)
+                bucket[3] = max(bucket[3], s)
+                bucket[4] = t
+            series = [
+                {"completed_at": b[4].isoformat(), "score": round(b[0] / b[1], 2),
+                 "min_score": round(b[2], 2), "max_score": round(b[3], 2), "count": b[1]}
+                for _, b in sorted(buckets.items())
+            ]
+        return {
+            "agent_id": agent_id,
+            "total_assessments": total,
+            "downsampled": downsampled,
+            "points": series
+        }
+
+
+# 全局历史成绩
+score_history = ScoreHistory()
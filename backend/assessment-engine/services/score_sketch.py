@@ -0,0 +1,325 @@
+"""
+分数分布统计 - 按agent_type和维度维护可合并的流式分位数草图（t-digest）
+每次测评完成时更新，报告中的百分位直接由草图计算（O(压缩参数)，与测评总数无关），无需扫描assessment_tasks
+草图定期持久化到system_configs，多进程各自累积增量，持久化时合并
+"""
+
+import os
+import time
+import math
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from models.database import AssessmentTask, SystemConfig, Token
+from services.progress import DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+SKETCH_COMPRESSION = int(os.getenv("SCORE_SKETCH_COMPRESSION", "100"))
+SKETCH_PERSIST_SECONDS = float(os.getenv("SCORE_SKETCH_PERSIST_SECONDS", "60"))
+
+# 总分 + 四个维度
+METRICS = ["total"] + DIMENSIONS
+# 不区分agent_type的全局分布
+ALL_TYPES = "all"
+
+
+class TDigest:
+    """
+    合并式t-digest
+    - 质心数量受compression限制，两端（高/低分）精度更高
+    - 支持合并，多进程的草图可以直接相加
+    """
+
+    def __init__(self, compression: int = SKETCH_COMPRESSION):
+        self.compression = compression
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._centroids: List[List[float]] = []  # [mean, weight]，按mean升序
+        self._buffer: List[List[float]] = []
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append([float(value), float(weight)])
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        other._compress()
+        for mean, weight in other._centroids:
+            self._buffer.append([mean, weight])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(self._centroids + self._buffer)
+        self._buffer = []
+
+        merged: List[List[float]] = []
+        cumulative = 0.0
+        for mean, weight in points:
+            if merged:
+                last = merged[-1]
+                q = (cumulative + (last[1] + weight) / 2) / self.count
+                limit = 4 * self.count * q * (1 - q) / self.compression
+                if last[1] + weight <= max(limit, 1):
+                    last[1] += weight
+                    last[0] += (mean - last[0]) * weight / last[1]
+                    continue
+                cumulative += last[1]
+            merged.append([mean, weight])
+        self._centroids = merged
+
+    def cdf(self, value: float) -> float:
+        """分布函数（中位秩：低于value的比例 + 等于value的一半）"""
+        self._compress()
+        if not self.count:
+            return 0.0
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+        if self.min == self.max:
+            return 0.5
+
+        means = [mean for mean, _ in self._centroids]
+        i = bisect.bisect_left(means, value)
+        j = bisect.bisect_right(means, value)
+        below = sum(weight for _, weight in self._centroids[:i])
+        if i < j:
+            # 与质心重合：低于的权重 + 重合权重的一半
+            equal = sum(weight for _, weight in self._centroids[i:j])
+            return (below + equal / 2) / self.count
+
+        # 在相邻质心中心（首尾以min/max为端点）之间线性插值
+        if i == 0:
+            x0, y0 = self.min, 0.0
+        else:
+            x0, y0 = means[i - 1], below - self._centroids[i - 1][1] / 2
+        if i == len(means):
+            x1, y1 = self.max, self.count
+        else:
+            x1, y1 = means[i], below + self._centroids[i][1] / 2
+        if x1 == x0:
+            return y1 / self.count
+        return (y0 + (y1 - y0) * (value - x0) / (x1 - x0)) / self.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """分位数（q ∈ [0, 1]）"""
+        self._compress()
+        if not self.count:
+            return None
+        target = min(max(q, 0.0), 1.0) * self.count
+        prev_x, prev_y, cumulative = self.min, 0.0, 0.0
+        for mean, weight in self._centroids:
+            y = cumulative + weight / 2
+            if target <= y:
+                return prev_x if y == prev_y else prev_x + (mean - prev_x) * (target - prev_y) / (y - prev_y)
+            prev_x, prev_y = mean, y
+            cumulative += weight
+        if self.count == prev_y:
+            return self.max
+        return prev_x + (self.max - prev_x) * (target - prev_y) / (self.count - prev_y)
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._compress()
+        return {
+            "compression": self.compression,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "centroids": self._centroids
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TDigest":
+        digest = cls(data.get("compression", SKETCH_COMPRESSION))
+        digest.count = data.get("count", 0.0)
+        if digest.count:
+            digest.min, digest.max = data["min"], data["max"]
+        digest._centroids = [list(c) for c in data.get("centroids", [])]
+        return digest
+
+
+class ScoreDistribution:
+    """
+    测评分数分布
+
+    - 键为"{agent_type}:{metric}"，每次测评同时计入自身agent_type和all
+    - _base为最近一次从数据库加载/合并的草图，_delta为本进程尚未持久化的增量
+    - persist()读取库中最新草图、合并本进程增量后写回，多进程不会互相覆盖
+    """
+
+    CONFIG_KEY = "score_sketches"
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        compression: int = SKETCH_COMPRESSION,
+        persist_seconds: float = SKETCH_PERSIST_SECONDS
+    ):
+        self._session_factory = session_factory
+        self.compression = compression
+        self.persist_seconds = persist_seconds
+        self._lock = threading.Lock()
+        self._base: Dict[str, TDigest] = {}
+        self._delta: Dict[str, TDigest] = {}
+        self._views: Dict[str, TDigest] = {}
+        self._loaded = False
+        self._last_persist = time.monotonic()
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @staticmethod
+    def _key(agent_type: str, metric: str) -> str:
+        return f"{agent_type}:{metric}"
+
+    # ============== 加载 / 持久化 ==============
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            row = db.query(SystemConfig).filter(SystemConfig.config_key == self.CONFIG_KEY).first()
+            if row and row.config_value:
+                self._base = {key: TDigest.from_dict(data) for key, data in row.config_value.items()}
+            else:
+                self._base = self._bootstrap(db)
+                self._write(db, self._base)
+            self._views.clear()
+            self._loaded = True
+
+    def _bootstrap(self, db: Session) -> Dict[str, TDigest]:
+        """首次启用时从历史测评一次性构建（之后不再扫描assessment_tasks）"""
+        sketches: Dict[str, TDigest] = {}
+        rows = db.query(
+            Token.agent_type,
+            AssessmentTask.total_score,
+            AssessmentTask.tool_score,
+            AssessmentTask.reasoning_score,
+            AssessmentTask.interaction_score,
+            AssessmentTask.stability_score
+        ).outerjoin(Token, Token.id == AssessmentTask.token_id).filter(
+            AssessmentTask.status == "completed"
+        ).yield_per(5000)
+        for agent_type, *values in rows:
+            for scope in {agent_type or "general", ALL_TYPES}:
+                for metric, value in zip(METRICS, values):
+                    if value is not None:
+                        sketches.setdefault(self._key(scope, metric), TDigest(self.compression)).add(value)
+        return sketches
+
+    def _write(self, db: Session, sketches: Dict[str, TDigest]):
+        value = {key: digest.to_dict() for key, digest in sketches.items()}
+        row = db.query(SystemConfig).filter(SystemConfig.config_key == self.CONFIG_KEY).first()
+        if row:
+            row.config_value = value
+        else:
+            db.add(SystemConfig(config_key=self.CONFIG_KEY, config_value=value))
+        db.commit()
+
+    def persist(self, db: Optional[Session] = None):
+        """将本进程的增量合并进数据库中的草图"""
+        with self._lock:
+            delta, self._delta = self._delta, {}
+            self._last_persist = time.monotonic()
+        if not delta:
+            return
+
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            row = db.query(SystemConfig).filter(
+                SystemConfig.config_key == self.CONFIG_KEY
+            ).with_for_update().first()
+            stored = {
+                key: TDigest.from_dict(data)
+                for key, data in ((row.config_value or {}) if row else {}).items()
+            }
+            for key, digest in delta.items():
+                stored.setdefault(key, TDigest(self.compression)).merge(digest)
+            self._write(db, stored)
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to persist score sketches")
+            with self._lock:
+                for key, digest in delta.items():
+                    self._delta.setdefault(key, TDigest(self.compression)).merge(digest)
+            return
+        finally:
+            if own_session:
+                db.close()
+
+        with self._lock:
+            self._base = stored
+            self._views.clear()
+
+    # ============== 更新 / 查询 ==============
+
+    def record(self, db: Session, agent_type: Optional[str], scores: Dict[str, float]):
+        """记录一次测评（scores键为METRICS中的指标）"""
+        self.ensure_loaded(db)
+        with self._lock:
+            for scope in {agent_type or "general", ALL_TYPES}:
+                for metric, value in scores.items():
+                    key = self._key(scope, metric)
+                    self._delta.setdefault(key, TDigest(self.compression)).add(value)
+                    self._views.pop(key, None)
+            due = time.monotonic() - self._last_persist >= self.persist_seconds
+        if due:
+            # 使用独立会话：不提交/回滚调用方会话中尚未提交的修改
+            self.persist()
+
+    def _view(self, key: str) -> Optional[TDigest]:
+        """已持久化 + 本进程增量的合并视图（缓存到下次更新）"""
+        view = self._views.get(key)
+        if view is None:
+            base, delta = self._base.get(key), self._delta.get(key)
+            if not base and not delta:
+                return None
+            view = TDigest(self.compression)
+            for part in (base, delta):
+                if part:
+                    view.merge(part)
+            self._views[key] = view
+        return view
+
+    def percentile(self, agent_type: Optional[str], metric: str, value: float) -> Optional[float]:
+        """value在该分布中的百分位（0-100，超过了多少比例的测评），无数据时返回None"""
+        with self._lock:
+            view = self._view(self._key(agent_type or ALL_TYPES, metric))
+            if view is None:
+                return None
+            return round(view.cdf(value) * 100, 1)
+
+    def count(self, agent_type: Optional[str] = None, metric: str = "total") -> int:
+        with self._lock:
+            view = self._view(self._key(agent_type or ALL_TYPES, metric))
+            return int(view.count) if view else 0
+
+    def reset(self):
+        with self._lock:
+            self._base, self._delta, self._views = {}, {}, {}
+            self._loaded = False
+
+
+# 全局分数分布
+score_distribution = ScoreDistribution()
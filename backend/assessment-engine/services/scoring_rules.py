@@ -0,0 +1,342 @@
+"""
+评分规则引擎 - 维度等级、子项拆分和改进建议由规则表驱动
+规则表存放在system_configs（键scoring_rules），未配置时使用DEFAULT_SCORING_RULES
+规则编译为NumPy阈值/权重矩阵，一次向量化计算即可得到成千上万条结果的等级、子项和建议（阈值调整后的重算/回填用）
+"""
+
+import os
+import copy
+import time
+import hashlib
+import json
+import threading
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.database import SystemConfig
+
+SCORING_RULES_REFRESH_SECONDS = float(os.getenv("SCORING_RULES_REFRESH_SECONDS", "60"))
+
+# 默认规则（与原先硬编码的阈值和文案一致）
+# recommendations下每个规则集对应一种报告格式: report为人类报告，bot为Bot结构化报告
+DEFAULT_SCORING_RULES: Dict[str, Any] = {
+    "dimensions": {
+        "tool_usage": {
+            "column": "tool_score", "max_score": 400, "weight": 0.4,
+            "details": {"tool_selection": 0.3, "parameter_filling": 0.3, "tool_chaining": 0.25, "error_correction": 0.15}
+        },
+        "reasoning": {
+            "column": "reasoning_score", "max_score": 300, "weight": 0.3,
+            "details": {"logic": 0.35, "math": 0.35, "long_text": 0.3}
+        },
+        "interaction": {
+            "column": "interaction_score", "max_score": 200, "weight": 0.2,
+            "details": {"intent_recognition": 0.5, "emotion_perception": 0.5}
+        },
+        "stability": {
+            "column": "stability_score", "max_score": 100, "weight": 0.1,
+            "details": {"consistency": 0.5, "compliance": 0.5}
+        }
+    },
+    # 得分率 >= min_ratio 的最高一档
+    "dimension_levels": [
+        {"min_ratio": 0.85, "level": "Excellent"},
+        {"min_ratio": 0.7, "level": "Good"},
+        {"min_ratio": 0.5, "level": "Average"},
+        {"min_ratio": 0.0, "level": "Needs Improvement"}
+    ],
+    "recommendations": {
+        "report": {
+            "score_field": "score",
+            "target_field": "target",
+            "rules": [
+                {"dimension": "tool_usage", "below": 300, "area": "工具调用", "target": 350,
+                 "suggestions": ["加强对OpenClaw工具的理解", "优化工具参数填写准确性", "练习多工具串联使用"]},
+                {"dimension": "reasoning", "below": 220, "area": "认知推理", "target": 250,
+                 "suggestions": ["提升逻辑推理能力", "加强数学计算准确性", "优化长文本理解"]},
+                {"dimension": "interaction", "below": 150, "area": "交互理解", "target": 170,
+                 "suggestions": ["增强用户意图识别", "提升情绪感知能力"]}
+            ]
+        },
+        "bot": {
+            "score_field": "current_score",
+            "target_field": "target_score",
+            "rules": [
+                {"dimension": "tool_usage", "below": 300, "area": "工具调用", "target": 350, "priority": "High",
+                 "suggestions": ["加强对API工具的理解", "优化参数填写准确性", "练习多工具串联使用"]},
+                {"dimension": "reasoning", "below": 220, "area": "认知推理", "target": 250, "priority": "Medium",
+                 "suggestions": ["提升逻辑推理能力", "加强数学计算准确性", "优化长文本理解"]},
+                {"dimension": "interaction", "below": 150, "area": "交互理解", "target": 170, "priority": "Medium",
+                 "suggestions": ["增强用户意图识别", "提升多轮对话能力"]},
+                {"dimension": "stability", "below": 70, "area": "稳定性", "target": 80, "priority": "Low",
+                 "suggestions": ["优化异常处理能力", "增强输出一致性"]}
+            ],
+            # 没有触发任何规则时
+            "fallback": {"area": "整体表现", "message": "表现优秀！继续保持", "priority": "None"}
+        }
+    }
+}
+
+
+@dataclass
+class Evaluation:
+    """一批结果的计算结果（N为结果数，D为维度数，S为子项数）"""
+    scores: np.ndarray       # (N, D)
+    levels: np.ndarray       # (N, D) 等级下标
+    details: np.ndarray      # (N, S) 子项分数
+    triggered: np.ndarray    # (N, R) 是否触发建议规则
+    values: List[List[Any]]  # 原始分数（输出时原样写回，不转换为float）
+
+
+class ScoringRules:
+    """
+    编译后的规则
+
+    - detail_weights: (D, S)，scores @ detail_weights 即全部子项分数
+    - level_thresholds: 升序的得分率阈值，等级下标 = 不超过得分率的阈值个数 - 1
+    - 每个建议规则集: 维度下标向量与阈值向量，scores[:, dims] < below 即触发矩阵
+    逐条组装dict只在最后输出时进行
+    """
+
+    def __init__(self, config: Mapping[str, Any]):
+        self.config = copy.deepcopy(dict(config))
+        dimensions = self.config["dimensions"]
+        self.dimension_keys: List[str] = list(dimensions)
+        self.columns = [dimensions[d]["column"] for d in self.dimension_keys]
+        self.max_scores = np.array([dimensions[d]["max_score"] for d in self.dimension_keys], dtype=float)
+        self.weights = [dimensions[d].get("weight") for d in self.dimension_keys]
+
+        # 子项权重矩阵
+        self.detail_keys: List[List[str]] = [list(dimensions[d].get("details", {})) for d in self.dimension_keys]
+        self.detail_slices = []
+        total = sum(len(keys) for keys in self.detail_keys)
+        self.detail_weights = np.zeros((len(self.dimension_keys), total))
+        offset = 0
+        for i, d in enumerate(self.dimension_keys):
+            fractions = list(dimensions[d].get("details", {}).values())
+            self.detail_weights[i, offset:offset + len(fractions)] = fractions
+            self.detail_slices.append(slice(offset, offset + len(fractions)))
+            offset += len(fractions)
+
+        # 等级阈值（升序）
+        levels = sorted(self.config["dimension_levels"], key=lambda item: item["min_ratio"])
+        self.level_thresholds = np.array([item["min_ratio"] for item in levels], dtype=float)
+        self.level_labels = [item["level"] for item in levels]
+
+        # 建议规则
+        self.rulesets: Dict[str, Dict[str, Any]] = {}
+        for name, ruleset in self.config.get("recommendations", {}).items():
+            rules = ruleset.get("rules", [])
+            self.rulesets[name] = {
+                **ruleset,
+                "dims": np.array([self.dimension_keys.index(r["dimension"]) for r in rules], dtype=int),
+                "below": np.array([r["below"] for r in rules], dtype=float)
+            }
+
+        raw = json.dumps(self.config, sort_keys=True, ensure_ascii=False)
+        self.version = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+    # ============== 向量化计算 ==============
+
+    def score_values(self, results: Sequence[Any]) -> List[List[Any]]:
+        """结果（dict或带*_score属性的对象，如AssessmentTask）中各维度的原始分数"""
+        def value(result, column):
+            return result.get(column) if isinstance(result, Mapping) else getattr(result, column, None)
+        return [[value(r, c) for c in self.columns] for r in results]
+
+    def evaluate(self, values: List[List[Any]], ruleset: str = "report") -> Evaluation:
+        """values为 (N, D) 原始分数，缺失的分数不参与建议触发"""
+        scores = np.array(
+            [[np.nan if v is None else v for v in row] for row in values], dtype=float
+        ).reshape(len(values), len(self.columns))
+        ratios = scores / self.max_scores
+        levels = (ratios[..., None] >= self.level_thresholds).sum(axis=-1) - 1
+        details = np.nan_to_num(scores) @ self.detail_weights
+        rules = self.rulesets.get(ruleset)
+        if rules is None:
+            raise ValueError(f"未定义的建议规则集: {ruleset}")
+        triggered = scores[:, rules["dims"]] < rules["below"] if len(rules["dims"]) else \
+            np.zeros((len(scores), 0), dtype=bool)
+        return Evaluation(scores=scores, levels=levels, details=details, triggered=triggered, values=values)
+
+    # ============== 组装报告字段 ==============
+
+    def level_of(self, index: int) -> str:
+        return self.level_labels[max(int(index), 0)]
+
+    def build_dimensions(self, evaluation: Evaluation, decimals: Optional[int] = None,
+                         with_level: bool = False) -> List[Dict[str, Dict[str, Any]]]:
+        """每条结果的dimensions字段（decimals为子项保留的小数位，None为不取整）"""
+        details = evaluation.details.tolist()
+        if decimals is not None:
+            # 按Python的round取整，与原先逐项计算的结果一致
+            details = [[round(v, decimals) for v in row] for row in details]
+        scores = evaluation.values
+        levels = evaluation.levels.tolist()
+        out = []
+        for n in range(len(scores)):
+            dimensions = {}
+            for i, key in enumerate(self.dimension_keys):
+                item: Dict[str, Any] = {
+                    "score": scores[n][i],
+                    "max_score": _number(self.max_scores[i]),
+                    "weight": self.weights[i]
+                }
+                if with_level:
+                    item["level"] = self.level_of(levels[n][i])
+                item["details"] = dict(zip(self.detail_keys[i], details[n][self.detail_slices[i]]))
+                dimensions[key] = item
+            out.append(dimensions)
+        return out
+
+    def build_recommendations(self, evaluation: Evaluation, ruleset: str = "report") -> List[List[Dict[str, Any]]]:
+        config = self.rulesets[ruleset]
+        rules = config.get("rules", [])
+        score_field = config.get("score_field", "score")
+        target_field = config.get("target_field", "target")
+        fallback = config.get("fallback")
+        scores = evaluation.values
+        out = []
+        for n, row in enumerate(evaluation.triggered.tolist()):
+            recommendations = []
+            for rule, hit, dim in zip(rules, row, config["dims"].tolist()):
+                if not hit:
+                    continue
+                item = {"area": rule["area"], score_field: scores[n][dim], target_field: rule["target"]}
+                if "priority" in rule:
+                    item["priority"] = rule["priority"]
+                item["suggestions"] = list(rule["suggestions"])
+                recommendations.append(item)
+            if not recommendations and fallback:
+                recommendations.append(dict(fallback))
+            out.append(recommendations)
+        return out
+
+    def apply(self, results: Sequence[Any], ruleset: str = "report", decimals: Optional[int] = None,
+              with_level: bool = False) -> List[Dict[str, Any]]:
+        """一次计算一批结果的dimensions和recommendations"""
+        evaluation = self.evaluate(self.score_values(results), ruleset)
+        dimensions = self.build_dimensions(evaluation, decimals, with_level)
+        recommendations = self.build_recommendations(evaluation, ruleset)
+        return [{"dimensions": d, "recommendations": r} for d, r in zip(dimensions, recommendations)]
+
+
+def _number(value: float):
+    return int(value) if float(value).is_integer() else float(value)
+
+
+# ============== 规则加载 ==============
+
+class ScoringRuleStore:
+    """从system_configs加载并编译规则，定期刷新（阈值调整后无需重启）"""
+
+    CONFIG_KEY = "scoring_rules"
+
+    def __init__(self, refresh_seconds: float = SCORING_RULES_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._rules = ScoringRules(DEFAULT_SCORING_RULES)
+        self._loaded_at: Optional[float] = None
+
+    def current(self) -> ScoringRules:
+        """最近一次加载的规则（未加载过时为默认规则）"""
+        return self._rules
+
+    def get(self, db: Session) -> ScoringRules:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return self._rules
+        return self.reload(db)
+
+    def reload(self, db: Session) -> ScoringRules:
+        row = db.query(SystemConfig).filter(SystemConfig.config_key == self.CONFIG_KEY).first()
+        config = row.config_value if row and row.config_value else DEFAULT_SCORING_RULES
+        with self._lock:
+            if ScoringRules(config).version != self._rules.version:
+                self._rules = ScoringRules(config)
+            self._loaded_at = time.monotonic()
+        return self._rules
+
+    def save(self, db: Session, config: Mapping[str, Any]) -> ScoringRules:
+        """校验（编译）并保存新规则"""
+        rules = ScoringRules(config)
+        row = db.query(SystemConfig).filter(SystemConfig.config_key == self.CONFIG_KEY).first()
+        if row:
+            row.config_value = rules.config
+            row.updated_at = datetime.utcnow()
+        else:
+            db.add(SystemConfig(config_key=self.CONFIG_KEY, config_value=rules.config))
+        db.commit()
+        with self._lock:
+            self._rules = rules
+            self._loaded_at = time.monotonic()
+        return rules
+
+
+# 全局规则
+scoring_rules = ScoringRuleStore()
+
+
+# ============== 批量重算 ==============
+
+def rescore_reports(db: Session, rules: Optional[ScoringRules] = None, batch_size: int = 1000) -> int:
+    """
+    按当前规则重算已有报告的维度详情和建议（阈值调整后的夜间重算/回填）
+    每批报告一次向量化计算；Bot报告（有json_report）同步更新结构化报告，维度百分位保持不变
+    返回更新的报告数
+    """
+    from sqlalchemy.orm import undefer
+
+    from models.database import AssessmentTask, Report
+    from services.report_payloads import report_payloads
+
+    rules = rules or scoring_rules.reload(db)
+    updated = 0
+    # 报告id为UUID字符串，按字符串键集分页
+    last_id = ""
+    while True:
+        rows = db.query(Report, AssessmentTask).join(
+            AssessmentTask, Report.task_id == AssessmentTask.id
+        ).filter(
+            Report.id > last_id,
+            AssessmentTask.status == "completed"
+        ).options(
+            # 每行都要读写正文，一次查询取回，避免逐行延迟加载
+            undefer(Report.content)
+        ).order_by(Report.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0].id
+
+        groups: Dict[str, List[Any]] = {"report": [], "bot": []}
+        for report, task in rows:
+            groups["bot" if report.json_report else "report"].append((report, task))
+
+        for ruleset, items in groups.items():
+            if not items:
+                continue
+            bot = ruleset == "bot"
+            scored = rules.apply(
+                [task for _, task in items], ruleset=ruleset,
+                decimals=1 if bot else None, with_level=bot
+            )
+            for (report, task), result in zip(items, scored):
+                dimensions = result["dimensions"]
+                for key, item in (report.dimensions or {}).items():
+                    if key in dimensions and isinstance(item, dict) and "percentile" in item:
+                        dimensions[key]["percentile"] = item["percentile"]
+                report.dimensions = dimensions
+                report.recommendations = result["recommendations"]
+                if bot:
+                    report.json_report = {
+                        **report.json_report,
+                        "dimensions": dimensions,
+                        "recommendations": result["recommendations"]
+                    }
+                report_payloads.store(db, task, report)
+        db.commit()
+        updated += len(rows)
+    return updated
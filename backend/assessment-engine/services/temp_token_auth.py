@@ -0,0 +1,258 @@
+"""
+临时Token认证 - Bot接口统一通过X-Temp-Token解析临时Token
+解析结果缓存（进程内TTL/LRU，配置REDIS_URL时使用Redis多进程共享），每个Token每个TTL窗口只查一次库
+绑定、吊销、过期时显式失效；缓存有效期不超过Token本身的过期时间
+
+多进程/多实例部署须配置REDIS_URL：进程内缓存的失效只对当前进程生效，
+其他进程最多在TEMP_TOKEN_CACHE_TTL_SECONDS后才看到绑定/吊销。
+状态变更（绑定、吊销）一律以数据库为准，用带status条件的UPDATE，不依赖缓存快照
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models.database import TempToken
+
+TEMP_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TEMP_TOKEN_CACHE_TTL_SECONDS", "60"))
+TEMP_TOKEN_CACHE_SIZE = int(os.getenv("TEMP_TOKEN_CACHE_SIZE", "100000"))
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@dataclass(frozen=True)
+class TempTokenInfo:
+    """临时Token快照（只读，需修改时按id重新加载ORM对象）"""
+    id: str
+    temp_token_code: str
+    agent_id: str
+    agent_name: Optional[str]
+    status: str
+    expires_at: Optional[datetime]
+    bound_to_user_id: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, token: TempToken) -> "TempTokenInfo":
+        return cls(
+            id=token.id,
+            temp_token_code=token.temp_token_code,
+            agent_id=token.agent_id,
+            agent_name=token.agent_name,
+            status=token.status,
+            expires_at=_naive_utc(token.expires_at),
+            bound_to_user_id=token.bound_to_user_id
+        )
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["expires_at"] = self.expires_at.isoformat() if self.expires_at else None
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw) -> "TempTokenInfo":
+        data = json.loads(raw)
+        data["expires_at"] = datetime.fromisoformat(data["expires_at"]) if data["expires_at"] else None
+        return cls(**data)
+
+
+# ============== 存储 ==============
+
+class MemoryTempTokenStore:
+    """进程内TTL/LRU存储（单进程部署和测试用）"""
+
+    def __init__(self, max_keys: int = TEMP_TOKEN_CACHE_SIZE):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, TempTokenInfo]]" = OrderedDict()
+
+    def get(self, code: str) -> Optional[TempTokenInfo]:
+        with self._lock:
+            entry = self._entries.get(code)
+            if not entry:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[code]
+                return None
+            self._entries.move_to_end(code)
+            return entry[1]
+
+    def set(self, code: str, info: TempTokenInfo, ttl: float):
+        with self._lock:
+            self._entries[code] = (time.monotonic() + ttl, info)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def delete(self, code: str):
+        with self._lock:
+            self._entries.pop(code, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisTempTokenStore:
+    """Redis存储（失效对所有进程立即生效）"""
+
+    PREFIX = "temp_token:"
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, code: str) -> Optional[TempTokenInfo]:
+        raw = self._redis.get(self.PREFIX + code)
+        return TempTokenInfo.from_json(raw) if raw else None
+
+    def set(self, code: str, info: TempTokenInfo, ttl: float):
+        self._redis.set(self.PREFIX + code, info.to_json(), px=max(1, int(ttl * 1000)))
+
+    def delete(self, code: str):
+        self._redis.delete(self.PREFIX + code)
+
+    def clear(self):
+        for key in self._redis.scan_iter(f"{self.PREFIX}*"):
+            self._redis.delete(key)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+# ============== 缓存 ==============
+
+class TempTokenCache:
+    """
+    临时Token解析缓存
+
+    - 未知Token不缓存（不会被随机Token撑满）
+    - 命中率、查库次数和查库耗时见stats()
+    """
+
+    def __init__(self, store=None, ttl: float = TEMP_TOKEN_CACHE_TTL_SECONDS):
+        self._store = store
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._lookup_seconds = 0.0
+        self._invalidations = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            redis_url = os.getenv("REDIS_URL")
+            self._store = RedisTempTokenStore(redis_url) if redis_url else MemoryTempTokenStore()
+        return self._store
+
+    def resolve(self, db: Session, code: str) -> Optional[TempTokenInfo]:
+        info = self.store.get(code)
+        if info is not None:
+            with self._lock:
+                self._hits += 1
+            return info
+
+        started = time.perf_counter()
+        token = db.query(TempToken).filter(TempToken.temp_token_code == code).first()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._misses += 1
+            self._lookup_seconds += elapsed
+        if token is None:
+            return None
+
+        info = TempTokenInfo.from_model(token)
+        ttl = self.ttl
+        if info.expires_at is not None:
+            ttl = min(ttl, (info.expires_at - datetime.utcnow()).total_seconds())
+        if ttl > 0:
+            self.store.set(code, info, ttl)
+        return info
+
+    def invalidate(self, *codes: str):
+        """Token绑定、吊销或过期后调用"""
+        for code in codes:
+            if code:
+                self.store.delete(code)
+        with self._lock:
+            self._invalidations += len(codes)
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+                "db_lookups": self._misses,
+                "avg_db_lookup_ms": round(self._lookup_seconds * 1000 / self._misses, 3) if self._misses else None,
+                "invalidations": self._invalidations,
+                "cached": self.store.size()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = self._misses = self._invalidations = 0
+            self._lookup_seconds = 0.0
+
+
+# 全局临时Token缓存
+temp_token_cache = TempTokenCache()
+
+
+# ============== 认证依赖 ==============
+
+def require_temp_token(
+    statuses: Optional[Sequence[str]] = None,
+    check_expiry: bool = False,
+    detail: str = "Token无效"
+) -> Callable[..., TempTokenInfo]:
+    """
+    生成X-Temp-Token认证依赖
+    statuses为允许的Token状态（None为不限），check_expiry为是否拒绝已过期的Token
+    """
+    allowed = set(statuses) if statuses else None
+
+    def dependency(
+        temp_token_code: str = Header(..., alias="X-Temp-Token"),
+        db: Session = Depends(get_db)
+    ) -> TempTokenInfo:
+        info = temp_token_cache.resolve(db, temp_token_code)
+        if info is None or (allowed is not None and info.status not in allowed) or (check_expiry and info.expired):
+            raise HTTPException(status_code=401, detail=detail)
+        return info
+
+    return dependency
+
+
+# 任意状态（报告读取、支付链接、绑定状态）
+temp_token_auth = require_temp_token()
+# 未吊销/过期（查询测评进度）
+active_temp_token = require_temp_token(("active", "bound"))
+# 未吊销且在有效期内（发起测评）
+valid_temp_token = require_temp_token(("active", "bound"), check_expiry=True, detail="临时Token无效或已过期")
+# 尚未绑定（绑定人类账户）
+unbound_temp_token = require_temp_token(("active",), detail="临时Token无效或已过期")
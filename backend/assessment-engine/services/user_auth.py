@@ -0,0 +1,135 @@
+"""
+用户认证 - JWT签发/校验和用户上下文依赖
+同一Token只做一次HMAC校验：解码后的声明按Token摘要缓存在进程内LRU中，直到exp
+User行只在处理函数用到时才查询（同一请求内只查一次）
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models.database import User
+
+JWT_SECRET = os.getenv("JWT_SECRET", "ocbjwtsecret2026")
+JWT_ALGORITHM = "HS256"
+JWT_EXPIRE_DAYS = int(os.getenv("JWT_EXPIRE_DAYS", "7"))
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "10000"))
+
+
+def create_access_token(user: User) -> str:
+    """签发用户JWT（注册/登录）"""
+    return jwt.encode(
+        {"user_id": str(user.id), "email": user.email, "exp": datetime.utcnow() + timedelta(days=JWT_EXPIRE_DAYS)},
+        JWT_SECRET,
+        algorithm=JWT_ALGORITHM
+    )
+
+
+class ClaimsCache:
+    """已校验的JWT声明，键为Token的SHA-256摘要（不在内存中保存Token原文）"""
+
+    def __init__(self, max_keys: int = JWT_CLAIMS_CACHE_SIZE, secret: str = JWT_SECRET):
+        self.max_keys = max_keys
+        self.secret = secret
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """返回声明；Token无效或已过期时抛出jwt.InvalidTokenError（含ExpiredSignatureError）"""
+        key = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self._misses += 1
+
+        claims = jwt.decode(token, self.secret, algorithms=[JWT_ALGORITHM])
+        exp = claims.get("exp")
+        if exp is not None:
+            with self._lock:
+                self._entries[key] = (float(exp), claims)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+        return claims
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+                "cached": len(self._entries)
+            }
+
+
+# 全局JWT声明缓存
+claims_cache = ClaimsCache()
+
+
+class UserContext:
+    """当前请求的用户（user_id来自已校验的JWT，User行按需加载）"""
+
+    def __init__(self, claims: Dict[str, Any], db: Session):
+        self.claims = claims
+        self.user_id: str = claims["user_id"]
+        self.email: Optional[str] = claims.get("email")
+        self._db = db
+        self._user: Optional[User] = None
+        self._loaded = False
+
+    @property
+    def user(self) -> Optional[User]:
+        if not self._loaded:
+            self._user = self._db.query(User).filter(User.id == self.user_id).first()
+            self._loaded = True
+        return self._user
+
+    def require_user(self) -> User:
+        user = self.user
+        if not user:
+            raise HTTPException(status_code=404, detail="用户不存在")
+        return user
+
+
+def get_user_context(
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+) -> UserContext:
+    """用户接口统一的认证依赖（Authorization: Bearer <token>）"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="缺少认证信息")
+    token = authorization[7:] if authorization.startswith("Bearer ") else authorization
+    try:
+        claims = claims_cache.verify(token)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token已过期")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="无效的Token")
+    if not claims.get("user_id"):
+        raise HTTPException(status_code=401, detail="无效的Token")
+    return UserContext(claims, db)
@@ -0,0 +1,251 @@
+"""
+Webhook投递 - 测评完成 / 深度报告解锁通知
+独立事件循环线程 + 共享keep-alive连接池，按目标主机限制并发，失败按指数退避+抖动重试
+"""
+
+import os
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+from models.database import AssessmentTask, Report, PaymentOrder
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_BACKOFF_BASE_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_BASE_SECONDS", "1"))
+WEBHOOK_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECONDS", "60"))
+WEBHOOK_PER_HOST_CONCURRENCY = int(os.getenv("WEBHOOK_PER_HOST_CONCURRENCY", "4"))
+
+
+class WebhookDispatcher:
+    """
+    Webhook投递器
+
+    - 所有请求共用一个httpx.AsyncClient，同一主机的连接保持复用
+    - 每个目标主机一个信号量，单个慢回调地址不会占满全部连接
+    - 网络错误、5xx、429会重试（full jitter退避），其他4xx直接放弃
+    - 投递结果写回reports.webhook_delivered / payment_orders.webhook_notified
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+        backoff_base: float = WEBHOOK_BACKOFF_BASE_SECONDS,
+        backoff_max: float = WEBHOOK_BACKOFF_MAX_SECONDS,
+        per_host_concurrency: int = WEBHOOK_PER_HOST_CONCURRENCY
+    ):
+        self._session_factory = session_factory
+        self._transport = transport
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.per_host_concurrency = per_host_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    # ============== 投递 ==============
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=WEBHOOK_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_keepalive_connections=100, keepalive_expiry=60)
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        parsed = httpx.URL(url)
+        key = (parsed.host, parsed.port or (443 if parsed.scheme == "https" else 80))
+        if key not in self._host_limits:
+            self._host_limits[key] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_limits[key]
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def deliver(self, url: str, event: str, payload: Dict[str, Any]) -> bool:
+        """投递单个事件，成功返回True"""
+        body = {"event": event, "sent_at": datetime.utcnow().isoformat(), "data": payload}
+        headers = {"X-OAEAS-Event": event}
+
+        for attempt in range(self.max_attempts):
+            retryable = True
+            try:
+                async with self._host_limit(url):
+                    response = await self._get_client().post(url, json=body, headers=headers)
+                if response.status_code < 300:
+                    return True
+                retryable = response.status_code >= 500 or response.status_code == 429
+                logger.warning("Webhook %s to %s returned %d", event, url, response.status_code)
+            except httpx.HTTPError as e:
+                logger.warning("Webhook %s to %s failed: %s", event, url, e)
+
+            if not retryable or attempt == self.max_attempts - 1:
+                break
+            await asyncio.sleep(self.backoff_seconds(attempt))
+
+        return False
+
+    # ============== 事件 ==============
+
+    async def deliver_assessment_finished(self, task_id: str) -> bool:
+        """测评结束通知（assessment.completed / assessment.failed）"""
+        target = await asyncio.to_thread(self._load_assessment_event, task_id)
+        if not target:
+            return False
+        url, event, payload = target
+
+        delivered = await self.deliver(url, event, payload)
+        if delivered:
+            await asyncio.to_thread(self._mark_report_delivered, task_id)
+        return delivered
+
+    async def deliver_report_unlocked(self, report_id: str) -> int:
+        """深度报告解锁通知，返回成功投递的订单数"""
+        targets = await asyncio.to_thread(self._load_unlock_events, report_id)
+        results = await asyncio.gather(*(
+            self.deliver(url, "report.unlocked", payload) for _, url, payload in targets
+        ))
+        delivered_ids = [order_id for (order_id, _, _), ok in zip(targets, results) if ok]
+        if delivered_ids:
+            await asyncio.to_thread(self._mark_orders_notified, delivered_ids)
+        return len(delivered_ids)
+
+    def _load_assessment_event(self, task_id: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        db = self.session_factory()
+        try:
+            task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
+            if not task:
+                return None
+            report = db.query(Report).filter(Report.task_id == task_id).first()
+            url = (report.webhook_url if report else None) or task.callback_url
+            if not url or (report and report.webhook_delivered):
+                return None
+
+            payload = {
+                "task_code": task.task_code,
+                "agent_id": task.agent_id,
+                "status": task.status,
+                "total_score": task.total_score if task.status == "completed" else None,
+                "level": task.level if task.status == "completed" else None,
+                "completed_at": task.completed_at.isoformat() if task.completed_at else None
+            }
+            if report:
+                payload.update({
+                    "report_code": report.report_code,
+                    "free_report_url": f"/api/v1/bots/reports/{task.task_code}/free",
+                    "full_report_url": f"/api/v1/bots/reports/{task.task_code}/full"
+                })
+            return url, f"assessment.{task.status}", payload
+        finally:
+            db.close()
+
+    def _load_unlock_events(self, report_id: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        db = self.session_factory()
+        try:
+            report = db.query(Report).filter(Report.id == report_id).first()
+            if not report:
+                return []
+            orders = db.query(PaymentOrder).filter(
+                PaymentOrder.report_id == report_id,
+                PaymentOrder.unlock_webhook_url.isnot(None),
+                PaymentOrder.webhook_notified.isnot(True)
+            ).all()
+            task = report.task
+            return [
+                (order.id, order.unlock_webhook_url, {
+                    "order_code": order.order_code,
+                    "report_code": report.report_code,
+                    "task_code": task.task_code if task else None,
+                    "agent_id": order.agent_id,
+                    "unlocked_at": report.unlocked_at.isoformat() if report.unlocked_at else None,
+                    "full_report_url": f"/api/v1/bots/reports/{task.task_code}/full" if task else None
+                })
+                for order in orders
+            ]
+        finally:
+            db.close()
+
+    def _mark_report_delivered(self, task_id: str):
+        db = self.session_factory()
+        try:
+            db.query(Report).filter(Report.task_id == task_id).update({
+                "webhook_delivered": True,
+                "webhook_delivered_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _mark_orders_notified(self, order_ids: List[str]):
+        db = self.session_factory()
+        try:
+            db.query(PaymentOrder).filter(PaymentOrder.id.in_(order_ids)).update(
+                {"webhook_notified": True}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    # ============== 调度（供同步代码调用） ==============
+
+    def assessment_finished(self, task_id: str):
+        """异步投递测评结束通知，不阻塞调用方"""
+        self._schedule(self.deliver_assessment_finished(task_id))
+
+    def report_unlocked(self, report_id: str):
+        """异步投递报告解锁通知，不阻塞调用方"""
+        self._schedule(self.deliver_report_unlocked(report_id))
+
+    def _schedule(self, coro):
+        if self._loop is None:
+            # 未启动（如测试环境），放弃投递；未投递的记录保持webhook_delivered=False
+            coro.close()
+            return
+        asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # ============== 生命周期 ==============
+
+    def start(self):
+        """在独立线程中启动事件循环"""
+        if self._thread:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="webhook-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        if not self._loop:
+            return
+        if self._client:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout)
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._loop.close()
+        self._loop, self._thread = None, None
+
+
+# 全局投递器
+webhook_dispatcher = WebhookDispatcher()
@@ -1,3 +1,8 @@
+import json
+import random
+import asyncio
+from datetime import datetime, timedelta
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -6,8 +11,20 @@ from sqlalchemy.pool import StaticPool
 
 from main import app
 from database import get_db, Base
-from models.database import Token, AssessmentTask, Report, Ranking
+from models.database import Token, TempToken, AssessmentTask, Report, Ranking, RankingRollup, SystemConfig
 from services.assessment_service import TokenService, AssessmentService, ReportService, RankingService
+from services.job_queue import AssessmentJobQueue, assessment_queue
+from services.webhooks import WebhookDispatcher
+from services.leaderboard import SortedSet, MemoryLeaderboardStore, leaderboard, window_start
+from services.score_sketch import TDigest, ScoreDistribution
+from services.score_history import ScoreHistory, score_history, trend_of
+from services.pdf_service import PdfRenderer, RenderQueueFull, content_key
+from services.temp_token_auth import TempTokenCache, TempTokenInfo, MemoryTempTokenStore, temp_token_cache
+from services.user_auth import ClaimsCache, claims_cache, create_access_token
+from services.expiry_sweeper import ExpirySweeper
+from services.scoring_rules import ScoringRules, DEFAULT_SCORING_RULES, scoring_rules, rescore_reports
+from services.progress import ProgressTracker, progress_tracker
+from services.mock_engine import LatencyProfile, run_mock_assessment_async, simulate_mock_load
 from schemas import TokenCreate, AssessmentCreate, AgentType
 
 # 测试数据库配置
@@ -172,6 +189,56 @@ class TestReports:
         response = client.get(f"/reports/task/{sample_task.id}")
         assert response.status_code == 200
 
+class TestReportStorage:
+    def test_content_is_shared_and_deferred(self, db, sample_task):
+        import json, zlib
+        
+        dimensions = {"tool_usage": {"score": 320.0, "max_score": 400}}
+        recommendations = [{"area": "推理能力", "suggestion": "增加多步推理训练"}]
+        full = {"version": "1.0", "dimensions": dimensions, "recommendations": recommendations}
+        report = Report(report_code="OCR-STORAGE", task_id=sample_task.id, summary={"total_score": 320.0},
+                        dimensions=dimensions, recommendations=recommendations, json_report=full)
+        db.add(report)
+        db.commit()
+        
+        # json_report中与独立字段相同的部分只存一份
+        stored = json.loads(zlib.decompress(report.content))
+        assert stored["_shared"] == ["dimensions", "recommendations"]
+        assert stored["json_report"] == {"version": "1.0", "dimensions": None, "recommendations": None}
+        
+        db.expunge_all()
+        loaded = db.query(Report).filter(Report.report_code == "OCR-STORAGE").first()
+        assert loaded.summary == {"total_score": 320.0}
+        assert "content" not in loaded.__dict__
+        assert loaded.json_report == full
+        assert list(loaded.json_report) == ["version", "dimensions", "recommendations"]
+        assert loaded.recommendations == recommendations
+        
+        db.delete(loaded)
+        db.commit()
+
+class TestSchemaMigration:
+    def test_upgrades_existing_tables(self):
+        from sqlalchemy import inspect, text
+        from migrate_schema import add_missing_columns, drop_removed_columns, create_missing_indexes
+        
+        old_engine = create_engine("sqlite:///:memory:")
+        with old_engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE rankings (id VARCHAR PRIMARY KEY, agent_id VARCHAR(255), agent_name VARCHAR, "
+                "agent_type VARCHAR, total_score FLOAT, level VARCHAR, rank INTEGER, task_count INTEGER, "
+                "is_bound BOOLEAN, updated_at DATETIME)"
+            ))
+            assert "rankings.tool_score" in add_missing_columns(conn)
+            assert drop_removed_columns(conn) == ["rankings.rank"]
+            assert "ix_rankings_total_score" in create_missing_indexes(conn)
+            # 可重复执行
+            assert add_missing_columns(conn) == drop_removed_columns(conn) == create_missing_indexes(conn) == []
+        
+        columns = {c["name"] for c in inspect(old_engine).get_columns("rankings")}
+        assert {"tool_score", "stability_score"} <= columns
+        assert "rank" not in columns
+
 class TestRankings:
     def test_get_rankings(self, db, sample_task):
         # 运行测评以生成排名
@@ -232,6 +299,1071 @@ class TestAssessmentService:
         assert result.total_score > 0
         assert result.level is not None
 
+class TestRankingService:
+    @pytest.fixture
+    def leaders(self, db):
+        # 分数高于任何真实测评，保证占据榜首
+        scores = {"rank_a": 5000.0, "rank_b": 4000.0, "rank_c": 4000.0, "rank_d": 3000.0}
+        rows = [
+            Ranking(agent_name=name, agent_type="rank_test", total_score=score, level="Master", task_count=1)
+            for name, score in scores.items()
+        ]
+        db.add_all(rows)
+        db.commit()
+        leaderboard.rebuild(db)
+        yield scores
+        db.query(Ranking).filter(Ranking.agent_type == "rank_test").delete()
+        db.commit()
+        leaderboard.rebuild(db)
+
+    def test_ranks_are_derived_from_score(self, db, leaders):
+        ranked = RankingService.get_rankings(db, limit=4)
+        assert [r.agent_name for r in ranked] == ["rank_a", "rank_c", "rank_b", "rank_d"]
+        assert [r.rank for r in ranked] == [1, 2, 2, 4]
+        assert RankingService.get_rankings(db, skip=3, limit=1)[0].rank == 4
+        assert RankingService.get_rankings(db, agent_type="rank_test", skip=1, limit=1)[0].rank == 2
+
+    def test_cursor_pages_cover_agent_type(self, db, leaders):
+        names, cursor = [], None
+        while True:
+            page, cursor, total = RankingService.get_rankings_page(db, "rank_test", cursor=cursor, limit=1)
+            names.extend(r.agent_name for r in page)
+            if not cursor:
+                break
+        assert names == ["rank_a", "rank_c", "rank_b", "rank_d"]
+        assert total == 4
+
+    def test_update_only_touches_own_row(self, db, leaders):
+        task = AssessmentTask(agent_id="rank_d", agent_name="rank_d", total_score=4500.0, level="Master")
+        AssessmentService._update_ranking(db, task)
+
+        entry = RankingService.get_agent_ranking(db, "rank_d")
+        assert entry.rank == 2
+        assert entry.task_count == 2
+        assert RankingService.get_agent_ranking(db, "rank_b").rank == 3
+
+    def test_window_boards_track_best_score_per_window(self, db):
+        for score in (300.0, 700.0, 500.0):
+            task = AssessmentTask(agent_id="window_agent", agent_name="window_agent",
+                                  total_score=score, level="Proficient", completed_at=datetime.utcnow())
+            AssessmentService._update_ranking(db, task)
+
+        for period in ("daily", "weekly", "monthly"):
+            entries, _, _ = RankingService.get_rankings_page(db, period=period, limit=500)
+            entry = next(e for e in entries if e.agent_name == "window_agent")
+            assert entry.total_score == 700.0
+            assert entry.task_count == 3
+
+        with pytest.raises(ValueError):
+            RankingService.get_rankings_page(db, period="yearly")
+
+        db.query(Ranking).filter(Ranking.agent_name == "window_agent").delete()
+        db.query(RankingRollup).filter(RankingRollup.agent_name == "window_agent").delete()
+        db.commit()
+        leaderboard.rebuild(db)
+
+    def test_dimension_boards_and_level_filters(self, db):
+        for name, total, tool, level in (("dim_a", 600.0, 90.0, "Proficient"), ("dim_b", 800.0, 70.0, "Expert"),
+                                         ("dim_b", 500.0, 95.0, "Proficient")):
+            task = AssessmentTask(agent_id=name, agent_name=name, total_score=total, tool_score=tool,
+                                  level=level, completed_at=datetime.utcnow())
+            AssessmentService._update_ranking(db, task)
+
+        # 维度最高分与总分最高分相互独立
+        entries, _, _ = RankingService.get_rankings_page(db, dimension="tool_score", limit=500)
+        scores = {e.agent_name: (e.score, e.total_score, e.level) for e in entries}
+        assert scores["dim_b"] == (95.0, 800.0, "Expert")
+        assert scores["dim_a"] == (90.0, 600.0, "Proficient")
+        assert [e.rank for e in entries] == sorted(e.rank for e in entries)
+
+        # level筛选只读该level的集合，level变化后从原集合中移除
+        experts, _, total = RankingService.get_rankings_page(db, dimension="tool_score", level="Expert", limit=500)
+        assert "dim_b" in [e.agent_name for e in experts]
+        assert all(e.level == "Expert" for e in experts) and total == len(experts)
+        proficient, _, _ = RankingService.get_rankings_page(db, agent_type="general", level="Proficient", limit=500)
+        assert "dim_a" in [e.agent_name for e in proficient]
+        assert "dim_b" not in [e.agent_name for e in proficient]
+
+        with pytest.raises(ValueError):
+            RankingService.get_rankings_page(db, dimension="speed_score")
+        with pytest.raises(ValueError):
+            RankingService.get_rankings_page(db, dimension="tool_score", period="daily")
+
+        db.query(Ranking).filter(Ranking.agent_name.in_(["dim_a", "dim_b"])).delete(synchronize_session=False)
+        db.query(RankingRollup).filter(RankingRollup.agent_name.in_(["dim_a", "dim_b"])).delete(
+            synchronize_session=False)
+        db.commit()
+        leaderboard.rebuild(db)
+
+    def test_expired_rollups_are_purged(self, db):
+        old = RankingRollup(period="daily", window_start=datetime(2020, 1, 1), agent_name="old_agent",
+                            agent_type="general", best_score=100.0, task_count=1)
+        db.add(old)
+        db.commit()
+        assert RankingService.purge_expired_rollups(db, force=True) >= 1
+        assert db.query(RankingRollup).filter(RankingRollup.agent_name == "old_agent").count() == 0
+
+    def test_window_start_and_expiry(self):
+        at = datetime(2026, 10, 17, 15, 30)  # 周六
+        assert window_start("daily", at) == datetime(2026, 10, 17)
+        assert window_start("weekly", at) == datetime(2026, 10, 12)
+        assert window_start("monthly", at) == datetime(2026, 10, 1)
+
+        store = MemoryLeaderboardStore()
+        store.add("leaderboard:daily:20261017:global", "agent", 1.0)
+        store.expire("leaderboard:daily:20261017:global", 0)
+        assert store.card("leaderboard:daily:20261017:global") == 0
+
+    def test_sorted_set_matches_sorted_list(self):
+        rng = random.Random(7)
+        zset, expected = SortedSet(), {}
+        for i in range(2000):
+            member = f"m{rng.randrange(300)}"
+            if rng.random() < 0.2:
+                zset.remove(member)
+                expected.pop(member, None)
+            else:
+                score = float(rng.randrange(100))
+                zset.add(member, score)
+                expected[member] = score
+
+        ordered = sorted(((score, member) for member, score in expected.items()))
+        assert zset.range(0, len(zset)) == [(m, s) for s, m in ordered]
+        assert zset.range(10, 20) == [(m, s) for s, m in ordered[10:20]]
+        assert zset.count_le(50.0) == sum(1 for s, _ in ordered if s <= 50.0)
+
+    def test_memory_store_rev_range(self):
+        store = MemoryLeaderboardStore()
+        for i in range(10):
+            store.add("k", f"agent_{i}", float(i))
+        assert store.rev_range("k", 0, 3) == [("agent_9", 9.0), ("agent_8", 8.0), ("agent_7", 7.0)]
+        assert store.rev_range("k", 8, 5) == [("agent_1", 1.0), ("agent_0", 0.0)]
+        assert store.count_above("k", 6.5) == 3
+
+class TestPagination:
+    def test_assessment_cursor_pages(self, db):
+        created = datetime(2026, 1, 1)
+        tasks = [
+            # 前两条创建时间相同，依赖id保证顺序稳定
+            AssessmentTask(task_code=f"OCBT-PAGE{i:04d}", agent_id="page_agent", agent_name="Page Agent",
+                           created_at=created + timedelta(minutes=max(i, 1)))
+            for i in range(7)
+        ]
+        db.add_all(tasks)
+        db.commit()
+
+        seen, cursor = [], None
+        while True:
+            response = client.get("/assessments", params={"agent_id": "page_agent", "limit": 3, "cursor": cursor})
+            assert response.status_code == 200
+            assert response.headers["X-Total-Count"] == "7"
+            seen.extend(item["task_code"] for item in response.json()["data"])
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        expected = sorted(tasks, key=lambda t: (t.created_at, t.id), reverse=True)
+        assert seen == [t.task_code for t in expected]
+
+        assert client.get("/assessments", params={"cursor": "not-a-cursor"}).status_code == 400
+        # 未传游标时skip仍可用
+        response = client.get("/assessments", params={"agent_id": "page_agent", "skip": 5, "limit": 3})
+        assert [item["task_code"] for item in response.json()["data"]] == [t.task_code for t in expected[5:]]
+
+        for task in tasks:
+            db.delete(task)
+        db.commit()
+
+    def test_rankings_cursor_types_are_validated(self):
+        from services.pagination import encode_cursor
+        for values in ([{"a": 1}, "agent"], [True, "agent"], [500.0, 7]):
+            response = client.get("/rankings", params={"cursor": encode_cursor(values)})
+            assert response.status_code == 400
+        assert client.get("/rankings", params={"cursor": encode_cursor([500.0, "agent"])}).status_code == 200
+
+    def test_count_cache_evicts_least_recently_used(self):
+        from services.pagination import CountCache
+        cache = CountCache(ttl=60, max_keys=2)
+        cache.get("a", lambda: 1)
+        cache.get("b", lambda: 2)
+        assert cache.get("a", lambda: -1) == 1
+        cache.get("c", lambda: 3)
+        assert len(cache._entries) == 2
+        assert cache.get("a", lambda: -1) == 1
+        assert cache.get("b", lambda: -2) == -2
+
+class TestScoreSketch:
+    def test_tdigest_matches_exact_percentiles(self):
+        rng = random.Random(3)
+        values = [round(rng.gauss(600, 120), 1) for _ in range(20000)]
+        left, right = TDigest(), TDigest()
+        for i, value in enumerate(values):
+            (left if i % 2 else right).add(value)
+        left.merge(right)
+        restored = TDigest.from_dict(left.to_dict())
+
+        ordered = sorted(values)
+        for value in (350, 500, 600, 750, 900):
+            exact = sum(1 for v in ordered if v < value) / len(ordered)
+            assert abs(restored.cdf(value) - exact) < 0.005
+        assert abs(restored.quantile(0.5) - ordered[len(ordered) // 2]) < 2
+        assert restored.cdf(-1) == 0.0 and restored.cdf(10000) == 1.0
+
+    def test_distribution_persists_and_merges_across_instances(self, db):
+        db.query(SystemConfig).filter(SystemConfig.config_key == ScoreDistribution.CONFIG_KEY).delete()
+        db.commit()
+        first = ScoreDistribution(session_factory=TestingSessionLocal, persist_seconds=3600)
+        second = ScoreDistribution(session_factory=TestingSessionLocal, persist_seconds=3600)
+        first.ensure_loaded(db)
+        second.ensure_loaded(db)
+        baseline = first.count("sketch_test")
+
+        for score in (100, 200, 300):
+            first.record(db, "sketch_test", {"total": score})
+        for score in (400, 500):
+            second.record(db, "sketch_test", {"total": score})
+        assert first.percentile("sketch_test", "total", 300) == 83.3
+        first.persist()
+        second.persist()
+
+        reloaded = ScoreDistribution(session_factory=TestingSessionLocal)
+        reloaded.ensure_loaded(db)
+        assert reloaded.count("sketch_test") == baseline + 5
+        assert reloaded.percentile("sketch_test", "total", 300) == 50.0
+
+    def test_periodic_persist_leaves_caller_session_alone(self, db):
+        distribution = ScoreDistribution(session_factory=TestingSessionLocal, persist_seconds=0)
+        distribution.ensure_loaded(db)
+        pending = SystemConfig(config_key="sketch_pending", config_value={})
+        db.add(pending)
+        
+        distribution.record(db, "sketch_test", {"total": 100})
+        # 调用方未提交的修改仍可回滚
+        db.rollback()
+        assert db.query(SystemConfig).filter(SystemConfig.config_key == "sketch_pending").first() is None
+        assert distribution._delta == {}
+
+    def test_report_uses_real_percentile(self, db, sample_task):
+        AssessmentService.run_assessment(db, sample_task.id)
+        report = ReportService.get_report_by_task(db, sample_task.id)
+        assert 0 <= report.ranking_percentile <= 100
+        assert report.summary["ranking_percentile"] == report.ranking_percentile
+        assert report.summary["global_rank"] <= report.summary["total_agents"]
+
+class TestScoringRules:
+    def test_batch_levels_details_and_recommendations(self):
+        rules = ScoringRules(DEFAULT_SCORING_RULES)
+        results = [
+            {"tool_score": 380, "reasoning_score": 280, "interaction_score": 190, "stability_score": 95},
+            {"tool_score": 200, "reasoning_score": 150, "interaction_score": 100, "stability_score": 45},
+            {"tool_score": 300, "reasoning_score": 210.5, "interaction_score": 150, "stability_score": 70}
+        ]
+        excellent, weak, edge = rules.apply(results, ruleset="bot", decimals=1, with_level=True)
+
+        assert excellent["dimensions"]["tool_usage"]["level"] == "Excellent"
+        assert excellent["recommendations"] == [{"area": "整体表现", "message": "表现优秀！继续保持", "priority": "None"}]
+        assert weak["dimensions"]["stability"]["level"] == "Needs Improvement"
+        assert weak["dimensions"]["tool_usage"]["level"] == "Average"
+        assert [r["area"] for r in weak["recommendations"]] == ["工具调用", "认知推理", "交互理解", "稳定性"]
+        assert weak["recommendations"][0]["current_score"] == 200
+        # 阈值为严格小于
+        assert [r["area"] for r in edge["recommendations"]] == ["认知推理"]
+        assert edge["dimensions"]["reasoning"]["details"] == {"logic": 73.7, "math": 73.7, "long_text": 63.1}
+
+        human = rules.apply(results[1:2], ruleset="report")[0]
+        assert "level" not in human["dimensions"]["tool_usage"]
+        assert human["dimensions"]["tool_usage"]["details"]["tool_chaining"] == 200 * 0.25
+        assert {"score", "target", "suggestions"} <= set(human["recommendations"][0])
+
+    def test_system_config_override_and_rescore(self, db, sample_task):
+        sample_task.status = "completed"
+        sample_task.tool_score, sample_task.reasoning_score = 350.0, 260.0
+        sample_task.interaction_score, sample_task.stability_score = 180.0, 90.0
+        report = Report(report_code="OCR-RESCORE", task_id=sample_task.id, summary={},
+                        dimensions={"tool_usage": {"score": 350.0, "percentile": 88.0}}, recommendations=[])
+        db.add(report)
+        db.commit()
+
+        config = {**DEFAULT_SCORING_RULES, "recommendations": {
+            **DEFAULT_SCORING_RULES["recommendations"],
+            "report": {**DEFAULT_SCORING_RULES["recommendations"]["report"], "rules": [
+                {"dimension": "tool_usage", "below": 380, "area": "工具调用", "target": 390, "suggestions": ["练习多工具串联使用"]}
+            ]}
+        }}
+        try:
+            scoring_rules.save(db, config)
+            assert ScoringRules(config).version == scoring_rules.reload(db).version
+            assert rescore_reports(db) >= 1
+
+            db.expire_all()
+            report = db.query(Report).filter(Report.report_code == "OCR-RESCORE").first()
+            assert report.recommendations == [
+                {"area": "工具调用", "score": 350.0, "target": 390, "suggestions": ["练习多工具串联使用"]}
+            ]
+            assert report.dimensions["tool_usage"]["percentile"] == 88.0
+            assert report.dimensions["reasoning"]["details"]["logic"] == 260.0 * 0.35
+        finally:
+            db.query(SystemConfig).filter(SystemConfig.config_key == scoring_rules.CONFIG_KEY).delete()
+            db.query(Report).filter(Report.report_code == "OCR-RESCORE").delete()
+            db.commit()
+            scoring_rules.reload(db)
+        assert scoring_rules.current().version == ScoringRules(DEFAULT_SCORING_RULES).version
+
+class TestScoreHistory:
+    @pytest.fixture
+    def history_tasks(self, db):
+        start = datetime(2026, 1, 1)
+        tasks = [
+            AssessmentTask(task_code=f"OCT-HIST-{i:03d}", agent_id="history_agent", agent_name="History Agent",
+                           status="completed", total_score=500 + i * 5, completed_at=start + timedelta(hours=i))
+            for i in range(50)
+        ]
+        db.add_all(tasks)
+        db.commit()
+        yield tasks
+        for task in tasks:
+            db.delete(task)
+        db.commit()
+        score_history.invalidate("history_agent")
+
+    def test_trend(self):
+        assert trend_of([600]) is None
+        assert trend_of([600, 640, 700]) == "up"
+        assert trend_of([700, 650, 600]) == "down"
+        assert trend_of([600, 602, 599, 601]) == "flat"
+
+    def test_record_compares_with_previous(self, db, history_tasks):
+        history = ScoreHistory(window=5)
+        latest = AssessmentTask(task_code="OCT-HIST-NEW", agent_id="history_agent", agent_name="History Agent",
+                                status="completed", total_score=700, completed_at=datetime(2026, 2, 1))
+        db.add(latest)
+        db.commit()
+        try:
+            # 从索引加载最近5次（已包含本次），重复计入不影响结果
+            first = history.record(db, latest)
+            assert first["previous_score"] == 745
+            assert first["previous_task_code"] == "OCT-HIST-049"
+            assert first["delta"] == -45
+            assert first["recent_scores"] == [730, 735, 740, 745, 700]
+            assert history.record(db, latest) == first
+            assert [p.task_code for p in history.recent(db, "history_agent")][-1] == "OCT-HIST-NEW"
+        finally:
+            db.delete(latest)
+            db.commit()
+
+    def test_record_ignores_stale_cache(self, db, history_tasks):
+        history = ScoreHistory(window=5)
+        assert history.recent(db, "history_agent")[-1].task_code == "OCT-HIST-049"
+        # 其他Worker进程写入的成绩不在本进程缓存中
+        other = AssessmentTask(task_code="OCT-HIST-OTHER", agent_id="history_agent", agent_name="History Agent",
+                               status="completed", total_score=760, completed_at=datetime(2026, 2, 1))
+        latest = AssessmentTask(task_code="OCT-HIST-NEW", agent_id="history_agent", agent_name="History Agent",
+                                status="completed", total_score=700, completed_at=datetime(2026, 2, 2))
+        db.add_all([other, latest])
+        db.commit()
+        try:
+            result = history.record(db, latest)
+            assert result["previous_task_code"] == "OCT-HIST-OTHER"
+            assert result["delta"] == -60
+        finally:
+            db.delete(other)
+            db.delete(latest)
+            db.commit()
+
+    def test_series_downsampling(self, db, history_tasks):
+        raw = score_history.series(db, "history_agent", points=100)
+        assert not raw["downsampled"] and raw["total_assessments"] == 50
+        assert raw["points"][0]["score"] == 500
+
+        sampled = score_history.series(db, "history_agent", points=10)
+        assert sampled["downsampled"]
+        assert len(sampled["points"]) <= 10
+        assert sum(p["count"] for p in sampled["points"]) == 50
+        assert sampled["points"][0]["min_score"] == 500
+        assert sampled["points"][-1]["max_score"] == 745
+
+        response = client.get("/assessments/agents/history_agent/history", params={
+            "points": 5, "since": "2026-01-01T10:00:00"
+        })
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["total_assessments"] == 40
+        assert len(data["points"]) <= 5
+        assert data["trend"] == "up"
+
+class TestAssessmentJobQueue:
+    def test_enqueued_task_is_executed(self, db, sample_task):
+        queue = AssessmentJobQueue(session_factory=TestingSessionLocal, workers=1)
+        queue.enqueue(db, sample_task)
+        
+        assert queue.run_once() is True
+        db.refresh(sample_task)
+        assert sample_task.status == "completed"
+        assert ReportService.get_report_by_task(db, sample_task.id) is not None
+        assert queue.run_once() is False
+
+    def test_bot_task_is_executed(self, db, sample_task, monkeypatch):
+        import services.mock_engine as mock_engine
+        monkeypatch.setattr(mock_engine, "MOCK_LATENCY_PROFILE", "fixed:0")
+        temp_token = TempToken(
+            temp_token_code="tmp_queue_bot", agent_id=sample_task.agent_id,
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        )
+        db.add(temp_token)
+        db.commit()
+        sample_task.temp_token_id = temp_token.id
+        db.commit()
+        
+        queue = AssessmentJobQueue(session_factory=TestingSessionLocal, workers=1)
+        queue.enqueue(db, sample_task)
+        assert queue.run_once() is True
+        
+        db.refresh(sample_task)
+        assert sample_task.status == "completed"
+        assert sample_task.total_score > 0
+        report = ReportService.get_report_by_task(db, sample_task.id)
+        assert report.json_report["history"]["recent_scores"]
+        assert report.is_deep_report == 1
+
+    def test_unqueued_task_is_not_claimed(self, db, sample_task):
+        queue = AssessmentJobQueue(session_factory=TestingSessionLocal, workers=1)
+        assert queue.claim_next(db) is None
+        db.refresh(sample_task)
+        assert sample_task.status == "pending"
+
+    def test_stale_task_requeued_until_attempts_exhausted(self, db, sample_task):
+        def crashed_worker(session, task):
+            # 模拟Worker在执行中崩溃：任务停留在running
+            session.query(AssessmentTask).filter(AssessmentTask.id == task.id).update(
+                {"started_at": datetime.utcnow() - timedelta(hours=1)}
+            )
+            session.commit()
+        
+        queue = AssessmentJobQueue(
+            session_factory=TestingSessionLocal, workers=1, max_attempts=2, handler=crashed_worker
+        )
+        queue.enqueue(db, sample_task)
+        
+        assert queue.run_once() is True
+        assert queue.requeue_stale(db) == 1
+        db.refresh(sample_task)
+        assert (sample_task.status, sample_task.attempts) == ("pending", 1)
+        
+        assert queue.run_once() is True
+        assert queue.requeue_stale(db) == 0
+        db.refresh(sample_task)
+        assert (sample_task.status, sample_task.attempts) == ("failed", 2)
+        assert sample_task.completed_at is not None
+
+    def test_failed_handler_marks_task_failed(self, db, sample_task):
+        def broken_handler(session, task):
+            raise RuntimeError("boom")
+        
+        queue = AssessmentJobQueue(session_factory=TestingSessionLocal, workers=1, handler=broken_handler)
+        queue.enqueue(db, sample_task)
+        
+        assert queue.run_once() is True
+        db.refresh(sample_task)
+        assert sample_task.status == "failed"
+
+    def test_failure_webhook_sent_after_failed_is_committed(self, db, sample_task, monkeypatch):
+        def broken_assessment(session, task):
+            task.total_score = 999
+            raise RuntimeError("boom")
+        
+        monkeypatch.setattr(AssessmentService, "_execute_assessment", broken_assessment)
+        sample_task.callback_url = "http://bot.local/done"
+        db.commit()
+        
+        received = []
+        dispatcher = WebhookDispatcher(
+            session_factory=TestingSessionLocal,
+            transport=httpx.MockTransport(lambda request: received.append(request) or httpx.Response(200)),
+            backoff_base=0
+        )
+        queue = AssessmentJobQueue(
+            session_factory=TestingSessionLocal, workers=1,
+            on_failed=lambda task_id: asyncio.run(dispatcher.deliver_assessment_finished(task_id))
+        )
+        queue.enqueue(db, sample_task)
+        
+        assert queue.run_once() is True
+        assert received[0].headers["X-OAEAS-Event"] == "assessment.failed"
+        payload = json.loads(received[0].content)["data"]
+        assert payload["status"] == "failed"
+        assert payload["total_score"] is None
+
+class TestStartAssessment:
+    def test_start_enqueues_task(self, db, sample_task):
+        response = client.post(f"/assessments/{sample_task.id}/start")
+        assert response.status_code == 200
+        assert response.json()["data"]["queued"] is True
+        
+        db.refresh(sample_task)
+        assert sample_task.queued_at is not None
+        
+        # 重复启动被拒绝
+        response = client.post(f"/assessments/{sample_task.id}/start")
+        assert response.status_code == 400
+        
+        # 清理队列，避免影响其他测试
+        AssessmentJobQueue(session_factory=TestingSessionLocal).run_once()
+
+    def test_start_rejected_when_queue_full(self, sample_task, monkeypatch):
+        monkeypatch.setattr(assessment_queue, "max_backlog", 0)
+        
+        response = client.post(f"/assessments/{sample_task.id}/start")
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+
+class TestAsyncMockEngine:
+    def test_async_result_matches_sync_shape(self):
+        task = AssessmentTask(agent_id="mock_agent")
+        result = asyncio.run(run_mock_assessment_async(None, task, LatencyProfile.fixed(0)))
+        assert set(result) == {
+            "tool_score", "reasoning_score", "interaction_score", "stability_score",
+            "total_score", "level", "ranking_percentile"
+        }
+
+    def test_latency_profile_spec(self):
+        assert LatencyProfile.from_spec("fixed:4").sample() == 4
+        assert 3 <= LatencyProfile.from_spec("uniform:3,5").sample() <= 5
+        assert LatencyProfile.from_spec("lognormal:4,0.5,6").sample() <= 6
+        assert LatencyProfile.from_spec("replay:1.5,2.5").sample() in (1.5, 2.5)
+
+    def test_concurrent_load_does_not_serialize(self):
+        stats = asyncio.run(simulate_mock_load(
+            [f"agent_{i}" for i in range(2000)], LatencyProfile.fixed(0.2)
+        ))
+        assert stats["count"] == 2000
+        assert stats["wall_seconds"] < 2
+
+class TestProgress:
+    def test_executor_hooks_report_cases(self):
+        from enum import Enum
+        from types import SimpleNamespace
+        
+        class Dimension(Enum):
+            COGNITION = "cognition"
+        
+        tracker = ProgressTracker()
+        tracker.start("task_hooks", {"tool_usage": 1, "reasoning": 2})
+        hooks = tracker.executor_hooks("task_hooks")
+        
+        async def run():
+            events = tracker.subscribe("task_hooks")
+            hooks["on_case_started"](SimpleNamespace(case_id="cog_logic_0"))
+            assert tracker.snapshot("task_hooks")["current_test"] == "cog_logic_0"
+            hooks["on_result"](SimpleNamespace(case_id="cog_logic_0", dimension=Dimension.COGNITION, status="timeout"))
+            return await asyncio.wait_for(events.get(), 1)
+        
+        event_type, data = asyncio.run(run())
+        assert event_type == "case"
+        assert (data["dimension"], data["case_status"]) == ("reasoning", "timeout")
+        assert data["dimensions"]["reasoning"]["progress_percent"] == 50
+        assert data["completed_cases"] == 1
+
+    def test_tracker_reports_dimension_progress(self):
+        tracker = ProgressTracker()
+        tracker.start("task_x", {"tool_usage": 2, "reasoning": 2})
+        tracker.case_started("task_x", "tool_select_0")
+        assert tracker.snapshot("task_x")["current_test"] == "tool_select_0"
+        
+        tracker.case_done("task_x", "tool_select_0", "tool_usage")
+        tracker.dimension_done("task_x", "tool_usage", 320)
+        snapshot = tracker.snapshot("task_x")
+        assert snapshot["progress_percent"] == 50
+        assert snapshot["dimensions"]["tool_usage"]["progress_percent"] == 100
+        assert snapshot["estimated_remaining_seconds"] is not None
+        
+        tracker.finish("task_x", "completed")
+        assert tracker.snapshot("task_x") is None
+
+    def test_status_uses_live_progress(self, sample_task):
+        progress_tracker.start(sample_task.id)
+        progress_tracker.case_started(sample_task.id, "cog_logic_0")
+        try:
+            # 模拟Worker已认领任务
+            db = TestingSessionLocal()
+            db.query(AssessmentTask).filter(AssessmentTask.id == sample_task.id).update({"status": "running"})
+            db.commit()
+            db.close()
+            
+            data = client.get(f"/assessments/{sample_task.id}/status").json()["data"]
+            assert data["current_test"] == "cog_logic_0"
+            assert data["estimated_remaining_seconds"] is not None
+        finally:
+            progress_tracker.finish(sample_task.id, "failed")
+
+    def test_events_stream_closes_for_finished_task(self, db, sample_task):
+        AssessmentService.run_assessment(db, sample_task.id)
+        
+        response = client.get(f"/assessments/{sample_task.id}/events")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "event: progress" in response.text
+        assert "event: completed" in response.text
+
+class TestBatchAssessments:
+    def test_batch_submission(self, db):
+        from datetime import datetime, timedelta
+        from routers.bots import generate_temp_token_code
+        
+        tokens = [
+            TempToken(
+                temp_token_code=generate_temp_token_code(),
+                agent_id=f"fleet_agent_{i}",
+                agent_name=f"Fleet Agent {i}",
+                status="active",
+                expires_at=datetime.utcnow() + timedelta(hours=1)
+            )
+            for i in range(3)
+        ]
+        db.add_all(tokens)
+        db.commit()
+        
+        items = [{"agent_id": t.agent_id, "temp_token": t.temp_token_code} for t in tokens]
+        items.append({"agent_id": "fleet_agent_x", "temp_token": tokens[0].temp_token_code})
+        items.append({"agent_id": "fleet_agent_y", "temp_token": "TMP-INVALID"})
+        
+        response = client.post("/api/v1/bots/assessments/batch", json={"items": items})
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["accepted"] == 3
+        assert data["rejected"] == 2
+        
+        task_codes = [t["task_code"] for t in data["tasks"]]
+        assert len(set(task_codes)) == 3
+        tasks = db.query(AssessmentTask).filter(AssessmentTask.task_code.in_(task_codes)).all()
+        assert all(t.status == "pending" and t.queued_at is not None for t in tasks)
+        
+        # 清理队列，避免影响其他测试
+        for t in tasks:
+            db.delete(t)
+        db.commit()
+
+class TestWebhooks:
+    @staticmethod
+    def make_dispatcher(handler, **kwargs):
+        return WebhookDispatcher(
+            session_factory=TestingSessionLocal,
+            transport=httpx.MockTransport(handler),
+            backoff_base=0,
+            **kwargs
+        )
+
+    def test_retries_server_errors(self):
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503 if len(calls) < 3 else 200)
+        
+        dispatcher = self.make_dispatcher(handler)
+        assert asyncio.run(dispatcher.deliver("http://bot.local/hook", "test", {})) is True
+        assert len(calls) == 3
+        assert calls[0].headers["X-OAEAS-Event"] == "test"
+
+    def test_client_errors_are_not_retried(self):
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404)
+        
+        dispatcher = self.make_dispatcher(handler)
+        assert asyncio.run(dispatcher.deliver("http://bot.local/hook", "test", {})) is False
+        assert len(calls) == 1
+
+    def test_per_host_concurrency_cap(self):
+        active, peak = [0], [0]
+        
+        async def handler(request):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            return httpx.Response(200)
+        
+        dispatcher = self.make_dispatcher(handler, per_host_concurrency=2)
+        
+        async def burst():
+            await asyncio.gather(*(
+                dispatcher.deliver("http://bot.local/hook", "test", {"i": i}) for i in range(10)
+            ))
+        
+        asyncio.run(burst())
+        assert peak[0] == 2
+
+    def test_completion_delivery_is_recorded(self, db, sample_task):
+        sample_task.callback_url = "http://bot.local/done"
+        db.commit()
+        AssessmentService.run_assessment(db, sample_task.id)
+        
+        received = []
+        
+        def handler(request):
+            received.append(request)
+            return httpx.Response(200)
+        
+        dispatcher = self.make_dispatcher(handler)
+        assert asyncio.run(dispatcher.deliver_assessment_finished(sample_task.id)) is True
+        assert received[0].headers["X-OAEAS-Event"] == "assessment.completed"
+        
+        report = ReportService.get_report_by_task(db, sample_task.id)
+        db.refresh(report)
+        assert report.webhook_delivered is True
+        assert report.webhook_delivered_at is not None
+
+class TestReportPayloads:
+    def test_report_views_use_etag(self, db, sample_task):
+        from sqlalchemy import event
+        from routers.bots import generate_temp_token_code
+        
+        AssessmentService.run_assessment(db, sample_task.id)
+        db.refresh(sample_task)
+        token = TempToken(
+            temp_token_code=generate_temp_token_code(),
+            agent_id=sample_task.agent_id,
+            status="active",
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        )
+        db.add(token)
+        db.commit()
+        headers = {"X-Temp-Token": token.temp_token_code}
+        
+        for view in ("free", "full"):
+            url = f"/api/v1/bots/reports/{sample_task.task_code}/{view}"
+            first = client.get(url, headers=headers)
+            assert first.status_code == 200
+            assert first.json()["data"]["agent_id"] == sample_task.agent_id
+            etag = first.headers["ETag"]
+            assert etag.startswith('"')
+            
+            # 条件请求不再查询任务/报告
+            statements = []
+            def count(conn, cursor, statement, *args):
+                statements.append(statement)
+            event.listen(engine, "before_cursor_execute", count)
+            try:
+                cached = client.get(url, headers={**headers, "If-None-Match": etag})
+            finally:
+                event.remove(engine, "before_cursor_execute", count)
+            assert cached.status_code == 304
+            assert cached.headers["ETag"] == etag
+            assert not [s for s in statements if "reports" in s or "assessment_tasks" in s]
+        
+        report = ReportService.get_report_by_task(db, sample_task.id)
+        assert report.free_payload and report.full_payload
+        
+        # 其他Agent的Token不能命中缓存
+        other = TempToken(temp_token_code=generate_temp_token_code(), agent_id="someone_else", status="active",
+                          expires_at=datetime.utcnow() + timedelta(hours=1))
+        db.add(other)
+        db.commit()
+        response = client.get(f"/api/v1/bots/reports/{sample_task.task_code}/free",
+                              headers={"X-Temp-Token": other.temp_token_code})
+        assert response.status_code == 404
+
+class TestExport:
+    @pytest.fixture
+    def owned_tasks(self, db):
+        from models.database import AgentBinding
+        binding = AgentBinding(agent_id="export_agent", user_id="export_user", status="active")
+        tasks = [
+            AssessmentTask(task_code=f"OCBT-EXP{i}", agent_id="export_agent", agent_name="Export Agent",
+                           status="completed", total_score=100.0 * i, level="Basic",
+                           created_at=datetime(2026, 1, 1) + timedelta(minutes=i))
+            for i in range(5)
+        ]
+        db.add_all([binding] + tasks)
+        db.flush()
+        report = Report(report_code="OCR-EXPORT", task_id=tasks[0].id, dimensions={"tool_usage": {"score": 1}},
+                        recommendations=[{"area": "工具调用"}], is_deep_report=1)
+        db.add(report)
+        db.commit()
+        yield tasks
+        for row in [report, binding] + tasks:
+            db.delete(row)
+        db.commit()
+
+    def test_ndjson_streams_in_batches(self, db, owned_tasks):
+        import json
+        from services.export import export_user_assessments
+        
+        chunks = list(export_user_assessments(db.get_bind(), "export_user", "ndjson", ["dimensions"], batch_rows=2))
+        assert len(chunks) == 3
+        rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+        assert [r["task_code"] for r in rows] == [f"OCBT-EXP{i}" for i in range(5)]
+        assert rows[0]["report_code"] == "OCR-EXPORT"
+        assert rows[0]["dimensions"] == {"tool_usage": {"score": 1}}
+        assert "recommendations" not in rows[0]
+
+    def test_csv_endpoint(self, owned_tasks):
+        import csv, io
+        from models.database import User
+        headers = {"Authorization": f"Bearer {create_access_token(User(id='export_user', email='export@example.com'))}"}
+        response = client.get("/api/v1/users/assessments/export",
+                              params={"format": "csv", "include": "recommendations"}, headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 5
+        assert "工具调用" in rows[0]["recommendations"]
+        
+        bad = client.get("/api/v1/users/assessments/export", params={"include": "secrets"}, headers=headers)
+        assert bad.status_code == 400
+
+def fake_pdf(data):
+    """测试用渲染函数（在子进程中执行，须为模块级函数）"""
+    if data.get("level") == "Broken":
+        raise RuntimeError("render failed")
+    return f"%PDF-fake {data['task_code']}".encode()
+
+class TestPdfRenderer:
+    def test_renders_in_pool_and_caches_by_content(self, tmp_path):
+        renderer = PdfRenderer(cache_dir=str(tmp_path), workers=1, render=fake_pdf)
+        data = {"agent_id": "pdf_agent", "task_code": "OCBT-PDF", "total_score": 800.0, "level": "Expert",
+                "dimensions": {}}
+        try:
+            assert renderer.prerender([data]) == 0  # 进程池未启动时不预渲染
+            first = renderer.submit(data)
+            assert renderer.submit(data) is first or first.done()
+            path = first.result(timeout=30)
+            assert open(path, "rb").read() == b"%PDF-fake OCBT-PDF"
+            assert path.endswith(f"{content_key(data)}.pdf")
+            
+            # 命中缓存不再提交渲染；内容变化则键变化
+            assert renderer.submit(data).result() == path
+            assert renderer.cached_path({**data, "total_score": 801.0}) is None
+            
+            broken = {**data, "level": "Broken"}
+            with pytest.raises(RuntimeError):
+                renderer.submit(broken).result(timeout=30)
+        finally:
+            renderer.stop()
+
+    def test_bounded_queue(self, tmp_path):
+        renderer = PdfRenderer(cache_dir=str(tmp_path), workers=1, max_pending=0, render=fake_pdf)
+        try:
+            with pytest.raises(RenderQueueFull) as exc:
+                renderer.submit({"task_code": "OCBT-FULL"})
+            assert exc.value.retry_after >= 1
+        finally:
+            renderer.stop()
+
+class TestTempTokenAuth:
+    def test_cached_lookup_and_revoke(self, db, sample_task):
+        from sqlalchemy import event
+        from routers.bots import generate_temp_token_code
+        
+        token = TempToken(temp_token_code=generate_temp_token_code(), agent_id=sample_task.agent_id,
+                          status="active", expires_at=datetime.utcnow() + timedelta(hours=1))
+        db.add(token)
+        db.commit()
+        headers = {"X-Temp-Token": token.temp_token_code}
+        url = f"/api/v1/bots/assessments/{sample_task.task_code}"
+        
+        assert client.get(url, headers=headers).status_code == 200
+        statements = []
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            for _ in range(3):
+                assert client.get(url, headers=headers).status_code == 200
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        assert not [s for s in statements if "temp_tokens" in s]
+        
+        # 吊销后缓存立即失效
+        assert client.post("/api/v1/bots/temp-token/revoke", headers=headers).status_code == 200
+        assert client.get(url, headers=headers).status_code == 401
+        assert temp_token_cache.stats()["invalidations"] >= 1
+
+    def test_bind_and_revoke_check_database_status(self, db):
+        from models.database import User, AgentBinding, BoundToken
+        user = User(email="bind_race@example.com", name="Bind Race", invite_code="BINDRACE",
+                    invite_code_expires_at=datetime.utcnow() + timedelta(hours=1))
+        token = TempToken(temp_token_code="TMP-BIND-RACE", agent_id="bind_race_agent", status="active",
+                          expires_at=datetime.utcnow() + timedelta(hours=1))
+        db.add_all([user, token])
+        db.commit()
+        headers = {"X-Temp-Token": token.temp_token_code}
+        try:
+            # 本进程缓存中为active，其他进程已在数据库中吊销
+            temp_token_cache.store.set(token.temp_token_code, TempTokenInfo.from_model(token), 60)
+            db.query(TempToken).filter(TempToken.id == token.id).update({"status": "revoked"})
+            db.commit()
+            
+            response = client.post("/api/v1/bots/bind", json={"invite_code": "BINDRACE"}, headers=headers)
+            assert response.status_code == 409
+            assert db.query(AgentBinding).filter(AgentBinding.agent_id == "bind_race_agent").count() == 0
+            assert db.query(BoundToken).filter(BoundToken.agent_id == "bind_race_agent").count() == 0
+            # 失败时同样失效缓存
+            assert temp_token_cache.store.get(token.temp_token_code) is None
+            
+            assert client.post("/api/v1/bots/temp-token/revoke", headers=headers).status_code == 401
+        finally:
+            db.delete(token)
+            db.delete(user)
+            db.commit()
+
+    def test_expiry_bounds_cache_and_stats(self, db):
+        cache = TempTokenCache(store=MemoryTempTokenStore(), ttl=60)
+        expired = TempToken(temp_token_code="TMP-EXPIRED", agent_id="expired_agent", status="active",
+                            expires_at=datetime.utcnow() - timedelta(seconds=1))
+        db.add(expired)
+        db.commit()
+        try:
+            info = cache.resolve(db, "TMP-EXPIRED")
+            assert info.expired
+            # 已过期的Token不缓存，未知Token也不缓存
+            assert cache.store.size() == 0
+            assert cache.resolve(db, "TMP-UNKNOWN") is None
+            assert cache.store.size() == 0
+            
+            response = client.post("/api/v1/bots/assessments", json={"agent_id": "expired_agent"},
+                                   headers={"X-Temp-Token": "TMP-EXPIRED"})
+            assert response.status_code == 401
+            
+            stats = cache.stats()
+            assert stats["hits"] == 0 and stats["misses"] == 2
+            assert stats["avg_db_lookup_ms"] is not None
+        finally:
+            db.delete(expired)
+            db.commit()
+
+class TestUserAuth:
+    def test_claims_cached_until_exp(self):
+        import jwt
+        from models.database import User
+        cache = ClaimsCache()
+        token = create_access_token(User(id="auth_user", email="auth@example.com"))
+        assert cache.verify(token)["user_id"] == "auth_user"
+        assert cache.verify(token)["email"] == "auth@example.com"
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+        
+        expired = jwt.encode({"user_id": "auth_user", "exp": datetime.utcnow() - timedelta(seconds=1)},
+                             cache.secret, algorithm="HS256")
+        with pytest.raises(jwt.ExpiredSignatureError):
+            cache.verify(expired)
+        with pytest.raises(jwt.InvalidTokenError):
+            cache.verify(token[:-2] + "xx")
+        assert cache.stats()["cached"] == 1
+
+    def test_user_routes_require_token(self, db):
+        from models.database import User, AgentBinding
+        user = User(email="ctx@example.com", name="ctx")
+        db.add(user)
+        db.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(user)}"}
+        binding = AgentBinding(agent_id="ctx_agent", user_id=user.id, status="active")
+        db.add(binding)
+        db.commit()
+        try:
+            assert client.get("/api/v1/users/bots").status_code == 401
+            assert client.get("/api/v1/users/bots", headers={"Authorization": "Bearer nope"}).status_code == 401
+            
+            response = client.get("/api/v1/users/bots", headers=headers)
+            assert response.status_code == 200
+            assert [b["agent_id"] for b in response.json()["data"]["bots"]] == ["ctx_agent"]
+            
+            invite = client.post("/api/v1/users/invite-code", headers=headers)
+            assert invite.status_code == 200
+            db.refresh(user)
+            assert user.invite_code == invite.json()["data"]["invite_code"]
+        finally:
+            db.delete(binding)
+            db.delete(user)
+            db.commit()
+
+class TestExpirySweeper:
+    def test_sweep_in_bounded_batches(self, db):
+        from models.database import User, PaymentOrder
+        now = datetime.utcnow()
+        past, future = now - timedelta(minutes=1), now + timedelta(hours=1)
+        rows = [
+            TempToken(temp_token_code="TMP-SWEEP1", agent_id="sweep_agent", status="active", expires_at=past),
+            TempToken(temp_token_code="TMP-SWEEP2", agent_id="sweep_agent", status="active", expires_at=past),
+            TempToken(temp_token_code="TMP-SWEEP3", agent_id="sweep_agent", status="active", expires_at=future),
+            Token(token_code="OCB-SWEEP-0001", name="sweep", status="active", expires_at=past),
+            User(email="sweep@example.com", invite_code="SWEEP001", invite_code_expires_at=past),
+            PaymentOrder(order_code="OCB-SWEEP-OLD", status="pending", created_at=now - timedelta(hours=2)),
+            PaymentOrder(order_code="OCB-SWEEP-NEW", status="pending", created_at=now)
+        ]
+        db.add_all(rows)
+        db.commit()
+        try:
+            # 每类每次最多1批、每批1行
+            limited = ExpirySweeper(batch_size=1, max_batches=1).sweep(db, now=now)
+            assert limited == {"temp_tokens": 1, "tokens": 1, "invite_codes": 1, "payment_orders": 1}
+            
+            # 剩余的过期行留给下一次清理
+            sweeper = ExpirySweeper(batch_size=1, max_batches=100)
+            processed = sweeper.sweep(db, now=now)
+            assert processed["temp_tokens"] >= 1
+            
+            for row in rows:
+                db.refresh(row)
+            assert [t.status for t in rows[:3]] == ["expired", "expired", "active"]
+            assert rows[3].status == "expired"
+            assert rows[4].invite_code is None and rows[4].invite_code_expires_at is None
+            assert rows[5].status == "expired" and rows[6].status == "pending"
+            
+            # 已过期的行不再重复处理
+            assert not any(sweeper.sweep(db, now=now).values())
+            stats = sweeper.stats()
+            assert stats["sweeps"] == 2
+            assert stats["processed_total"] == processed
+            assert stats["last_sweep"]["processed"]["temp_tokens"] == 0
+        finally:
+            for row in rows:
+                db.delete(row)
+            db.commit()
+
+class TestIdempotency:
+    def test_retry_returns_original_task(self, db):
+        from datetime import datetime, timedelta
+        from routers.bots import generate_temp_token_code
+        
+        token = TempToken(
+            temp_token_code=generate_temp_token_code(),
+            agent_id="retry_agent",
+            agent_name="Retry Agent",
+            status="active",
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        )
+        db.add(token)
+        db.commit()
+        
+        headers = {"X-Temp-Token": token.temp_token_code, "Idempotency-Key": "retry-key-1"}
+        first = client.post("/api/v1/bots/assessments", json={"agent_id": "retry_agent"}, headers=headers)
+        second = client.post("/api/v1/bots/assessments", json={"agent_id": "retry_agent"}, headers=headers)
+        assert first.status_code == 200
+        assert first.json() == second.json()
+        
+        tasks = db.query(AssessmentTask).filter(AssessmentTask.agent_id == "retry_agent").all()
+        assert len(tasks) == 1
+        
+        # 同一个键用于不同请求内容
+        conflict = client.post(
+            "/api/v1/bots/assessments",
+            json={"agent_id": "retry_agent", "callback_url": "http://bot.local/hook"},
+            headers=headers
+        )
+        assert conflict.status_code == 422
+        
+        # 清理队列，避免影响其他测试
+        db.delete(tasks[0])
+        db.commit()
+
+    def test_failed_request_is_not_cached(self):
+        headers = {"X-Temp-Token": "TMP-MISSING", "Idempotency-Key": "retry-key-2"}
+        for _ in range(2):
+            response = client.post("/api/v1/bots/assessments", json={"agent_id": "ghost"}, headers=headers)
+            assert response.status_code == 401
+
 # ============== Run Tests ==============
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+OpenClaw Agent Benchmark - Pre-generated Test Case Pool
+预生成用例池 - 将用例生成移出测评启动路径
+"""
+
+import sys
+import time
+import uuid
+import hashlib
+import random
+import threading
+from collections import deque
+from dataclasses import replace
+from typing import Deque, Dict, List, Optional, Tuple
+
+from test_generator import Dimension, DynamicTestGenerator, TestCase
+
+CaseSet = Dict[Dimension, List[TestCase]]
+
+
+class TestCasePool:
+    """
+    预生成用例池
+
+    核心特性:
+    1. 后台线程持续生成用例集，池容量受数量和内存双重限制
+    2. 取用时按Agent ID加盐（重写case_id + 打乱顺序），不同Agent之间无法按case_id或出题顺序对照；
+       用例内容（题面、期望结果）与池中原始用例集相同，需要内容级隔离时应按Agent现场生成
+    3. 池低于低水位时异步补充，池空时现场生成（记为未命中）
+       内存上限先于低水位达到时停止补充，直到取用腾出一个用例集的空间
+    4. 提供命中/未命中等指标
+    """
+
+    def __init__(
+        self,
+        max_sets: int = 32,
+        max_bytes: int = 16 * 1024 * 1024,
+        low_watermark: Optional[int] = None
+    ):
+        self.max_sets = max_sets
+        self.max_bytes = max_bytes
+        self.low_watermark = low_watermark if low_watermark is not None else max(1, max_sets // 2)
+
+        self._pool: Deque[Tuple[CaseSet, int]] = deque()
+        self._pool_bytes = 0
+        # 最近一次生成的用例集大小，生成前据此判断内存上限是否还放得下
+        self._set_bytes = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+    # ============== 生成 ==============
+
+    @staticmethod
+    def _generate() -> CaseSet:
+        """生成一组未加盐的用例（种子与具体Agent无关）"""
+        return DynamicTestGenerator(agent_id=f"pool-{uuid.uuid4().hex}").generate_all_cases()
+
+    @staticmethod
+    def estimate_bytes(case_set: CaseSet) -> int:
+        """估算用例集占用的内存"""
+        total = 0
+        for cases in case_set.values():
+            for case in cases:
+                total += sys.getsizeof(case.content) + sys.getsizeof(case.case_id)
+                total += sys.getsizeof(str(case.expected_result)) + sys.getsizeof(str(case.evaluation_criteria))
+        return total
+
+    @staticmethod
+    def salt(case_set: CaseSet, agent_id: str) -> CaseSet:
+        """按Agent加盐：重写case_id并打乱各维度内的顺序（用例内容不变）"""
+        nonce = uuid.uuid4().hex
+        digest = hashlib.md5(f"{agent_id}:{nonce}".encode()).hexdigest()
+        rng = random.Random(int(digest, 16))
+
+        salted: CaseSet = {}
+        for dimension, cases in case_set.items():
+            items = [replace(case, case_id=f"{case.case_id}_{digest[:6]}") for case in cases]
+            rng.shuffle(items)
+            salted[dimension] = items
+        return salted
+
+    # ============== 取用 ==============
+
+    def take(self, agent_id: str) -> CaseSet:
+        """取出一组为该Agent加盐的用例"""
+        with self._cond:
+            if self._pool:
+                case_set, size = self._pool.popleft()
+                self._pool_bytes -= size
+                self.hits += 1
+            else:
+                case_set = None
+                self.misses += 1
+            if self._needs_fill():
+                self._cond.notify()
+
+        if case_set is None:
+            case_set = self._generate()
+        return self.salt(case_set, agent_id)
+
+    def fill(self, count: Optional[int] = None) -> int:
+        """同步补充用例池，返回新增的用例集数量"""
+        added = 0
+        while count is None or added < count:
+            with self._cond:
+                if self._stopping or not self._has_room(self._set_bytes):
+                    break
+            case_set = self._generate()
+            size = self.estimate_bytes(case_set)
+            with self._cond:
+                self._set_bytes = size
+                if not self._has_room(size):
+                    break
+                self._pool.append((case_set, size))
+                self._pool_bytes += size
+                self.generated += 1
+            added += 1
+        return added
+
+    def _has_room(self, size: int = 0) -> bool:
+        return len(self._pool) < self.max_sets and self._pool_bytes + size <= self.max_bytes
+
+    def _needs_fill(self) -> bool:
+        """低于低水位且还放得下一个用例集"""
+        return len(self._pool) < self.low_watermark and self._has_room(self._set_bytes)
+
+    def stats(self) -> Dict[str, float]:
+        """用例池指标"""
+        with self._cond:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._pool),
+                "bytes": self._pool_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+                "generated": self.generated
+            }
+
+    # ============== 后台生产者 ==============
+
+    def _producer_loop(self):
+        while True:
+            with self._cond:
+                # 内存上限低于低水位时同样在此等待，由take()腾出空间后唤醒
+                while not self._stopping and not self._needs_fill():
+                    self._cond.wait()
+                if self._stopping:
+                    return
+            self.fill()
+
+    def start(self):
+        """启动后台生产线程（先同步预热至低水位）"""
+        if self._thread:
+            return
+        self._stopping = False
+        self.fill(self.low_watermark)
+        self._thread = threading.Thread(target=self._producer_loop, name="case-pool-producer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# 使用示例
+if __name__ == "__main__":
+    print("🎯 OpenClaw Agent Benchmark - Test Case Pool")
+    print("=" * 60)
+
+    pool = TestCasePool(max_sets=16)
+    pool.start()
+    time.sleep(1)
+
+    latencies = []
+    for i in range(40):
+        started = time.perf_counter()
+        pool.take(agent_id=f"agent_{i}")
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    pool.stop()
+    latencies.sort()
+    print(f"\n📊 Pool stats: {pool.stats()}")
+    print(f"   take() p50: {latencies[len(latencies) // 2]:.2f}ms  max: {latencies[-1]:.2f}ms")
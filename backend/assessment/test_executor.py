@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+OpenClaw Agent Benchmark - Concurrent Test Case Executor
+并发测试用例执行器 - 保证"5分钟极速测评"
+"""
+
+import time
+import asyncio
+import inspect
+import contextlib
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from test_generator import Dimension, TestCase
+
+
+@dataclass
+class TestResult:
+    """测试结果 (字段与test_results表对应)"""
+    case_id: str
+    dimension: Dimension
+    sub_item: str
+    status: str                  # completed / timeout / error
+    score: float
+    max_score: int
+    response_time_ms: int
+    actual_result: Any = None
+    error_message: Optional[str] = None
+
+
+# Agent调用: 接收用例，返回Agent的实际输出
+AgentCaller = Callable[[TestCase], Union[Any, Awaitable[Any]]]
+# 评分: 接收用例和实际输出，返回得分
+Evaluator = Callable[[TestCase, Any], float]
+# 进度回调: 用例开始/完成时调用（用于推送实时进度）
+CaseStartedHook = Callable[[TestCase], None]
+ResultHook = Callable[[TestResult], None]
+
+
+class ConcurrentTestExecutor:
+    """
+    并发测试用例执行器
+
+    核心特性:
+    1. 默认所有用例同时执行，总耗时接近最慢的单个用例
+    2. 可按维度限制并发数，避免压垮被测Agent；限制为n时该维度耗时约为 ceil(用例数 / n) 轮
+    3. 严格执行每个用例的timeout_seconds，超时即取消
+    4. 记录每个用例的response_time_ms
+    """
+
+    # None为不限制（维度内所有用例同时执行）
+    DEFAULT_CONCURRENCY: Optional[int] = None
+
+    def __init__(
+        self,
+        agent_caller: AgentCaller,
+        evaluator: Optional[Evaluator] = None,
+        dimension_concurrency: Optional[Dict[Dimension, int]] = None,
+        default_concurrency: Optional[int] = DEFAULT_CONCURRENCY,
+        on_case_started: Optional[CaseStartedHook] = None,
+        on_result: Optional[ResultHook] = None
+    ):
+        self.agent_caller = agent_caller
+        self.evaluator = evaluator
+        self.dimension_concurrency = dimension_concurrency or {}
+        self.default_concurrency = default_concurrency
+        self.on_case_started = on_case_started
+        self.on_result = on_result
+
+    async def _call_agent(self, case: TestCase) -> Any:
+        """调用Agent；同步调用在线程中执行（超时后不再等待，但线程无法被强制终止）"""
+        if inspect.iscoroutinefunction(self.agent_caller):
+            return await self.agent_caller(case)
+        return await asyncio.to_thread(self.agent_caller, case)
+
+    async def run_case(self, case: TestCase, semaphore: Optional[asyncio.Semaphore] = None) -> TestResult:
+        """执行单个用例（semaphore为该维度的并发限制，None为不限制）"""
+        async with semaphore or contextlib.nullcontext():
+            if self.on_case_started:
+                self.on_case_started(case)
+            started = time.perf_counter()
+            actual, error, status, score = None, None, "completed", 0.0
+            try:
+                actual = await asyncio.wait_for(self._call_agent(case), timeout=case.timeout_seconds)
+                if self.evaluator:
+                    score = min(float(self.evaluator(case, actual)), case.max_score)
+            except asyncio.TimeoutError:
+                status = "timeout"
+                error = f"超时 ({case.timeout_seconds}s)"
+            except Exception as e:
+                status = "error"
+                error = str(e)
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+
+        result = TestResult(
+            case_id=case.case_id,
+            dimension=case.dimension,
+            sub_item=case.sub_item,
+            status=status,
+            score=score,
+            max_score=case.max_score,
+            response_time_ms=elapsed_ms,
+            actual_result=actual,
+            error_message=error
+        )
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    async def run_all(self, all_cases: Dict[Dimension, List[TestCase]]) -> Dict[Dimension, List[TestResult]]:
+        """并发执行generate_all_cases()生成的完整用例集，结果保持原有顺序"""
+        semaphores: Dict[Dimension, Optional[asyncio.Semaphore]] = {}
+        for dimension in all_cases:
+            limit = self.dimension_concurrency.get(dimension, self.default_concurrency)
+            semaphores[dimension] = asyncio.Semaphore(limit) if limit else None
+
+        jobs = [
+            (dimension, self.run_case(case, semaphores[dimension]))
+            for dimension, cases in all_cases.items()
+            for case in cases
+        ]
+        results = await asyncio.gather(*(job for _, job in jobs))
+
+        grouped: Dict[Dimension, List[TestResult]] = {dimension: [] for dimension in all_cases}
+        for (dimension, _), result in zip(jobs, results):
+            grouped[dimension].append(result)
+        return grouped
+
+    def run(self, all_cases: Dict[Dimension, List[TestCase]]) -> Dict[Dimension, List[TestResult]]:
+        """同步入口"""
+        return asyncio.run(self.run_all(all_cases))
+
+
+# 使用示例
+if __name__ == "__main__":
+    import random
+    from test_generator import DynamicTestGenerator
+
+    print("🎯 OpenClaw Agent Benchmark - Concurrent Test Executor")
+    print("=" * 60)
+
+    async def demo_agent(case: TestCase) -> str:
+        """模拟Agent: 随机耗时，偶尔卡死"""
+        if case.timeout_seconds <= 10 and random.random() < 0.1:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(random.uniform(0.1, 1.5))
+        return f"answer to {case.case_id}"
+
+    all_cases = DynamicTestGenerator(agent_id="agent_demo_001").generate_all_cases()
+    executor = ConcurrentTestExecutor(
+        demo_agent,
+        evaluator=lambda case, actual: case.max_score * 0.8
+    )
+
+    started = time.perf_counter()
+    all_results = executor.run(all_cases)
+    wall_seconds = time.perf_counter() - started
+
+    for dimension, results in all_results.items():
+        timeouts = sum(1 for r in results if r.status == "timeout")
+        slowest = max(r.response_time_ms for r in results)
+        print(f"\n{dimension.value.upper()}:")
+        print(f"  Cases: {len(results)}  Timeouts: {timeouts}  Slowest: {slowest}ms")
+
+    sequential_budget = sum(c.timeout_seconds for cases in all_cases.values() for c in cases)
+    print("\n" + "=" * 60)
+    print(f"✅ Wall time: {wall_seconds:.1f}s (sequential timeout budget: {sequential_budget}s)")
@@ -0,0 +1,193 @@
+"""
+测评用例生成 / 用例池 / 并发执行器测试
+运行: cd backend/assessment && python -m pytest -q tests.py
+"""
+
+import time
+import asyncio
+
+import case_pool
+import test_executor
+import test_generator
+from test_generator import Dimension, DynamicTestGenerator
+
+
+def wait_until(predicate, timeout: float = 2) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+# ============== 用例池 ==============
+
+class TestCasePoolBehaviour:
+    def test_refills_to_capacity_below_low_watermark(self):
+        pool = case_pool.TestCasePool(max_sets=4, low_watermark=2)
+        pool.start()
+        try:
+            # 启动时同步预热到低水位
+            assert pool.stats()["generated"] >= 2
+            for i in range(3):
+                pool.take(f"agent_{i}")
+            assert wait_until(lambda: pool.stats()["size"] == 4)
+            stats = pool.stats()
+            assert stats["hits"] + stats["misses"] == 3
+        finally:
+            pool.stop()
+
+    def test_byte_cap_below_low_watermark_does_not_spin(self, monkeypatch):
+        set_bytes = case_pool.TestCasePool.estimate_bytes(case_pool.TestCasePool._generate())
+        calls = []
+        original = case_pool.TestCasePool._generate
+
+        def counting_generate():
+            calls.append(1)
+            return original()
+
+        monkeypatch.setattr(case_pool.TestCasePool, "_generate", staticmethod(counting_generate))
+        # 内存只放得下2组，低水位为8
+        pool = case_pool.TestCasePool(max_sets=16, max_bytes=int(set_bytes * 2.5), low_watermark=8)
+        pool.start()
+        try:
+            assert wait_until(lambda: pool.stats()["size"] == 2)
+            time.sleep(0.2)
+            generated = len(calls)
+            time.sleep(1.2)
+            # 达到内存上限后不再生成
+            assert len(calls) == generated <= 3
+
+            # 取用腾出空间后补回
+            pool.take("agent_a")
+            assert wait_until(lambda: pool.stats()["size"] == 2)
+            assert pool.stats()["bytes"] <= pool.max_bytes
+        finally:
+            pool.stop()
+
+    def test_miss_generates_on_demand(self):
+        pool = case_pool.TestCasePool(max_sets=2)
+        case_set = pool.take("agent_cold")
+        assert sum(len(cases) for cases in case_set.values()) > 0
+        assert pool.stats()["misses"] == 1
+
+    def test_salt_renames_and_shuffles_but_keeps_content(self):
+        original = DynamicTestGenerator(seed=42).generate_all_cases()
+        original_ids = {d: [c.case_id for c in cases] for d, cases in original.items()}
+
+        a = case_pool.TestCasePool.salt(original, "agent_a")
+        b = case_pool.TestCasePool.salt(original, "agent_b")
+        for dimension in Dimension:
+            ids_a = {c.case_id for c in a[dimension]}
+            ids_b = {c.case_id for c in b[dimension]}
+            assert not ids_a & ids_b
+            assert not ids_a & set(original_ids[dimension])
+            # 用例内容与原始用例集相同，只有id和顺序不同
+            assert sorted(c.content for c in a[dimension]) == sorted(c.content for c in original[dimension])
+            assert sorted(c.content for c in b[dimension]) == sorted(c.content for c in original[dimension])
+        # 原始用例集不被修改
+        assert {d: [c.case_id for c in cases] for d, cases in original.items()} == original_ids
+
+
+# ============== 用例生成 ==============
+
+class TestDynamicGenerator:
+    def test_same_seed_generates_same_cases(self):
+        first = DynamicTestGenerator(seed=7).generate_all_cases()
+        second = DynamicTestGenerator(seed=7).generate_all_cases()
+        assert {d: [c.case_id for c in cases] for d, cases in first.items()} == \
+            {d: [c.case_id for c in cases] for d, cases in second.items()}
+
+    def test_cases_do_not_share_template_containers(self):
+        snapshot = repr(test_generator.TEMPLATE_REGISTRY)
+        cases = DynamicTestGenerator(seed=7).generate_all_cases()
+        for dimension_cases in cases.values():
+            for case in dimension_cases:
+                if isinstance(case.expected_result, dict):
+                    case.expected_result["tampered"] = True
+                case.evaluation_criteria["tampered"] = 1
+
+        assert repr(test_generator.TEMPLATE_REGISTRY) == snapshot
+        fresh = DynamicTestGenerator(seed=7).generate_all_cases()
+        assert all(
+            "tampered" not in case.evaluation_criteria
+            for dimension_cases in fresh.values() for case in dimension_cases
+        )
+
+
+# ============== 并发执行器 ==============
+
+def make_cases(count: int, dimension: Dimension = Dimension.TOOL_USAGE, timeout: float = 1):
+    return [
+        test_generator.TestCase(
+            case_id=f"{dimension.value}_{i}", dimension=dimension, sub_item="demo", content="",
+            expected_result=None, max_score=10, timeout_seconds=timeout, evaluation_criteria={}
+        )
+        for i in range(count)
+    ]
+
+
+class TestConcurrentExecutor:
+    @staticmethod
+    def tracking_agent(delay: float, hang: set = frozenset()):
+        active, peak = {}, {}
+
+        async def agent(case):
+            dimension = case.dimension
+            active[dimension] = active.get(dimension, 0) + 1
+            peak[dimension] = max(peak.get(dimension, 0), active[dimension])
+            try:
+                await asyncio.sleep(3600 if case.case_id in hang else delay)
+                return case.case_id
+            finally:
+                active[dimension] -= 1
+
+        return agent, peak
+
+    def test_default_runs_every_case_at_once(self):
+        agent, peak = self.tracking_agent(0.1)
+        cases = {Dimension.TOOL_USAGE: make_cases(8), Dimension.COGNITION: make_cases(6, Dimension.COGNITION)}
+        started = time.perf_counter()
+        results = test_executor.ConcurrentTestExecutor(agent).run(cases)
+        assert time.perf_counter() - started < 0.5
+        assert peak == {Dimension.TOOL_USAGE: 8, Dimension.COGNITION: 6}
+        assert [r.case_id for r in results[Dimension.TOOL_USAGE]] == [c.case_id for c in cases[Dimension.TOOL_USAGE]]
+
+    def test_dimension_concurrency_is_bounded(self):
+        agent, peak = self.tracking_agent(0.02)
+        cases = {Dimension.TOOL_USAGE: make_cases(8), Dimension.COGNITION: make_cases(6, Dimension.COGNITION)}
+        test_executor.ConcurrentTestExecutor(
+            agent, dimension_concurrency={Dimension.TOOL_USAGE: 2}, default_concurrency=3
+        ).run(cases)
+        assert peak == {Dimension.TOOL_USAGE: 2, Dimension.COGNITION: 3}
+
+    def test_per_case_timeout_and_hooks(self):
+        agent, _ = self.tracking_agent(0.01, hang={"tool_usage_1"})
+        cases = {Dimension.TOOL_USAGE: make_cases(3, timeout=0.2)}
+        started_ids, results_seen = [], []
+        executor = test_executor.ConcurrentTestExecutor(
+            agent,
+            evaluator=lambda case, actual: 99,
+            on_case_started=lambda case: started_ids.append(case.case_id),
+            on_result=results_seen.append
+        )
+        started = time.perf_counter()
+        results = executor.run(cases)[Dimension.TOOL_USAGE]
+        assert time.perf_counter() - started < 1
+
+        assert [r.status for r in results] == ["completed", "timeout", "completed"]
+        assert results[1].score == 0 and results[1].error_message
+        # 得分不超过max_score
+        assert results[0].score == 10
+        assert sorted(started_ids) == [c.case_id for c in cases[Dimension.TOOL_USAGE]]
+        assert sorted(r.case_id for r in results_seen) == sorted(started_ids)
+
+    def test_agent_errors_are_recorded(self):
+        def failing_agent(case):
+            raise RuntimeError("agent down")
+
+        result = test_executor.ConcurrentTestExecutor(failing_agent).run(
+            {Dimension.COMPLIANCE: make_cases(1, Dimension.COMPLIANCE)}
+        )[Dimension.COMPLIANCE][0]
+        assert (result.status, result.error_message) == ("error", "agent down")
@@ -36,6 +36,8 @@ CREATE TABLE IF NOT EXISTS assessment_tasks (
     agent_id VARCHAR(255) NOT NULL,
     agent_name VARCHAR(255) NOT NULL,
     status VARCHAR(50) DEFAULT 'pending',
+    queued_at TIMESTAMP WITH TIME ZONE,
+    attempts INTEGER DEFAULT 0,
     tool_score DECIMAL(5,2) DEFAULT 0,
     reasoning_score DECIMAL(5,2) DEFAULT 0,
     interaction_score DECIMAL(5,2) DEFAULT 0,
@@ -78,10 +80,12 @@ CREATE TABLE IF NOT EXISTS reports (
     report_code VARCHAR(30) UNIQUE NOT NULL,
     task_id UUID REFERENCES assessment_tasks(id),
     summary JSONB,
-    dimensions JSONB,
-    test_cases JSONB,
-    recommendations JSONB,
     ranking_percentile DECIMAL(5,2),
+    -- 压缩的报告正文（dimensions / test_cases / recommendations / json_report）
+    content BYTEA,
+    -- gzip压缩的预序列化响应
+    free_payload BYTEA,
+    full_payload BYTEA,
     is_deep_report INTEGER DEFAULT 0,
     unlocked_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
@@ -105,16 +109,37 @@ CREATE TABLE IF NOT EXISTS payment_orders (
 -- Rankings table
 CREATE TABLE IF NOT EXISTS rankings (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    agent_id VARCHAR(255),
     agent_name VARCHAR(255) NOT NULL,
     agent_type VARCHAR(50) DEFAULT 'general',
+    -- 排名在读取时计算，不落库
     total_score DECIMAL(5,2) DEFAULT 0,
+    -- 各维度历史最高分（维度榜）
+    tool_score DECIMAL(5,2),
+    reasoning_score DECIMAL(5,2),
+    interaction_score DECIMAL(5,2),
+    stability_score DECIMAL(5,2),
     level VARCHAR(50),
-    rank INTEGER,
     task_count INTEGER DEFAULT 1,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(agent_name)
 );
 
+-- Ranking rollups table (daily / weekly / monthly leaderboards)
+CREATE TABLE IF NOT EXISTS ranking_rollups (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    period VARCHAR(10) NOT NULL,
+    window_start TIMESTAMP NOT NULL,
+    agent_id VARCHAR(255),
+    agent_name VARCHAR(255) NOT NULL,
+    agent_type VARCHAR(50),
+    best_score DECIMAL(5,2),
+    level VARCHAR(50),
+    task_count INTEGER DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_ranking_rollups_window_agent UNIQUE(period, window_start, agent_name)
+);
+
 -- System configs table
 CREATE TABLE IF NOT EXISTS system_configs (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -134,6 +159,19 @@ CREATE INDEX IF NOT EXISTS idx_reports_task ON reports(task_id);
 CREATE INDEX IF NOT EXISTS idx_orders_code ON payment_orders(order_code);
 CREATE INDEX IF NOT EXISTS idx_rankings_score ON rankings(total_score DESC);
 CREATE INDEX IF NOT EXISTS idx_rankings_type ON rankings(agent_type);
+CREATE INDEX IF NOT EXISTS ix_rankings_agent_id ON rankings(agent_id);
+CREATE INDEX IF NOT EXISTS ix_ranking_rollups_window_score ON ranking_rollups(period, window_start, best_score);
+-- 队列认领 / 游标分页
+CREATE INDEX IF NOT EXISTS ix_assessment_tasks_queued_at ON assessment_tasks(queued_at);
+CREATE INDEX IF NOT EXISTS ix_assessment_tasks_created_at_id ON assessment_tasks(created_at, id);
+CREATE INDEX IF NOT EXISTS ix_assessment_tasks_agent_id_created_at_id ON assessment_tasks(agent_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_tokens_created_by_created_at_id ON tokens(created_by, created_at, id);
+-- 部分索引: Agent历史成绩（覆盖索引）、过期清理
+CREATE INDEX IF NOT EXISTS ix_assessment_tasks_agent_id_completed_at ON assessment_tasks(agent_id, completed_at)
+    INCLUDE (total_score, task_code) WHERE status = 'completed';
+CREATE INDEX IF NOT EXISTS ix_tokens_active_expires_at ON tokens(expires_at) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS ix_payment_orders_pending_created_at ON payment_orders(created_at) WHERE status = 'pending';
+-- 其余表（temp_tokens、users邀请码等）及其索引由应用启动时create_all创建，已有库升级见backend/assessment-engine/migrate_schema.py
 
 -- Insert default test cases
 INSERT INTO test_cases (case_type, difficulty, content, expected_result, weight, tags) VALUES